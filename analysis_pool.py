@@ -0,0 +1,31 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('Trade')
+
+
+class AnalysisPool:
+    """多代码并发分析
+
+    I/O 密集的行情请求在线程池中并发执行，max_workers 即同时在途的代码数上限；
+    结果按输入代码的顺序返回，与完成先后无关。
+    """
+
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='Analysis')
+
+    def map(self, func, codes):
+        """对每个代码执行 func(code)，返回 [(code, result, error)]，顺序与 codes 一致"""
+        futures = [(code, self._executor.submit(func, code)) for code in codes]
+        results = []
+        for code, future in futures:
+            try:
+                results.append((code, future.result(), None))
+            except Exception as e:
+                logger.error("分析 %s 时发生错误: %s", code, str(e), exc_info=True)
+                results.append((code, None, e))
+        return results
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
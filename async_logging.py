@@ -0,0 +1,150 @@
+import json
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler
+
+LOG_BATCH_SIZE = 256  # 后台线程一次最多处理的日志条数，处理完一批后统一刷新
+LOG_FLUSH_INTERVAL = 0.5  # 队列空闲时后台线程的唤醒间隔（秒）
+
+
+class LazyFrame:
+    """延迟渲染的 DataFrame，只有日志真正输出时才调用 to_string()
+
+    用法: logger.info("持仓:\\n%s", LazyFrame(positions))
+    """
+
+    __slots__ = ('data', 'max_rows')
+
+    def __init__(self, data, max_rows=None):
+        self.data = data
+        self.max_rows = max_rows
+
+    def __str__(self):
+        return self.data.to_string(max_rows=self.max_rows)
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'ts': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'file': f'{record.filename}:{record.lineno}',
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """只把 LogRecord 放入队列，不在调用线程中格式化（QueueHandler 默认会先格式化消息）
+
+    参数对象在后台线程中才转换为字符串，调用方传入后不应再修改它们。
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class _BatchFlushMixin:
+    """写入时不立即 flush，由 BatchQueueListener 每批处理完后调用 flush_batch"""
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+
+class BufferedStreamHandler(_BatchFlushMixin, logging.StreamHandler):
+    pass
+
+
+class BufferedFileHandler(_BatchFlushMixin, logging.FileHandler):
+
+    def close(self):
+        self.flush_batch()
+        super().close()
+
+
+class BatchQueueListener:
+    """后台日志写入线程：从队列批量取出日志交给各 handler，每批结束后统一刷新"""
+
+    def __init__(self, log_queue, handlers, batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL):
+        self.queue = log_queue
+        self.handlers = list(handlers)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._thread = None
+        self._stop = threading.Event()
+        self.batches = 0
+        self.records = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='LogWriter', daemon=True)
+        self._thread.start()
+
+    def _handle(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _flush(self):
+        for handler in self.handlers:
+            flush = getattr(handler, 'flush_batch', handler.flush)
+            try:
+                flush()
+            except Exception:
+                pass
+
+    def _drain(self, first):
+        self._handle(first)
+        count = 1
+        while count < self.batch_size:
+            try:
+                record = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            self._handle(record)
+            count += 1
+        self._flush()
+        self.batches += 1
+        self.records += count
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            self._drain(record)
+        # 退出前写完队列中剩余的日志
+        while True:
+            try:
+                record = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            self._drain(record)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        for handler in self.handlers:
+            handler.close()
+
+
+def make_async(logger, handlers, batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL):
+    """把 handlers 挂到后台写入线程上，logger 只保留一个入队的 handler，返回 listener"""
+    log_queue = queue.SimpleQueue()
+    listener = BatchQueueListener(log_queue, handlers, batch_size=batch_size, flush_interval=flush_interval)
+    logger.addHandler(DeferredQueueHandler(log_queue))
+    listener.start()
+    return listener
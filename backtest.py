@@ -0,0 +1,308 @@
+"""离线回测：用本地保存的1分钟K线回放趋势反转策略与 MACD 策略
+
+运行: python backtest.py data/bars.csv --strategy trend_reversal --output trades.csv
+"""
+import argparse
+import glob
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from bars import BAR_COLUMNS
+from indicators import calculate_ma, calculate_macd
+from kline_store import time_key_to_int, records_to_frame
+from signals import batch_is_up_trend, batch_is_reversal
+from strategy_params import StrategyParams
+
+logger = logging.getLogger('Trade')
+
+STRATEGY_TREND_REVERSAL = 'trend_reversal'
+STRATEGY_MACD = 'macd'
+
+TRADE_COLUMNS = ['code', 'entry_time', 'exit_time', 'entry_price', 'exit_price', 'bars_held',
+                 'return', 'pnl', 'reason']
+
+
+class BarArrays:
+    """单个代码的1分钟K线数组（time_key 为秒级整数），回测全程只转换一次"""
+
+    __slots__ = ('code', 'time', 'open', 'close', 'high', 'low', 'volume')
+
+    def __init__(self, code, time_values, open_, close, high, low, volume):
+        self.code = code
+        self.time = np.asarray(time_values, dtype='i8')
+        self.open = np.asarray(open_, dtype='f8')
+        self.close = np.asarray(close, dtype='f8')
+        self.high = np.asarray(high, dtype='f8')
+        self.low = np.asarray(low, dtype='f8')
+        self.volume = np.asarray(volume, dtype='f8')
+
+    @classmethod
+    def from_frame(cls, code, data):
+        data = data.sort_values('time_key', kind='mergesort').drop_duplicates('time_key', keep='last')
+        return cls(code, time_key_to_int(data['time_key'].values), data['open'].values, data['close'].values,
+                   data['high'].values, data['low'].values, data['volume'].values)
+
+    def __len__(self):
+        return len(self.time)
+
+
+def _read_file(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return pd.read_csv(path)
+    if ext in ('.parquet', '.pq'):
+        return pd.read_parquet(path)
+    if ext == '.npy':
+        # KlineStore 保存的结构化数组，文件名即代码
+        return records_to_frame(os.path.splitext(os.path.basename(path))[0], np.load(path))
+    raise ValueError(f'不支持的K线文件格式: {path}')
+
+
+def load_bars(paths, codes=None):
+    """读取 CSV / Parquet / KlineStore(.npy) 格式的1分钟K线，返回 {code: BarArrays}
+
+    paths 可以是文件、目录或通配符（列表亦可），文件需包含 BAR_COLUMNS 中的价格与成交量列，
+    多个代码可以放在同一个文件中（按 code 列区分）。
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*'))))
+        else:
+            files.extend(sorted(glob.glob(path)) or [path])
+    frames = [_read_file(path) for path in files if os.path.splitext(path)[1].lower() in
+              ('.csv', '.parquet', '.pq', '.npy')]
+    if not frames:
+        raise ValueError(f'没有找到K线文件: {paths}')
+    data = pd.concat(frames, ignore_index=True)
+    missing = [name for name in BAR_COLUMNS[:-1] if name not in data.columns]
+    if missing or 'code' not in data.columns:
+        raise ValueError(f'K线文件缺少列: {missing or ["code"]}')
+    if codes is not None:
+        data = data[data['code'].isin(codes)]
+    return {code: BarArrays.from_frame(code, group) for code, group in data.groupby('code', sort=True)}
+
+
+def resample_arrays(bars, minutes):
+    """将1分钟K线合成为 N 分钟K线
+
+    返回 (每根1分钟K线所属的 N 分钟K线序号, N 分钟收盘价, N 分钟成交量)，
+    分桶规则与 bars.bucket_time_key 一致（time_key 为K线结束时间，向上取整）。
+    """
+    period = minutes * 60
+    bucket = -(-bars.time // period) * period
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(bucket)] - 1
+    bucket_index = np.cumsum(np.r_[False, bucket[1:] != bucket[:-1]])
+    close = bars.close[ends]
+    volume = np.add.reduceat(bars.volume, starts) if len(starts) else np.empty(0)
+    return bucket_index, close, volume
+
+
+def _window_values(values, window, func):
+    """对每个 k 计算 func(values[max(0, k - window):k])，返回长度为 len(values) + 1 的数组"""
+    n = len(values)
+    # 开头不足 window 根时窗口较短，逐个计算；其余窗口等长，一次批量计算
+    head = [func(values[:k].reshape(1, k))[0] for k in range(min(window, n + 1))]
+    if n < window:
+        return np.array(head)
+    return np.concatenate([np.array(head), func(sliding_window_view(values, window))])
+
+
+def trend_reversal_signals(bars, params):
+    """逐根1分钟K线计算趋势反转买入信号（布尔数组，第 t 个元素表示第 t 根K线走完时是否触发）
+
+    与实盘逻辑一致：趋势使用当前K线之前最近 trend_bars 根已走完的 N 分钟K线，
+    反转使用最近两根1分钟K线与最后一根已走完的 N 分钟K线。
+    """
+    n = len(bars)
+    signals = np.zeros(n, dtype=bool)
+    if n < 2:
+        return signals
+    bucket_index, close_nm, volume_nm = resample_arrays(bars, params.trend_minutes)
+
+    def up_trend(windows):
+        if windows.shape[1] < 2:
+            return np.zeros(windows.shape[0], dtype=bool)
+        return batch_is_up_trend(windows)
+
+    def mean_volume(windows):
+        if windows.shape[1] == 0:
+            return np.full(windows.shape[0], np.nan)
+        return np.nanmean(windows, axis=1)
+
+    # 以“已走完的 N 分钟K线数量” k 为索引预先计算，1分钟K线 t 对应 k = bucket_index[t]
+    trend_by_k = _window_values(close_nm, params.trend_bars, up_trend).astype(bool)
+    volume_by_k = _window_values(volume_nm, params.trend_bars, mean_volume).astype('f8')
+    # 没有 N 分钟K线时均量未知，比较结果与 NaN 相同（不触发）
+    volume_by_k[np.isnan(volume_by_k)] = np.inf
+    k = bucket_index[1:]
+    has_bars = k > 0
+    last_close_nm = np.where(has_bars, close_nm[np.maximum(k - 1, 0)], np.nan)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        reversal = batch_is_reversal(
+            np.column_stack([bars.open[:-1], bars.open[1:]]),
+            np.column_stack([bars.close[:-1], bars.close[1:]]),
+            np.column_stack([bars.volume[:-1], bars.volume[1:]]),
+            last_close_nm[:, None], volume_by_k[k][:, None],
+            volume_ratio=params.volume_ratio, prev_volume_ratio=params.prev_volume_ratio,
+            up_ratio=params.up_ratio)
+    signals[1:] = reversal & has_bars & trend_by_k[k]
+    return signals
+
+
+def macd_signals(bars, params):
+    """MACD 金叉且收盘价位于 MA 之上时的买入信号（与 analyze_stock 的 BUY/UP 判定一致）"""
+    data = pd.DataFrame({'close': bars.close})
+    macd, signal_line, _ = calculate_macd(data, params.macd_fast, params.macd_slow, params.macd_signal)
+    ma = calculate_ma(data, params.ma_period).to_numpy()
+    macd = macd.to_numpy()
+    signal_line = signal_line.to_numpy()
+    signals = np.zeros(len(bars), dtype=bool)
+    if len(bars) < 2:
+        return signals
+    cross = (macd[1:] > signal_line[1:]) & (macd[:-1] <= signal_line[:-1])
+    with np.errstate(invalid='ignore'):
+        signals[1:] = cross & (bars.close[1:] > ma[1:])
+    return signals
+
+
+SIGNAL_FUNCS = {
+    STRATEGY_TREND_REVERSAL: trend_reversal_signals,
+    STRATEGY_MACD: macd_signals,
+}
+
+
+def simulate_trades(bars, signals, params):
+    """按信号模拟成交，返回交易记录列表
+
+    信号K线走完后以下一根K线开盘价市价买入（加滑点），持仓期间用每根K线的最高/最低价
+    检查止盈止损，同一根K线内两者都触及时按止损处理；跳空越过阈值时按开盘价成交。
+    同一代码同时只持有一笔仓位，数据结束时按最后收盘价平仓。
+    """
+    trades = []
+    entries = np.flatnonzero(signals[:-1]) + 1
+    n = len(bars)
+    leverage = params.leverage
+    next_free = 0
+    for entry in entries:
+        if entry < next_free:
+            continue
+        entry_price = bars.open[entry] * (1 + params.slippage)
+        take_profit = entry_price * (1 + params.profit_threshold / leverage)
+        stop_loss = entry_price * (1 + params.loss_threshold / leverage)
+        hit_loss = bars.low[entry:] <= stop_loss
+        hit_profit = bars.high[entry:] >= take_profit
+        hit = hit_loss | hit_profit
+        if hit.any():
+            exit_bar = entry + int(hit.argmax())
+            if hit_loss[exit_bar - entry]:
+                reason = 'stop_loss'
+                price = min(bars.open[exit_bar], stop_loss) if exit_bar > entry else stop_loss
+            else:
+                reason = 'take_profit'
+                price = max(bars.open[exit_bar], take_profit) if exit_bar > entry else take_profit
+        else:
+            exit_bar = n - 1
+            reason = 'end_of_data'
+            price = bars.close[exit_bar]
+        exit_price = price * (1 - params.slippage)
+        ret = leverage * (exit_price / entry_price - 1)
+        pnl = params.trade_value * ret - 2 * params.commission
+        trades.append((bars.code, int(bars.time[entry]), int(bars.time[exit_bar]), entry_price, exit_price,
+                       exit_bar - entry, ret, pnl, reason))
+        next_free = exit_bar + 1
+    return trades
+
+
+def summarize(trades):
+    """汇总交易记录：笔数、胜率、总盈亏、平均收益、盈亏比与按平仓顺序的最大回撤"""
+    if trades.empty:
+        return {'trades': 0, 'win_rate': 0.0, 'pnl': 0.0, 'avg_return': 0.0, 'profit_factor': 0.0,
+                'max_drawdown': 0.0}
+    pnl = trades.sort_values('exit_time', kind='mergesort')['pnl'].to_numpy()
+    equity = np.cumsum(pnl)
+    drawdown = np.maximum.accumulate(np.r_[0.0, equity])[1:] - equity
+    gains = pnl[pnl > 0].sum()
+    losses = -pnl[pnl < 0].sum()
+    return {
+        'trades': len(pnl),
+        'win_rate': float((pnl > 0).mean()),
+        'pnl': float(equity[-1]),
+        'avg_return': float(trades['return'].mean()),
+        'profit_factor': float(gains / losses) if losses > 0 else float('inf') if gains > 0 else 0.0,
+        'max_drawdown': float(drawdown.max()),
+    }
+
+
+class BacktestResult:
+    """回测结果：trades 为交易明细 DataFrame，summary 为汇总指标"""
+
+    def __init__(self, trades, params, strategy, elapsed=0.0):
+        self.trades = trades
+        self.params = params
+        self.strategy = strategy
+        self.elapsed = elapsed
+        self.summary = summarize(trades)
+
+    def trades_frame(self):
+        """交易明细（时间转换为 time_key 字符串）"""
+        data = self.trades.copy()
+        for name in ('entry_time', 'exit_time'):
+            data[name] = pd.to_datetime(data[name], unit='s').dt.strftime('%Y-%m-%d %H:%M:%S')
+        return data
+
+    def __repr__(self):
+        return f'BacktestResult({self.strategy}, {self.summary})'
+
+
+def run_backtest(bars_by_code, params=None, strategy=STRATEGY_TREND_REVERSAL):
+    """对 {code: BarArrays} 逐代码回测，返回 BacktestResult"""
+    params = params or StrategyParams()
+    signal_func = SIGNAL_FUNCS[strategy]
+    start = time.perf_counter()
+    trades = []
+    for code, bars in bars_by_code.items():
+        if len(bars) < 2:
+            continue
+        trades.extend(simulate_trades(bars, signal_func(bars, params), params))
+    elapsed = time.perf_counter() - start
+    return BacktestResult(pd.DataFrame(trades, columns=TRADE_COLUMNS), params, strategy, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线回测')
+    parser.add_argument('paths', nargs='+', help='1分钟K线文件或目录（CSV / Parquet / KlineStore .npy）')
+    parser.add_argument('--strategy', choices=sorted(SIGNAL_FUNCS), default=STRATEGY_TREND_REVERSAL)
+    parser.add_argument('--codes', nargs='*', help='只回测这些代码')
+    parser.add_argument('--profit', type=float, default=0.20, help='止盈阈值')
+    parser.add_argument('--loss', type=float, default=-0.05, help='止损阈值')
+    parser.add_argument('--leverage', type=float, default=1.0, help='期权相对标的的实际杠杆')
+    parser.add_argument('--slippage', type=float, default=0.0, help='单边滑点（比例）')
+    parser.add_argument('--commission', type=float, default=0.0, help='单边手续费')
+    parser.add_argument('--output', help='交易明细输出 CSV')
+    args = parser.parse_args()
+
+    bars_by_code = load_bars(args.paths, codes=args.codes)
+    params = StrategyParams(profit_threshold=args.profit, loss_threshold=args.loss, leverage=args.leverage,
+                            slippage=args.slippage, commission=args.commission)
+    result = run_backtest(bars_by_code, params, strategy=args.strategy)
+    total_bars = sum(len(bars) for bars in bars_by_code.values())
+    print(f'{len(bars_by_code)} 个代码, {total_bars} 根K线, 耗时 {result.elapsed:.2f}s')
+    for name, value in result.summary.items():
+        print(f'{name:>14}: {value}')
+    if args.output:
+        result.trades_frame().to_csv(args.output, index=False)
+        print(f'交易明细已保存到 {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+BAR_COLUMNS = ['time_key', 'open', 'close', 'high', 'low', 'volume', 'turnover']
+TIME_KEY_FORMAT = '%Y-%m-%d %H:%M:%S'
+# 港股各时段最后一根1分钟K线的结束时间（午市收市、收市、收市竞价），之后到下一时段开盘前没有新K线
+SESSION_END_TIMES = frozenset({'12:00:00', '16:00:00', '16:10:00'})
+
+
+def bucket_time_key(time_key, minutes):
+    """计算1分钟K线所属的N分钟K线的 time_key
+
+    富途K线的 time_key 为K线结束时间，因此向上取整到 N 分钟，
+    例如 10 分钟K线中 09:31~09:40 的1分钟K线归入 09:40。
+    """
+    ts = datetime.strptime(time_key, TIME_KEY_FORMAT)
+    day_start = ts.replace(hour=0, minute=0, second=0)
+    elapsed = int((ts - day_start).total_seconds())
+    bucket = -(-elapsed // (minutes * 60)) * minutes * 60
+    return (day_start + timedelta(seconds=bucket)).strftime(TIME_KEY_FORMAT)
+
+
+def resample_kline(kline_1m, minutes):
+    """一次性将1分钟K线合成为 N 分钟K线（含最后一根未走完的K线）"""
+    if kline_1m is None or kline_1m.empty:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    ts = pd.to_datetime(kline_1m['time_key'])
+    bucket = ts.dt.ceil(f'{minutes}min').dt.strftime(TIME_KEY_FORMAT)
+    agg = {'open': 'first', 'close': 'last', 'high': 'max', 'low': 'min', 'volume': 'sum'}
+    if 'turnover' in kline_1m.columns:
+        agg['turnover'] = 'sum'
+    data = kline_1m.groupby(bucket.values, sort=True).agg(agg)
+    data.index.name = 'time_key'
+    return data.reset_index()
+
+
+class _BarState:
+    """单个代码的聚合状态"""
+
+    __slots__ = ('bars', 'bucket', 'minute_bars', 'last_time_key', 'closed')
+
+    def __init__(self, maxlen):
+        self.bars = deque(maxlen=maxlen)  # 已走完的 N 分钟K线
+        self.bucket = None  # 当前未走完K线的 time_key
+        self.minute_bars = {}  # 当前未走完K线内的1分钟K线，按 time_key 去重
+        self.last_time_key = None
+        self.closed = False  # 当前周期已在时段结束时走完（已加入 bars）
+
+
+class BarAggregator:
+    """增量 N 分钟K线合成器
+
+    每根1分钟K线只处理一次（最后一根未走完的1分钟K线允许以相同 time_key 覆盖），
+    当收到下一个周期的1分钟K线时，当前周期的 N 分钟K线视为走完；
+    收到时段最后一根1分钟K线（session_ends，如午市 12:00、收市 16:00）时立即走完，
+    不必等到下一时段开盘，之后同一根1分钟K线再次推入时更新这根已走完的K线。
+    """
+
+    def __init__(self, minutes=10, maxlen=500, session_ends=SESSION_END_TIMES):
+        self.minutes = minutes
+        self.maxlen = maxlen
+        self.session_ends = session_ends
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def _state(self, code):
+        state = self._states.get(code)
+        if state is None:
+            state = _BarState(self.maxlen)
+            self._states[code] = state
+        return state
+
+    def _partial(self, state):
+        """由当前周期内的1分钟K线计算未走完的 N 分钟K线"""
+        if not state.minute_bars:
+            return None
+        rows = [state.minute_bars[key] for key in sorted(state.minute_bars)]
+        return (state.bucket, rows[0][0], rows[-1][1],
+                max(row[2] for row in rows), min(row[3] for row in rows),
+                sum(row[4] for row in rows), sum(row[5] for row in rows))
+
+    def add_bar(self, code, time_key, open_price, close, high, low, volume, turnover=0.0):
+        """推入一根1分钟K线，返回因此走完的 N 分钟K线（没有则返回 None）"""
+        with self._lock:
+            state = self._state(code)
+            if state.last_time_key is not None and time_key < state.last_time_key:
+                return None
+            state.last_time_key = time_key
+            bucket = bucket_time_key(time_key, self.minutes)
+            closed = None
+            if state.bucket is not None and bucket != state.bucket:
+                if not state.closed:
+                    closed = self._partial(state)
+                    if closed is not None:
+                        state.bars.append(closed)
+                state.minute_bars = {}
+                state.closed = False
+            state.bucket = bucket
+            state.minute_bars[time_key] = (open_price, close, high, low, volume, turnover)
+            if time_key == bucket and time_key[11:] in self.session_ends:
+                # 时段最后一根1分钟K线：当前周期不会再有新的1分钟K线，立即走完
+                bar = self._partial(state)
+                if state.closed:
+                    state.bars[-1] = bar
+                else:
+                    state.bars.append(bar)
+                    state.closed = True
+                    closed = bar
+            return closed
+
+    def update(self, code, kline_1m):
+        """将1分钟K线 DataFrame 中尚未处理的部分推入，返回新走完的 N 分钟K线列表"""
+        if kline_1m is None or kline_1m.empty:
+            return []
+        time_keys = kline_1m['time_key'].values
+        state = self._states.get(code)
+        start = 0
+        if state is not None and state.last_time_key is not None:
+            start = int(time_keys.searchsorted(state.last_time_key, side='left'))
+        # 只转换尚未处理的部分，保存为 Python 数值（合成与快照序列化都比 numpy 标量快）
+        turnover = kline_1m['turnover'].values[start:].tolist() if 'turnover' in kline_1m.columns else None
+        columns = [kline_1m[name].values[start:].tolist() for name in ('open', 'close', 'high', 'low', 'volume')]
+        closed_bars = []
+        for i in range(start, len(time_keys)):
+            j = i - start
+            closed = self.add_bar(code, time_keys[i], *(column[j] for column in columns),
+                                  turnover=turnover[j] if turnover is not None else 0.0)
+            if closed is not None:
+                closed_bars.append(closed)
+        return closed_bars
+
+    def export_state(self):
+        """导出各代码的合成状态（用于状态快照）"""
+        with self._lock:
+            return {'minutes': self.minutes,
+                    'states': {code: {'bars': list(state.bars), 'bucket': state.bucket,
+                                      'minute_bars': dict(state.minute_bars), 'last_time_key': state.last_time_key,
+                                      'closed': state.closed}
+                               for code, state in self._states.items()}}
+
+    def restore_state(self, data):
+        """恢复 export_state 导出的状态，K线周期不一致时忽略，返回恢复的代码数"""
+        if data['minutes'] != self.minutes:
+            return 0
+        with self._lock:
+            for code, saved in data['states'].items():
+                state = _BarState(self.maxlen)
+                state.bars.extend(saved['bars'])
+                state.bucket = saved['bucket']
+                state.minute_bars = dict(saved['minute_bars'])
+                state.last_time_key = saved['last_time_key']
+                state.closed = saved.get('closed', False)
+                self._states[code] = state
+        return len(data['states'])
+
+    def frame(self, code, count=None, include_partial=False):
+        """返回已合成的 N 分钟K线 DataFrame，count 为保留的最近K线数量"""
+        with self._lock:
+            state = self._states.get(code)
+            if state is None:
+                return pd.DataFrame(columns=BAR_COLUMNS)
+            rows = list(state.bars)
+            if include_partial and not state.closed:
+                partial = self._partial(state)
+                if partial is not None:
+                    rows.append(partial)
+        if count is not None:
+            rows = rows[-count:]
+        return pd.DataFrame(rows, columns=BAR_COLUMNS)
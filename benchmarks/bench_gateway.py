@@ -0,0 +1,83 @@
+"""请求网关基准：信号时刻的突发请求下，直连与经网关的被限频次数和下单路径延迟
+
+运行: python -m benchmarks.bench_gateway --symbols 80 --latency-ms 20
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+from futu import SubType, TrdSide
+
+from benchmarks.sim_context import SimQuoteContext, SimTradeContext, SimMarket
+from gateway import RequestGateway, order_priority
+
+
+def burst(quote_ctx, trade_ctx, stock_list, orders):
+    """所有代码同时请求K线与报价（分析路径），期间插入若干次选期权+下单（下单路径）"""
+    order_latency = []
+    failures = []
+
+    def analysis(code):
+        ret, *_ = quote_ctx.request_history_kline(code, start='2000-01-01', end='2099-12-31', ktype='K_1M')
+        if ret != 0:
+            failures.append(code)
+        ret, _ = quote_ctx.get_stock_quote([code])
+        if ret != 0:
+            failures.append(code)
+
+    def order(code):
+        start = time.perf_counter()
+        with order_priority(quote_ctx, trade_ctx):
+            ret, chain = quote_ctx.get_option_chain(code, option_type='CALL')
+            if ret != 0:
+                failures.append(code)
+                return
+            ret, _ = trade_ctx.place_order(price=0, qty=500, code=chain['code'].iloc[0], trd_side=TrdSide.BUY)
+            if ret != 0:
+                failures.append(code)
+                return
+        order_latency.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=analysis, args=(code,)) for code in stock_list]
+    threads += [threading.Thread(target=order, args=(code,)) for code in stock_list[:orders]]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, order_latency, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='请求网关基准')
+    parser.add_argument('--symbols', type=int, default=80, help='同时分析的代码数量')
+    parser.add_argument('--orders', type=int, default=3, help='突发期间的下单次数')
+    parser.add_argument('--latency-ms', type=float, default=20, help='模拟的单次请求延迟（毫秒）')
+    parser.add_argument('--pool', type=int, default=2, help='网关的行情上下文连接数')
+    args = parser.parse_args()
+
+    stock_list = [f'HK.{i:05d}' for i in range(args.symbols)]
+    latency = args.latency_ms / 1000.0
+    for mode in ('direct', 'gateway'):
+        market = SimMarket()
+        quote_ctx = SimQuoteContext(market, latency=latency)
+        trade_ctx = SimTradeContext(market, latency=latency)
+        if mode == 'gateway':
+            quote_ctx = RequestGateway([quote_ctx] + [SimQuoteContext(market, latency=latency)
+                                                      for _ in range(args.pool - 1)])
+            trade_ctx = RequestGateway(trade_ctx)
+        # 报价只能在已订阅的连接上查询（经网关时订阅与报价都固定走第一个上下文）
+        quote_ctx.subscribe(stock_list, [SubType.QUOTE])
+        elapsed, order_latency, failures = burst(quote_ctx, trade_ctx, stock_list, args.orders)
+        contexts = quote_ctx.contexts if mode == 'gateway' else [quote_ctx]
+        rejected = {}
+        for ctx in contexts:
+            for name, count in ctx.rejected.items():
+                rejected[name] = rejected.get(name, 0) + count
+        order_ms = f'{np.max(order_latency) * 1000:8.1f}ms' if order_latency else '     n/a'
+        print(f'{mode:>8}  耗时 {elapsed:6.2f}s  下单路径最大延迟 {order_ms}  失败 {len(failures):3d}  被限频 {rejected}')
+
+
+if __name__ == '__main__':
+    main()
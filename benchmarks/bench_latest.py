@@ -0,0 +1,92 @@
+"""推送写入与最新行情查询的基准
+
+运行: python -m benchmarks.bench_latest
+"""
+import argparse
+import time
+from collections import deque
+
+import pandas as pd
+
+from benchmarks.synthetic import make_quote_pushes, to_push_frames
+from market_data import MarketDataCache, parse_time_ms
+
+
+def reference_latest(queue):
+    """原实现：复制整个队列并逐条 pd.to_datetime 比较（对照组）"""
+    if not queue:
+        return None
+    latest_data = queue[-1]
+    latest_time = pd.to_datetime(latest_data['data_date'] + ' ' + latest_data['data_time'])
+    for data in reversed(list(queue)[:-1]):
+        current_time = pd.to_datetime(data['data_date'] + ' ' + data['data_time'])
+        if current_time > latest_time:
+            latest_data = data
+            latest_time = current_time
+    return latest_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='最新行情查询基准')
+    parser.add_argument('--pushes', type=int, default=100000, help='推送条数')
+    parser.add_argument('--frames', type=int, default=5000, help='经 QuoteHandler 回放的推送帧数')
+    parser.add_argument('--codes', type=int, default=50, help='代码数量')
+    parser.add_argument('--maxlen', type=int, default=100, help='每个代码的历史长度')
+    parser.add_argument('--lookups', type=int, default=100000, help='查询次数')
+    args = parser.parse_args()
+
+    codes = [f'HK.OPT{i:04d}' for i in range(args.codes)]
+    pushes = make_quote_pushes(args.pushes, codes, seed=1)
+
+    # 写入：原实现只追加 dict 到队列，新实现解析时间、写入环形缓冲区并更新快照
+    queue = deque(maxlen=args.maxlen)
+    start = time.perf_counter()
+    for record in pushes:
+        queue.append(record)
+    old_insert = (time.perf_counter() - start) / args.pushes
+
+    cache = MarketDataCache(maxlen=args.maxlen)
+    start = time.perf_counter()
+    for record in pushes:
+        cache.add_quote(record['code'], parse_time_ms(f"{record['data_date']} {record['data_time']}"),
+                        record['last_price'], record['open_price'], record['high_price'],
+                        record['low_price'], record['volume'], record['turnover'])
+    new_insert = (time.perf_counter() - start) / args.pushes
+    print(f'写入  原实现 {old_insert * 1e6:8.2f} us/条   新实现 {new_insert * 1e6:8.2f} us/条'
+          f'   可承受推送速率约 {1 / new_insert:,.0f} 条/秒')
+
+    # 经 QuoteHandler.on_push 回放单行 DataFrame 推送帧
+    import main as trade_main
+    trade_main.market_data = MarketDataCache(maxlen=args.maxlen)
+    handler = trade_main.QuoteHandler(trade_main.logging.getLogger('Trade'))
+    frames = to_push_frames(pushes[:args.frames])
+    start = time.perf_counter()
+    for frame in frames:
+        handler.on_push(frame)
+    frame_insert = (time.perf_counter() - start) / len(frames)
+    print(f'回调  QuoteHandler.on_push {frame_insert * 1e6:8.2f} us/帧')
+    for code in codes:
+        history = trade_main.market_data.quote_history(code)
+        assert len(history) == 0 or (history['ts'] > 0).all()
+
+    # 等价性：全局最新一条
+    expected = reference_latest(queue)
+    actual = cache.latest_quote()
+    assert actual['ts'] >= parse_time_ms(f"{expected['data_date']} {expected['data_time']}")
+
+    n_old = max(args.lookups // 1000, 10)
+    start = time.perf_counter()
+    for _ in range(n_old):
+        reference_latest(queue)
+    old_lookup = (time.perf_counter() - start) / n_old
+
+    start = time.perf_counter()
+    for i in range(args.lookups):
+        cache.latest_quote(codes[i % args.codes])
+    new_lookup = (time.perf_counter() - start) / args.lookups
+    print(f'查询  原实现 {old_lookup * 1e6:8.2f} us/次   新实现 {new_lookup * 1e6:8.2f} us/次'
+          f'   加速 {old_lookup / new_lookup:,.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""推送与策略循环压测：模拟 OpenD 按设定速率推送，测量回调耗时与调度延迟
+
+运行: python -m benchmarks.bench_load --symbols 50 --rate 5000 --seconds 10
+"""
+import argparse
+import logging
+import tempfile
+import threading
+import time
+
+from futu import SubType, TrdEnv
+
+from benchmarks.sim_context import SimQuoteContext, SimTradeContext, SimMarket
+
+
+def main():
+    parser = argparse.ArgumentParser(description='推送与策略循环压测')
+    parser.add_argument('--symbols', type=int, default=50, help='订阅的代码数量')
+    parser.add_argument('--rate', type=float, default=5000, help='每秒推送轮数（每轮一个代码的行情/逐笔/摆盘）')
+    parser.add_argument('--seconds', type=float, default=10, help='压测时长')
+    parser.add_argument('--latency-ms', type=float, default=5, help='模拟的单次请求延迟（毫秒）')
+    parser.add_argument('--enforce-limits', action='store_true', help='按 OpenD 频率限制拒绝超额请求')
+    args = parser.parse_args()
+
+    import main as trade_main
+    from kline_store import KlineStore
+    from scheduler import EVENT_BAR_CLOSE, EVENT_TIMER
+    trade_main.logger = logging.getLogger('Trade')
+    trade_main.logger.setLevel(logging.ERROR)
+
+    market = SimMarket()
+    quote_ctx = SimQuoteContext(market, latency=args.latency_ms / 1000.0, enforce_limits=args.enforce_limits)
+    trade_ctx = SimTradeContext(market, latency=args.latency_ms / 1000.0, enforce_limits=args.enforce_limits)
+    stock_list = [f'HK.{i:05d}' for i in range(args.symbols)]
+
+    with tempfile.TemporaryDirectory() as root:
+        trade_main.kline_store = KlineStore(root=root, refresh_interval=trade_main.KLINE_REFRESH_INTERVAL)
+        trade_main.register_handlers(quote_ctx, trade_ctx)
+        trade_main.portfolio.reconcile(trade_ctx, TrdEnv.SIMULATE)
+        trade_main.order_pipeline.start(
+            place_func=lambda code, qty, trd_side, price, order_type, remark:
+            trade_main.send_order(trade_ctx, code, qty, trd_side, price, order_type, remark))
+        quote_ctx.subscribe(stock_list, [SubType.QUOTE, SubType.TICKER, SubType.ORDER_BOOK])
+        scheduler = trade_main.strategy_scheduler
+        scheduler.report_interval = 0
+        scheduler.register('macd', lambda code, event: trade_main.run_macd_strategy(quote_ctx, code),
+                           events=(EVENT_BAR_CLOSE, EVENT_TIMER), codes=stock_list)
+        scheduler.register('trend_reversal',
+                           lambda code, event: trade_main.run_trend_strategy(quote_ctx, trade_ctx, code),
+                           events=(EVENT_BAR_CLOSE, EVENT_TIMER), codes=stock_list)
+        runner = threading.Thread(target=scheduler.run, name='Scheduler', daemon=True)
+        runner.start()
+        quote_ctx.start_push(args.rate)
+        time.sleep(args.seconds)
+        quote_ctx.stop_push()
+        scheduler.stop()
+        runner.join(timeout=30)
+        trade_main.order_pipeline.stop()
+        trade_main.analysis_pool.shutdown()
+
+    pushes = quote_ctx.pushes
+    print(f'推送 {pushes} 条, {pushes / args.seconds:,.0f} 条/秒 (目标 {args.rate * 3:,.0f}), '
+          f'回调平均 {quote_ctx.push_seconds / max(pushes, 1) * 1e6:.1f} us/条')
+    print(f'请求数 {quote_ctx.requests + trade_ctx.requests}  按接口 {quote_ctx.calls}  被限频 {quote_ctx.rejected}')
+    print(f'调度事件计数 {scheduler._counters}')
+    print(f'账户状态 {trade_main.portfolio.stats}  订单 {trade_main.order_pipeline.stats}')
+    for name, stat in sorted(scheduler.latency_stats().items()):
+        print(f'{name:<40} n={stat["count"]:6d} p50={stat["p50"] * 1000:8.2f}ms '
+              f'p99={stat["p99"] * 1000:8.2f}ms max={stat["max"] * 1000:8.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
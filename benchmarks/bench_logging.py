@@ -0,0 +1,73 @@
+"""日志调用延迟基准：同步 handler 与异步队列在慢速磁盘下的单次 logger.info 耗时
+
+运行: python -m benchmarks.bench_logging --records 20000 --write-delay-us 50
+"""
+import argparse
+import io
+import logging
+import time
+
+import numpy as np
+
+from async_logging import BufferedStreamHandler, LazyFrame, make_async
+from benchmarks.synthetic import make_kline
+
+
+class SlowStream(io.StringIO):
+    """每次 flush 额外等待固定时间，模拟慢速磁盘"""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+        time.sleep(self.delay)
+
+
+def measure(logger, records, frame):
+    samples = np.empty(records)
+    for i in range(records):
+        start = time.perf_counter()
+        if i % 100 == 0:
+            logger.info("持仓:\n%s", LazyFrame(frame))
+        else:
+            logger.info("收到推送 %s 价格 %.3f", 'HK.00700', 100.0 + i * 0.001)
+        samples[i] = time.perf_counter() - start
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='日志调用延迟基准')
+    parser.add_argument('--records', type=int, default=20000, help='日志条数')
+    parser.add_argument('--write-delay-us', type=float, default=50, help='模拟的每次刷新磁盘耗时（微秒）')
+    args = parser.parse_args()
+
+    frame = make_kline(20)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s')
+    for mode in ('sync', 'async'):
+        logger = logging.getLogger(f'bench_logging.{mode}')
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        stream = SlowStream(args.write_delay_us / 1e6)
+        listener = None
+        if mode == 'sync':
+            handler = logging.StreamHandler(stream)
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+        else:
+            handler = BufferedStreamHandler(stream)
+            handler.setFormatter(formatter)
+            listener = make_async(logger, [handler])
+        start = time.perf_counter()
+        samples = measure(logger, args.records, frame)
+        elapsed = time.perf_counter() - start
+        if listener is not None:
+            listener.stop()
+        print(f'{mode:>5}  p50 {np.percentile(samples, 50) * 1e6:8.1f}us  p99 {np.percentile(samples, 99) * 1e6:8.1f}us  '
+              f'max {samples.max() * 1e6:9.1f}us  总耗时 {elapsed:.2f}s  刷新次数 {stream.flushes}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""摆盘模型基准：单线程每秒可处理的摆盘推送数与各查询的耗时
+
+运行: python -m benchmarks.bench_order_book --contracts 200 --updates 200000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from order_book import OrderBookCache
+
+
+def make_pushes(n_contracts, n_pushes, seed=0):
+    """预先生成摆盘推送（与 OrderBookHandlerBase 解析后的 dict 一致，每边10档）"""
+    rng = np.random.default_rng(seed)
+    pushes = []
+    for i in range(n_pushes):
+        code = f'HK.TCH{i % n_contracts:06d}'
+        price = round(1.0 + rng.normal(0, 0.01), 3)
+        volumes = rng.integers(1, 50, 20) * 500
+        pushes.append({
+            'code': code, 'svr_recv_time_bid': '', 'svr_recv_time_ask': '',
+            'Bid': [(round(price - (k + 1) * 0.001, 3), int(volumes[k]), 1, {}) for k in range(10)],
+            'Ask': [(round(price + (k + 1) * 0.001, 3), int(volumes[10 + k]), 1, {}) for k in range(10)],
+        })
+    return pushes
+
+
+def timeit(func, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - start) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description='摆盘模型基准')
+    parser.add_argument('--contracts', type=int, default=200, help='合约数量')
+    parser.add_argument('--updates', type=int, default=200000, help='推送条数')
+    args = parser.parse_args()
+
+    pushes = make_pushes(args.contracts, args.updates)
+    books = OrderBookCache()
+    start = time.perf_counter()
+    for data in pushes:
+        books.update(data)
+    elapsed = time.perf_counter() - start
+    print(f'更新 {args.updates} 条, {args.updates / elapsed:,.0f} 条/秒, 平均 {elapsed / args.updates * 1e6:.2f} us/条')
+
+    book = books.get(pushes[-1]['code'])
+    for name, func in (('best_ask', book.best_ask), ('spread', book.spread),
+                       ('estimate_fill(20000)', lambda: book.estimate_fill(20000, True)),
+                       ('depth', lambda: book.depth(True))):
+        print(f'{name:<22} {timeit(func, 100000) * 1e6:6.2f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""订单管道基准：同步逐笔下单与异步订单管道下，策略线程的阻塞时间与全部成交的耗时
+
+运行: python -m benchmarks.bench_order_pipeline --orders 40 --contracts 10 --latency-ms 50
+"""
+import argparse
+import threading
+import time
+
+from futu import RET_OK, TrdSide, OrderType, TradeOrderHandlerBase
+
+from benchmarks.sim_context import SimMarket, SimTradeContext
+from order_pipeline import OrderPipeline
+from portfolio import PortfolioState
+
+
+def make_orders(n_orders, n_contracts):
+    codes = [f'HK.{i:05d}' for i in range(n_contracts)]
+    return [(codes[i % n_contracts], 100) for i in range(n_orders)]
+
+
+class _OrderHandler(TradeOrderHandlerBase):
+    """与 main.TradeOrderHandler 相同：订单推送同时更新账户状态与订单管道"""
+
+    def __init__(self, pipeline, portfolio):
+        super().__init__()
+        self.pipeline = pipeline
+        self.portfolio = portfolio
+
+    def on_push(self, data):
+        self.portfolio.on_order(data)
+        self.pipeline.on_order(data)
+
+
+def run_sync(orders, latency):
+    """现有方式：策略线程逐笔调用 place_order，等待返回后读取成交价"""
+    trade_ctx = SimTradeContext(SimMarket(), latency=latency, enforce_limits=False)
+    prices = []
+    start = time.perf_counter()
+    for code, qty in orders:
+        ret, data, *_ = trade_ctx.place_order(price=0, qty=qty, code=code, trd_side=TrdSide.BUY,
+                                              order_type=OrderType.MARKET)
+        prices.append(float(data['dealt_avg_price'].iloc[0]) if ret == RET_OK else None)
+    blocked = time.perf_counter() - start
+    return blocked, blocked, prices
+
+
+def run_pipeline(orders, latency, workers):
+    """订单管道：策略线程只提交，成交均价由订单推送回调得到"""
+    trade_ctx = SimTradeContext(SimMarket(), latency=latency, enforce_limits=False)
+    pipeline = OrderPipeline(workers=workers)
+    portfolio = PortfolioState()
+    trade_ctx.set_handler(_OrderHandler(pipeline, portfolio))
+    pipeline.start(place_func=lambda code, qty, trd_side, price, order_type, remark: trade_ctx.place_order(
+        price=price, qty=qty, code=code, trd_side=trd_side, order_type=order_type, remark=remark))
+    fills = []
+    lock = threading.Lock()
+
+    def on_fill(ticket, qty, price):
+        with lock:
+            fills.append((ticket.id, qty, price))
+
+    start = time.perf_counter()
+    tickets = [pipeline.submit(code, qty, TrdSide.BUY, 0, OrderType.MARKET, on_fill=on_fill) for code, qty in orders]
+    blocked = time.perf_counter() - start
+    for ticket in tickets:
+        ticket.wait(30)
+    elapsed = time.perf_counter() - start
+    pipeline.stop()
+    return blocked, elapsed, [ticket.dealt_avg_price if ticket.filled else None for ticket in tickets], \
+        pipeline.stats, len(fills), portfolio.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='订单管道基准')
+    parser.add_argument('--orders', type=int, default=40, help='订单数量')
+    parser.add_argument('--contracts', type=int, default=10, help='合约数量')
+    parser.add_argument('--latency-ms', type=float, default=50, help='模拟的单次下单延迟（毫秒）')
+    parser.add_argument('--workers', type=int, default=4, help='订单管道下单线程数')
+    args = parser.parse_args()
+
+    orders = make_orders(args.orders, args.contracts)
+    latency = args.latency_ms / 1000.0
+    blocked, elapsed, sync_prices = run_sync(orders, latency)
+    print(f'同步下单   策略线程阻塞 {blocked * 1000:8.1f}ms  全部成交 {elapsed * 1000:8.1f}ms  '
+          f'成交 {sum(price is not None for price in sync_prices)}/{len(orders)}')
+    blocked, elapsed, prices, stats, n_fills, portfolio_stats = run_pipeline(orders, latency, args.workers)
+    print(f'订单管道   策略线程阻塞 {blocked * 1000:8.1f}ms  全部成交 {elapsed * 1000:8.1f}ms  '
+          f'成交 {sum(price is not None for price in prices)}/{len(orders)}  成交回调 {n_fills}')
+    print(f'订单统计 {stats}  账户状态 {portfolio_stats}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""多代码并发分析基准：K线走完时一轮分析 N 个代码的耗时（调度器串行 vs 以线程池为 executor）
+
+与生产路径一致：每个代码发布一个 bar_close 事件，由 StrategyScheduler 分发给 MACD 与流程图策略。
+
+运行: python -m benchmarks.bench_parallel --symbols 200 --latency-ms 20
+"""
+import argparse
+import logging
+import tempfile
+import time
+
+from futu import SubType
+
+from benchmarks.sim_context import SimQuoteContext, SimMarket
+
+
+def run(trade_main, quote_ctx, stock_list, workers):
+    """发布一轮 bar_close 事件并处理完，返回 (耗时, {code: {'macd': 结果, 'trend': 结果}})"""
+    from analysis_pool import AnalysisPool
+    from scheduler import EVENT_BAR_CLOSE, StrategyScheduler
+
+    results = {code: {} for code in stock_list}
+    pool = AnalysisPool(max_workers=workers)
+    scheduler = StrategyScheduler(fallback_interval=3600, report_interval=0, executor=pool)
+    scheduler.register('macd', lambda code, event: results[code].update(
+        macd=trade_main.run_macd_strategy(quote_ctx, code)), events=(EVENT_BAR_CLOSE,), codes=stock_list)
+    scheduler.register('trend_reversal', lambda code, event: results[code].update(
+        trend=trade_main.run_trend_strategy(quote_ctx, None, code, event)), events=(EVENT_BAR_CLOSE,),
+                       codes=stock_list)
+    try:
+        start = time.perf_counter()
+        ts = int(time.time() * 1000)
+        for code in stock_list:
+            scheduler.publish(EVENT_BAR_CLOSE, code, ts)
+        while scheduler.run_once(timeout=0):
+            pass
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.shutdown()
+    assert all(len(result) == 2 for result in results.values()), '部分代码没有完成分析'
+    return elapsed, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多代码并发分析基准')
+    parser.add_argument('--symbols', type=int, default=200, help='代码数量')
+    parser.add_argument('--workers', type=int, default=16, help='线程池大小')
+    parser.add_argument('--latency-ms', type=float, default=20, help='模拟的单次请求延迟（毫秒）')
+    parser.add_argument('--bar-interval', type=float, default=60, help='K线周期（秒），一轮分析需在此时间内完成')
+    args = parser.parse_args()
+
+    import main as trade_main
+    from kline_store import KlineStore
+    trade_main.logger = logging.getLogger('Trade')
+    trade_main.logger.setLevel(logging.ERROR)
+
+    stock_list = [f'HK.{i:05d}' for i in range(args.symbols)]
+    for workers in (1, args.workers):
+        with tempfile.TemporaryDirectory() as root:
+            trade_main.kline_store = KlineStore(root=root, refresh_interval=0)
+            quote_ctx = SimQuoteContext(SimMarket(), latency=args.latency_ms / 1000.0, enforce_limits=False)
+            quote_ctx.subscribe(stock_list, [SubType.QUOTE])
+            cold, _ = run(trade_main, quote_ctx, stock_list, workers)
+            warm, results = run(trade_main, quote_ctx, stock_list, workers)
+        ok = sum(1 for result in results.values() if result['macd'] is not None)
+        verdict = '满足' if warm <= args.bar_interval else '超出'
+        print(f'workers={workers:3d}  首轮 {cold:7.2f}s  稳态 {warm:7.2f}s  请求数 {quote_ctx.requests:5d}  '
+              f'成功 {ok}/{args.symbols}  {verdict} {args.bar_interval:.0f}s K线周期')
+
+
+if __name__ == '__main__':
+    main()
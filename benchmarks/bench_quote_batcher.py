@@ -0,0 +1,70 @@
+"""报价合并基准：多线程各自查询单个代码报价时，直连与经 QuoteBatcher 的请求次数和耗时
+
+每轮所有代码的分析线程同时查询一次报价，随后持仓监控再批量读取一次（同一周期内的重复读取）。
+
+运行: python -m benchmarks.bench_quote_batcher --symbols 50 --rounds 20 --latency-ms 20
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+from futu import SubType
+
+from benchmarks.sim_context import SimQuoteContext, SimMarket
+from quote_batcher import QuoteBatcher
+
+
+def run_round(get_quote, stock_list):
+    latency = []
+    lock = threading.Lock()
+
+    def analysis(code):
+        start = time.perf_counter()
+        ret, data = get_quote([code])
+        if ret == 0 and data['code'].iloc[0] == code:
+            with lock:
+                latency.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=analysis, args=(code,)) for code in stock_list]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ret, data = get_quote(stock_list)
+    assert ret == 0 and data['code'].tolist() == stock_list
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description='报价合并基准')
+    parser.add_argument('--symbols', type=int, default=50, help='同时查询的代码数量')
+    parser.add_argument('--rounds', type=int, default=20, help='轮数')
+    parser.add_argument('--latency-ms', type=float, default=20, help='模拟的单次请求延迟（毫秒）')
+    parser.add_argument('--window-ms', type=float, default=3, help='合并窗口（毫秒）')
+    args = parser.parse_args()
+
+    stock_list = [f'HK.{i:05d}' for i in range(args.symbols)]
+    for mode in ('direct', 'batcher'):
+        quote_ctx = SimQuoteContext(SimMarket(), latency=args.latency_ms / 1000.0)
+        quote_ctx.subscribe(stock_list, [SubType.QUOTE])
+        if mode == 'batcher':
+            # 每轮间隔大于快照有效期，保证每轮都要重新请求
+            batcher = QuoteBatcher(window=args.window_ms / 1000.0, ttl=0.2)
+            get_quote = lambda codes: batcher.get_stock_quote(quote_ctx, codes)
+        else:
+            get_quote = lambda codes: quote_ctx.get_stock_quote(codes)[:2]
+        latency = []
+        for _ in range(args.rounds):
+            latency.extend(run_round(get_quote, stock_list))
+            if mode == 'batcher':
+                time.sleep(0.25)
+        samples = np.array(latency)
+        print(f'{mode:>8}  请求次数 {quote_ctx.calls.get("get_stock_quote", 0):5d}  '
+              f'p50 {np.percentile(samples, 50) * 1000:6.1f}ms  p99 {np.percentile(samples, 99) * 1000:6.1f}ms')
+        if mode == 'batcher':
+            print(f'          统计 {batcher.stats}')
+
+
+if __name__ == '__main__':
+    main()
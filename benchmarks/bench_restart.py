@@ -0,0 +1,83 @@
+"""热重启基准：冷启动（由全部历史K线重新计算指标与合成K线）与由状态快照恢复后接续计算的耗时
+
+运行: python -m benchmarks.bench_restart --symbols 50 --bars 9900
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bars import BarAggregator
+from benchmarks.synthetic import make_kline
+from indicators import IndicatorEngine
+from positions import PositionManager
+from state_snapshot import StateSnapshot
+
+RESUME_BARS = 330  # 重启后新到的K线数量（约一个交易日）
+
+
+def make_components():
+    return {'indicators': IndicatorEngine(), 'bars': BarAggregator(minutes=10),
+            'positions': PositionManager(0.2, -0.05)}
+
+
+def warm_up(components, klines, start=0, end=None):
+    for code, data in klines.items():
+        window = data.iloc[start:end]
+        components['indicators'].feed(code, window)
+        components['bars'].update(code, window)
+
+
+def import_seconds(module):
+    """在新进程中导入模块的耗时"""
+    code = f'import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)'
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return float(output.stdout.strip() or 'nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='热重启基准')
+    parser.add_argument('--symbols', type=int, default=50, help='代码数量')
+    parser.add_argument('--bars', type=int, default=9900, help='每个代码的1分钟K线数量（30个交易日约9900根）')
+    args = parser.parse_args()
+
+    klines = {f'HK.{i:05d}': make_kline(args.bars + RESUME_BARS, seed=i, code=f'HK.{i:05d}')
+              for i in range(args.symbols)}
+
+    # 冷启动：由全部K线计算
+    cold = make_components()
+    start = time.perf_counter()
+    warm_up(cold, klines)
+    cold_seconds = time.perf_counter() - start
+
+    # 运行中的进程：处理到 bars 根时写入快照
+    running = make_components()
+    warm_up(running, klines, end=args.bars)
+    running['positions'].open('HK.00000C100000', 1.0, 500)
+    with tempfile.TemporaryDirectory() as root:
+        snapshot = StateSnapshot(os.path.join(root, 'snapshot.pkl.z'), running)
+        snapshot.save()
+        size = os.path.getsize(snapshot.path)
+
+        # 热重启：读取快照，再用最近一个交易日的K线接续
+        warm = make_components()
+        start = time.perf_counter()
+        StateSnapshot(snapshot.path, warm).restore()
+        restored = time.perf_counter()
+        warm_up(warm, klines, start=args.bars - RESUME_BARS)
+        warm_seconds = time.perf_counter() - start
+
+    same = all(warm['indicators'].latest(code) == cold['indicators'].latest(code) and
+               warm['bars'].frame(code).equals(cold['bars'].frame(code)) for code in klines)
+    print(f'冷启动   {cold_seconds * 1000:8.1f}ms')
+    print(f'热重启   {warm_seconds * 1000:8.1f}ms  (读取快照 {(restored - start) * 1000:.1f}ms)  '
+          f'加速 {cold_seconds / warm_seconds:.0f}x  结果一致 {same}  持仓 {warm["positions"].codes()}')
+    print(f'快照 {size / 1024:.0f} KB  写入 {snapshot.stats["save_seconds"] * 1000:.1f}ms')
+    print(f'import main {import_seconds("main") * 1000:.0f}ms  import futu {import_seconds("futu") * 1000:.0f}ms')
+
+
+if __name__ == '__main__':
+    main()
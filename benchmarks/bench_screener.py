@@ -0,0 +1,82 @@
+"""代码池筛选基准：向量化矩阵筛选与逐代码判定（实盘单代码路径）的耗时和结果对比
+
+运行: python -m benchmarks.bench_screener --symbols 500 --bars 400
+"""
+import argparse
+import time
+
+import numpy as np
+
+from bars import resample_kline
+from benchmarks.synthetic import make_kline
+from indicators import calculate_ma, calculate_macd
+from kline_store import frame_to_records, records_to_frame
+from screener import BarMatrix, screen
+from signals import is_up_trend_array, is_reversal_array
+
+
+def make_universe(n_symbols, n_bars):
+    """合成代码池，约三分之一的代码带上涨趋势，一半的代码最后一分钟放量上涨"""
+    records = {}
+    for i in range(n_symbols):
+        code = f'HK.{i:05d}'
+        data = make_kline(n_bars, seed=i, code=code, base_price=20.0 + i % 200)
+        if i % 3 == 0:
+            data['close'] = data['close'] * np.linspace(1.0, 1.2, n_bars)
+            data['open'] = data['close'].shift(1).fillna(data['open'])
+        if i % 2 == 0:
+            last = n_bars - 1
+            data.loc[last - 1, 'open'] = data.loc[last - 1, 'close'] * 1.001
+            data.loc[last - 1, 'volume'] = 1
+            data.loc[last, 'open'] = data.loc[last - 1, 'close']
+            data.loc[last, 'close'] = data.loc[last, 'open'] * 1.01
+            data.loc[last, 'volume'] = data['volume'].max() * 50
+        records[code] = frame_to_records(data)
+    return records
+
+
+def per_symbol(records, trend_bars=30):
+    """逐代码判定：与 trend_reversal_strategy / analyze_stock 相同的单代码计算"""
+    hits = {}
+    for code, record in records.items():
+        kline_1m = records_to_frame(code, record)
+        kline_10m = resample_kline(kline_1m, 10).iloc[:-1].tail(trend_bars)
+        trend_reversal = (is_up_trend_array(kline_10m['close'].to_numpy()) and
+                          is_reversal_array(kline_1m['open'].to_numpy(), kline_1m['close'].to_numpy(),
+                                            kline_1m['volume'].to_numpy(), kline_10m['close'].to_numpy(),
+                                            kline_10m['volume'].to_numpy()))
+        macd, signal_line, _ = calculate_macd(kline_1m)
+        ma = calculate_ma(kline_1m, 20).iloc[-1]
+        macd_buy = (macd.iloc[-1] > signal_line.iloc[-1] and macd.iloc[-2] <= signal_line.iloc[-2] and
+                    kline_1m['close'].iloc[-1] > ma)
+        if trend_reversal or macd_buy:
+            hits[code] = (bool(trend_reversal), bool(macd_buy))
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description='代码池筛选基准')
+    parser.add_argument('--symbols', type=int, default=500, help='代码数量')
+    parser.add_argument('--bars', type=int, default=400, help='每个代码的1分钟K线数量')
+    args = parser.parse_args()
+
+    records = make_universe(args.symbols, args.bars)
+
+    start = time.perf_counter()
+    expected = per_symbol(records)
+    serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matrix = BarMatrix.from_records(records, lookback=args.bars)
+    built = time.perf_counter()
+    result = screen(matrix)
+    vectorized = time.perf_counter() - start
+    hits = {row.code: (bool(row.trend_reversal), bool(row.macd_buy)) for row in result.itertuples(index=False)}
+
+    print(f'逐代码   {serial * 1000:8.1f}ms  触发 {len(expected)}')
+    print(f'矩阵筛选 {vectorized * 1000:8.1f}ms  (构造矩阵 {(built - start) * 1000:.1f}ms)  触发 {len(hits)}  '
+          f'加速 {serial / vectorized:.0f}x  结果一致 {hits == expected}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""is_up_trend / is_reversal 向量化实现的微基准与等价性校验
+
+运行: python -m benchmarks.bench_signals
+"""
+import argparse
+import timeit
+
+import numpy as np
+
+from benchmarks.synthetic import make_kline, make_kline_matrix
+from signals import up_trend_stats, is_up_trend_array, is_reversal_array, batch_is_up_trend, batch_is_reversal
+
+
+def reference_is_up_trend(kline_10m):
+    """原逐行循环实现（对照组）"""
+    if len(kline_10m) < 2:
+        return False
+    up_count = 0
+    down_count = 0
+    up_sum = 0
+    down_sum = 0
+    for i in range(1, len(kline_10m)):
+        change = (kline_10m['close'].iloc[i] - kline_10m['close'].iloc[i-1]) / kline_10m['close'].iloc[i-1]
+        if change > 0:
+            up_count += 1
+            up_sum += change
+        else:
+            down_count += 1
+            down_sum += change
+    return up_count > down_count and up_sum > abs(down_sum)
+
+
+def reference_is_reversal(kline_1m, kline_10m):
+    """原 .iloc 标量访问实现（对照组）"""
+    if kline_1m.empty or kline_10m.empty:
+        return False
+    last_1m = kline_1m.iloc[-1]
+    last_10m = kline_10m.iloc[-1]
+    avg_volume_10m = kline_10m['volume'].mean()
+    if len(kline_1m) >= 2:
+        last_up = (kline_1m['close'].iloc[-1] - kline_1m['open'].iloc[-1]) / kline_1m['open'].iloc[-1]
+        prev_down = (kline_1m['open'].iloc[-2] - kline_1m['close'].iloc[-2]) / kline_1m['open'].iloc[-2]
+        if not (last_up > 2 * prev_down and last_up > 0):
+            return False
+    return (last_1m['close'] > last_1m['open'] and
+            last_1m['close'] > last_10m['close'] and
+            last_1m['volume'] > avg_volume_10m * 2 and last_1m['volume'] > kline_1m['volume'].iloc[-2] * 2)
+
+
+def vectorized_is_up_trend(kline_10m):
+    up_count, down_count, up_sum, down_sum = up_trend_stats(kline_10m['close'].to_numpy())
+    return bool(up_count > down_count and up_sum > abs(down_sum))
+
+
+def vectorized_is_reversal(kline_1m, kline_10m):
+    if kline_1m.empty or kline_10m.empty:
+        return False
+    return is_reversal_array(kline_1m['open'].to_numpy(), kline_1m['close'].to_numpy(),
+                             kline_1m['volume'].to_numpy(), kline_10m['close'].to_numpy(),
+                             kline_10m['volume'].to_numpy())
+
+
+def make_reversal_case(seed):
+    """生成一组1分钟/10分钟K线，约一半的样本人为构造放量上涨以覆盖触发分支"""
+    kline_1m = make_kline(30, seed=seed)
+    kline_10m = make_kline(30, seed=seed + 100000, freq='10min')
+    if seed % 2 == 0:
+        rng = np.random.default_rng(seed)
+        kline_1m.loc[kline_1m.index[-1], 'close'] = kline_1m['open'].iloc[-1] * (1 + rng.uniform(0, 0.02))
+        kline_1m.loc[kline_1m.index[-1], 'volume'] = int(kline_10m['volume'].mean() * rng.uniform(1, 4))
+    return kline_1m, kline_10m
+
+
+def check_equivalence(cases):
+    """校验向量化实现与原实现结果一致"""
+    trend_hits = reversal_hits = 0
+    for seed in range(cases):
+        kline_10m = make_kline(30, seed=seed, freq='10min')
+        expected = reference_is_up_trend(kline_10m)
+        assert vectorized_is_up_trend(kline_10m) == expected, f'is_up_trend 不一致: seed={seed}'
+        trend_hits += expected
+
+        kline_1m, kline_10m = make_reversal_case(seed)
+        expected = reference_is_reversal(kline_1m, kline_10m)
+        assert vectorized_is_reversal(kline_1m, kline_10m) == expected, f'is_reversal 不一致: seed={seed}'
+        reversal_hits += expected
+
+    open_, close, volume = make_kline_matrix(cases, 30, seed=1)
+    batch = batch_is_up_trend(close)
+    for i in range(cases):
+        assert bool(batch[i]) == is_up_trend_array(close[i])
+    batch = batch_is_reversal(open_, close, volume, close, volume)
+    for i in range(cases):
+        assert bool(batch[i]) == is_reversal_array(open_[i], close[i], volume[i], close[i], volume[i])
+    print(f'等价性校验通过: {cases} 组样本, 上涨趋势命中 {trend_hits}, 反转命中 {reversal_hits}')
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+    print(f'{label:<40s} {seconds * 1e6:12.1f} us/次')
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='is_up_trend / is_reversal 微基准')
+    parser.add_argument('--bars', type=int, default=30, help='10分钟K线数量')
+    parser.add_argument('--symbols', type=int, default=500, help='批量版本的代码数量')
+    parser.add_argument('--cases', type=int, default=200, help='等价性校验样本数')
+    args = parser.parse_args()
+
+    check_equivalence(args.cases)
+
+    kline_10m = make_kline(args.bars, seed=7, freq='10min')
+    kline_1m, _ = make_reversal_case(8)
+    old = bench('is_up_trend (原实现)', lambda: reference_is_up_trend(kline_10m), 200)
+    new = bench('is_up_trend (向量化)', lambda: vectorized_is_up_trend(kline_10m), 2000)
+    print(f'{"":<40s} 加速 {old / new:.1f}x')
+    old = bench('is_reversal (原实现)', lambda: reference_is_reversal(kline_1m, kline_10m), 200)
+    new = bench('is_reversal (向量化)', lambda: vectorized_is_reversal(kline_1m, kline_10m), 2000)
+    print(f'{"":<40s} 加速 {old / new:.1f}x')
+
+    open_, close, volume = make_kline_matrix(args.symbols, args.bars, seed=3)
+    frames = [make_kline(args.bars, seed=i, freq='10min') for i in range(args.symbols)]
+    old = bench(f'is_up_trend x{args.symbols} (原实现逐个)', lambda: [reference_is_up_trend(f) for f in frames], 1)
+    new = bench(f'batch_is_up_trend x{args.symbols}', lambda: batch_is_up_trend(close), 100)
+    print(f'{"":<40s} 加速 {old / new:.1f}x')
+    bench(f'batch_is_reversal x{args.symbols}', lambda: batch_is_reversal(open_, close, volume, close, volume), 100)
+
+
+if __name__ == '__main__':
+    main()
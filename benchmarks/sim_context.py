@@ -0,0 +1,432 @@
+"""模拟 OpenD：可替换 OpenQuoteContext / OpenSecTradeContext 的本地行情与交易上下文
+
+方法签名与富途接口一致，数据来自合成K线或录制的K线（{code: DataFrame}），
+可配置请求延迟、推送速率，并按 rate_limits.OPEND_RATE_LIMITS 模拟接口限频（超出时返回 RET_ERROR）。
+用于在没有 OpenD 和非交易时段对推送回调与策略循环做压测。
+"""
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from futu import (RET_OK, RET_ERROR, SubType, TrdSide, OrderType, StockQuoteHandlerBase, TickerHandlerBase,
+                  OrderBookHandlerBase, TradeOrderHandlerBase, TradeDealHandlerBase)
+
+from rate_limits import OPEND_RATE_LIMITS, SlidingWindowLimiter
+from market_data import EXCHANGE_TZ
+from benchmarks.synthetic import make_kline, make_option_chain
+
+SIM_BARS = 330  # 每个代码默认生成的1分钟K线数量（约一个交易日）
+SIM_LOT_SIZE = 100
+SIM_OPTION_LOT_SIZE = 500
+SIM_STRIKE_STEP = 0.01  # 期权行权价间距（标的价格的比例）
+SIM_STRIKES = 10  # 平值上下各生成的行权价数量
+SIM_CASH = 1000000.0
+MIN_SUBSCRIBE_SECONDS = 60
+
+
+def exchange_now():
+    """当前交易所时间（不带时区，与 OpenD 推送中的时间字符串一致）"""
+    return datetime.now(EXCHANGE_TZ).replace(tzinfo=None)
+
+
+class SimMarket:
+    """模拟市场：各代码的K线、最新价（随机游走）、期权合约与账户持仓，行情与交易上下文共享"""
+
+    def __init__(self, bars=None, seed=0, n_bars=SIM_BARS, volatility=0.0005, cash=SIM_CASH):
+        self.n_bars = n_bars
+        self.volatility = volatility
+        self.cash = cash
+        self._bars = dict(bars or {})
+        self._prices = {}
+        self._volumes = {}
+        self._options = {}  # 期权代码 -> (标的, 行权价, 到期日)
+        self._positions = {}  # code -> [数量, 成本价]
+        self._sequence = 0
+        self._limiters = {}  # OpenD 的频率限制按账户计算，同一市场的所有上下文共享
+        self._rng = np.random.default_rng(seed)
+        self._seed = seed
+        self._lock = threading.Lock()
+
+    def limiters(self, rate_limits=None):
+        with self._lock:
+            for name, limit in (rate_limits or OPEND_RATE_LIMITS).items():
+                if name not in self._limiters:
+                    self._limiters[name] = SlidingWindowLimiter(*limit)
+            return self._limiters
+
+    def bars(self, code):
+        """代码的1分钟K线（没有录制数据时生成截至当前时间的合成K线）"""
+        with self._lock:
+            data = self._bars.get(code)
+            if data is None:
+                now = pd.Timestamp(exchange_now()).floor('min')
+                start = (now - pd.Timedelta(minutes=self.n_bars - 1)).strftime('%Y-%m-%d %H:%M:%S')
+                data = make_kline(self.n_bars, seed=(hash(code) + self._seed) % 100000, code=code, start=start)
+                self._bars[code] = data
+            return data
+
+    def price(self, code):
+        """最新价；期权价格由标的价格按内在价值加时间价值估算"""
+        option = self._options.get(code)
+        if option is not None:
+            underlying, strike, _ = option
+            spot = self.price(underlying)
+            return round(max(spot - strike, 0.0) + spot * 0.01, 3)
+        price = self._prices.get(code)
+        if price is None:
+            price = float(self.bars(code)['close'].iloc[-1])
+            self._prices[code] = price
+            self._volumes[code] = int(self.bars(code)['volume'].sum())
+        return price
+
+    def tick(self, code):
+        """推进一次随机游走，返回 (价格, 成交量, 序号)"""
+        price = self.price(code)
+        if code not in self._options:
+            price = round(price * (1 + self._rng.normal(0, self.volatility)), 3)
+            self._prices[code] = price
+        volume = int(self._rng.integers(1, 100)) * SIM_LOT_SIZE
+        self._volumes[code] = self._volumes.get(code, 0) + volume
+        self._sequence += 1
+        return price, volume, self._sequence
+
+    def option_chain(self, code, option_type):
+        chain = make_option_chain(code, self.price(code), SIM_STRIKES, SIM_STRIKE_STEP, option_type,
+                                  lot_size=SIM_OPTION_LOT_SIZE, start=exchange_now().strftime('%Y-%m-%d'))
+        for option_code, strike, expiry in zip(chain['code'], chain['strike_price'], chain['strike_time']):
+            self._options[option_code] = (code, strike, expiry)
+        return chain
+
+    def lot_size(self, code):
+        return SIM_OPTION_LOT_SIZE if code in self._options else SIM_LOT_SIZE
+
+    def fill(self, code, qty, trd_side):
+        """市价成交，更新现金与持仓，返回成交价"""
+        price = self.price(code)
+        with self._lock:
+            position = self._positions.setdefault(code, [0, 0.0])
+            if trd_side == TrdSide.BUY:
+                position[1] = (position[0] * position[1] + qty * price) / (position[0] + qty)
+                position[0] += qty
+                self.cash -= qty * price
+            else:
+                qty = min(qty, position[0])
+                position[0] -= qty
+                self.cash += qty * price
+                if position[0] == 0:
+                    del self._positions[code]
+        return price, qty
+
+    def positions(self):
+        with self._lock:
+            return {code: tuple(position) for code, position in self._positions.items()}
+
+
+class _SimContext:
+    """延迟、限频与统计的公共部分"""
+
+    def __init__(self, market, latency=0.0, jitter=0.0, rate_limits=None, enforce_limits=True):
+        self.market = market
+        self.latency = latency
+        self.jitter = jitter
+        self.enforce_limits = enforce_limits
+        self._limiters = market.limiters(rate_limits)
+        self._handlers = []
+        self._rng = np.random.default_rng(0)
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.calls = {}  # 接口名 -> 调用次数
+        self.rejected = {}  # 接口名 -> 因限频被拒绝的次数
+
+    def _request(self, name):
+        """记录一次请求并模拟延迟，超出频率限制时返回错误信息"""
+        with self._stats_lock:
+            self.requests += 1
+            self.calls[name] = self.calls.get(name, 0) + 1
+        limiter = self._limiters.get(name)
+        if self.enforce_limits and limiter is not None and not limiter.try_acquire():
+            with self._stats_lock:
+                self.rejected[name] = self.rejected.get(name, 0) + 1
+            return f'{name} 请求频率太高，请稍后再试'
+        delay = self.latency + (self._rng.exponential(self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        return None
+
+    def set_handler(self, handler):
+        self._handlers.append(handler)
+        return RET_OK
+
+    def _handlers_of(self, base):
+        return [handler for handler in self._handlers if isinstance(handler, base)]
+
+    def close(self):
+        pass
+
+
+class SimQuoteContext(_SimContext):
+    """模拟行情上下文，start_push 后按设定速率向已订阅代码的 handler 推送
+
+    与 OpenD 一致，get_stock_quote 只接受在本上下文上已订阅 QUOTE 的代码，有一个未订阅则整次请求失败
+    （require_subscription=False 时不检查）。
+    """
+
+    def __init__(self, market=None, latency=0.0, jitter=0.0, rate_limits=None, enforce_limits=True,
+                 min_subscribe=MIN_SUBSCRIBE_SECONDS, require_subscription=True):
+        super().__init__(market or SimMarket(), latency, jitter, rate_limits, enforce_limits)
+        self.min_subscribe = min_subscribe
+        self.require_subscription = require_subscription
+        self._subscribed = {}  # (code, subtype) -> 订阅时刻
+        self._push_thread = None
+        self._pushing = False
+        self._templates = {}  # (code, subtype) -> 单行推送 DataFrame 模板
+        self.pushes = 0
+        self.push_seconds = 0.0  # 推送回调累计耗时（不含生成推送数据）
+
+    def request_history_kline(self, code, start=None, end=None, ktype='K_DAY', autype='qfq', fields=None,
+                              max_count=1000, page_req_key=None, **kwargs):
+        error = self._request('request_history_kline')
+        if error:
+            return RET_ERROR, error, None
+        data = self.market.bars(code)
+        time_keys = data['time_key'].values
+        lo = time_keys.searchsorted(start or '', side='left')
+        hi = time_keys.searchsorted((end or '9999-12-31') + ' 23:59:59', side='right')
+        offset = lo + (page_req_key or 0)
+        page_end = min(offset + max_count, hi)
+        next_key = page_end - lo if page_end < hi else None
+        return RET_OK, data.iloc[offset:page_end].reset_index(drop=True), next_key
+
+    def get_stock_quote(self, code_list):
+        error = self._request('get_stock_quote')
+        if error:
+            return RET_ERROR, error
+        missing = [code for code in code_list if (code, SubType.QUOTE) not in self._subscribed]
+        if self.require_subscription and missing:
+            return RET_ERROR, f'{missing} 未订阅 QUOTE，请先订阅'
+        now = exchange_now()
+        rows = [{'code': code, 'data_date': now.strftime('%Y-%m-%d'), 'data_time': now.strftime('%H:%M:%S'),
+                 'last_price': self.market.price(code), 'lot_size': self.market.lot_size(code)}
+                for code in code_list]
+        return RET_OK, pd.DataFrame(rows)
+
+    def get_option_chain(self, code, index_option_type=None, start=None, end=None, option_type='ALL', **kwargs):
+        error = self._request('get_option_chain')
+        if error:
+            return RET_ERROR, error
+        return RET_OK, self.market.option_chain(code, option_type)
+
+    def subscribe(self, code_list, subtype_list, **kwargs):
+        now = time.monotonic()
+        for code in code_list:
+            for subtype in subtype_list:
+                self._subscribed.setdefault((code, subtype), now)
+        return RET_OK, None
+
+    def unsubscribe(self, code_list, subtype_list, **kwargs):
+        now = time.monotonic()
+        for code in code_list:
+            for subtype in subtype_list:
+                since = self._subscribed.get((code, subtype))
+                if since is not None and now - since < self.min_subscribe:
+                    return RET_ERROR, f'{code} 订阅不足一分钟，不能反订阅'
+        for code in code_list:
+            for subtype in subtype_list:
+                self._subscribed.pop((code, subtype), None)
+        return RET_OK, None
+
+    def query_subscription(self, is_all_conn=True):
+        subscribed = {}
+        for code, subtype in self._subscribed:
+            subscribed.setdefault(subtype, []).append(code)
+        return RET_OK, {'total_used': len(self._subscribed), 'sub_list': subscribed}
+
+    def _codes_for(self, subtype):
+        return [code for code, kind in list(self._subscribed) if kind == subtype]
+
+    def _frame(self, code, kind, record):
+        """复制该代码的单行推送模板并写入新值（比每次构造 DataFrame 快数倍）"""
+        template = self._templates.get((code, kind))
+        if template is None:
+            template = pd.DataFrame([record])
+            self._templates[(code, kind)] = template
+            return template.copy()
+        data = template.copy()
+        for i, value in enumerate(record.values()):
+            data.iat[0, i] = value
+        return data
+
+    def _deliver(self, base, data):
+        started = time.perf_counter()
+        for handler in self._handlers_of(base):
+            handler.on_push(data)
+        self.push_seconds += time.perf_counter() - started
+        self.pushes += 1
+
+    def push_once(self, code):
+        """为一个代码生成一轮推送（行情、逐笔、摆盘中已订阅的类型），返回推送条数"""
+        market = self.market
+        price, volume, sequence = market.tick(code)
+        now = exchange_now()
+        date_str, time_str = now.strftime('%Y-%m-%d'), now.strftime('%H:%M:%S.%f')[:12]
+        pushes = self.pushes
+        if (code, SubType.QUOTE) in self._subscribed:
+            self._deliver(StockQuoteHandlerBase, self._frame(code, SubType.QUOTE, {
+                'code': code, 'data_date': date_str, 'data_time': time_str, 'last_price': price,
+                'open_price': price, 'high_price': price, 'low_price': price,
+                'volume': market._volumes.get(code, 0), 'turnover': price * volume}))
+        if (code, SubType.TICKER) in self._subscribed:
+            self._deliver(TickerHandlerBase, self._frame(code, SubType.TICKER, {
+                'code': code, 'time': f'{date_str} {time_str}', 'price': price, 'volume': volume,
+                'turnover': price * volume, 'ticker_direction': 'BUY', 'sequence': sequence}))
+        if (code, SubType.ORDER_BOOK) in self._subscribed:
+            self._deliver(OrderBookHandlerBase, self._order_book(code, price, volume, f'{date_str} {time_str}'))
+        return self.pushes - pushes
+
+    @staticmethod
+    def _order_book(code, price, volume, time_str, num=10):
+        tick = max(round(price * 0.001, 3), 0.001)
+        return {'code': code, 'name': code, 'svr_recv_time_bid': time_str, 'svr_recv_time_ask': time_str,
+                'Bid': [(round(price - (k + 1) * tick, 3), volume, 1, {}) for k in range(num)],
+                'Ask': [(round(price + (k + 1) * tick, 3), volume, 1, {}) for k in range(num)]}
+
+    def get_order_book(self, code, num=10):
+        """当前摆盘（与推送的 dict 格式一致），需先订阅 ORDER_BOOK"""
+        error = self._request('get_order_book')
+        if error:
+            return RET_ERROR, error
+        if (code, SubType.ORDER_BOOK) not in self._subscribed:
+            return RET_ERROR, f'{code} 未订阅 ORDER_BOOK，请先订阅'
+        return RET_OK, self._order_book(code, self.market.price(code), SIM_OPTION_LOT_SIZE * 10,
+                                        exchange_now().strftime('%Y-%m-%d %H:%M:%S.%f')[:23], num)
+
+    def start_push(self, rate):
+        """后台线程按每秒 rate 轮（每轮一个代码）向已订阅代码推送"""
+        self.stop_push()
+        self._pushing = True
+        self._push_thread = threading.Thread(target=self._push_loop, args=(rate,), name='SimPush', daemon=True)
+        self._push_thread.start()
+
+    def stop_push(self):
+        self._pushing = False
+        if self._push_thread is not None:
+            self._push_thread.join(timeout=5)
+            self._push_thread = None
+
+    def _push_loop(self, rate):
+        started = time.monotonic()
+        sent = 0
+        index = 0
+        while self._pushing:
+            codes = sorted({code for code, _ in list(self._subscribed)})
+            if not codes:
+                time.sleep(0.01)
+                continue
+            due = int((time.monotonic() - started) * rate)
+            if sent >= due:
+                time.sleep(min(0.001, 1.0 / rate))
+                continue
+            for _ in range(min(due - sent, len(codes) * 10)):
+                self.push_once(codes[index % len(codes)])
+                index += 1
+                sent += 1
+            if due - sent > rate:
+                # 回调处理不过来时不再补发积压的推送
+                sent = due
+
+    def close(self):
+        self.stop_push()
+
+
+class SimTradeContext(_SimContext):
+    """模拟交易上下文：订单按最新价立即成交（期权与 OpenD 一致只接受限价单），更新模拟账户并推送订单/成交回报"""
+
+    def __init__(self, market=None, latency=0.0, jitter=0.0, rate_limits=None, enforce_limits=True):
+        super().__init__(market or SimMarket(), latency, jitter, rate_limits, enforce_limits)
+        self._order_id = 0
+        self._orders = []  # 已提交订单的行（order_list_query 返回）
+        self._orders_lock = threading.Lock()
+
+    def place_order(self, price, qty, code, trd_side, order_type='NORMAL', adjust_limit=0, trd_env='REAL',
+                    acc_id=0, acc_index=0, remark=None, **kwargs):
+        error = self._request('place_order')
+        if error:
+            return RET_ERROR, error
+        if order_type == OrderType.MARKET and code in self.market._options:
+            return RET_ERROR, f'{code} 期权不支持市价单'
+        lot_size = self.market.lot_size(code)
+        if qty <= 0 or qty % lot_size:
+            return RET_ERROR, f'数量 {qty} 不是每手 {lot_size} 股的整数倍'
+        deal_price, dealt_qty = self.market.fill(code, qty, trd_side)
+        if dealt_qty <= 0:
+            return RET_ERROR, f'{code} 没有可卖出的持仓'
+        with self._orders_lock:
+            self._order_id += 1
+            order_id = str(self._order_id)
+        now = exchange_now().strftime('%Y-%m-%d %H:%M:%S.%f')[:23]
+        row = {'code': code, 'stock_name': code, 'trd_side': trd_side, 'order_type': order_type,
+               'order_status': 'FILLED_ALL', 'order_id': order_id, 'qty': qty, 'price': price or deal_price,
+               'create_time': now, 'updated_time': now, 'dealt_qty': dealt_qty, 'dealt_avg_price': deal_price,
+               'trd_env': trd_env, 'remark': remark or ''}
+        with self._orders_lock:
+            self._orders.append(row)
+        order = pd.DataFrame([row])
+        for handler in self._handlers_of(TradeOrderHandlerBase):
+            handler.on_push(order)
+        deal = pd.DataFrame([{'code': code, 'stock_name': code, 'deal_id': order_id,
+                              'order_id': order_id, 'qty': dealt_qty, 'price': deal_price,
+                              'trd_side': trd_side, 'create_time': now, 'trd_env': trd_env}])
+        for handler in self._handlers_of(TradeDealHandlerBase):
+            handler.on_push(deal)
+        return RET_OK, order
+
+    def order_list_query(self, order_id='', status_filter_list=[], code='', start='', end='', trd_env='REAL',
+                         acc_id=0, acc_index=0, refresh_cache=False, **kwargs):
+        error = self._request('order_list_query')
+        if error:
+            return RET_ERROR, error
+        with self._orders_lock:
+            rows = [row for row in self._orders
+                    if (not order_id or row['order_id'] == str(order_id)) and (not code or row['code'] == code)
+                    and (not status_filter_list or row['order_status'] in status_filter_list)]
+        return RET_OK, pd.DataFrame(rows)
+
+    def modify_order(self, modify_order_op, order_id, qty, price, adjust_limit=0, trd_env='REAL', acc_id=0,
+                     acc_index=0, **kwargs):
+        """模拟订单均已立即成交，撤单/改单只校验订单是否存在"""
+        error = self._request('modify_order')
+        if error:
+            return RET_ERROR, error
+        with self._orders_lock:
+            found = any(row['order_id'] == str(order_id) for row in self._orders)
+        if not found:
+            return RET_ERROR, f'订单 {order_id} 不存在'
+        return RET_ERROR, f'订单 {order_id} 已全部成交，不能修改'
+
+    def accinfo_query(self, trd_env='REAL', acc_id=0, acc_index=0, refresh_cache=False, currency='HKD'):
+        error = self._request('accinfo_query')
+        if error:
+            return RET_ERROR, error
+        market_val = sum(qty * self.market.price(code) for code, (qty, _) in self.market.positions().items())
+        cash = self.market.cash
+        return RET_OK, pd.DataFrame([{'power': cash, 'total_assets': cash + market_val, 'cash': cash,
+                                      'market_val': market_val, 'currency': currency}])
+
+    def position_list_query(self, code='', pl_ratio_min=None, pl_ratio_max=None, trd_env='REAL', acc_id=0,
+                            acc_index=0, refresh_cache=False, **kwargs):
+        error = self._request('position_list_query')
+        if error:
+            return RET_ERROR, error
+        rows = []
+        for position_code, (qty, cost) in self.market.positions().items():
+            if code and position_code != code:
+                continue
+            price = self.market.price(position_code)
+            rows.append({'code': position_code, 'stock_name': position_code, 'qty': qty, 'can_sell_qty': qty,
+                         'cost_price': cost, 'nominal_price': price, 'market_val': qty * price,
+                         'pl_ratio': (price / cost - 1) * 100 if cost else 0.0, 'position_side': 'LONG'})
+        columns = ['code', 'stock_name', 'qty', 'can_sell_qty', 'cost_price', 'nominal_price', 'market_val',
+                   'pl_ratio', 'position_side']
+        return RET_OK, pd.DataFrame(rows, columns=columns)
@@ -0,0 +1,399 @@
+"""策略热点路径基准套件
+
+用带固定随机种子的合成数据（K线、行情/逐笔/摆盘推送、期权链）和模拟上下文离线运行，
+覆盖指标计算、信号判定、最新行情查询、选期权、推送回调与代码池筛选，按代码数与K线数分档。
+结果输出为 JSON，可保存为基线并在之后与基线比较（中位数变慢超过阈值视为回退，退出码为 1）。
+基线与机器相关，不纳入版本库：在同一台机器上保存并比较；运行环境（CPU/平台/Python）与基线不同时
+只列出比值、不判定回退，除非指定 --ignore-env。
+
+运行:
+    python -m benchmarks.suite                                   # 默认规模
+    python -m benchmarks.suite --scale full                      # 1~1000 个代码，1天~1年的1分钟K线
+    python -m benchmarks.suite --filter macd --filter handler    # 只运行名称包含关键字的用例
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json     # 在本机保存基线
+    python -m benchmarks.suite --output results.json --baseline benchmarks/baseline.json
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import (make_kline, make_kline_matrix, make_quote_pushes, make_ticker_pushes,
+                                  make_order_book_pushes, make_option_chain, to_push_frames)
+
+BARS_PER_DAY = 330  # 港股一个交易日的1分钟K线数量
+SCALES = {
+    'quick': {'symbols': (1, 10), 'bars': (BARS_PER_DAY,)},
+    'default': {'symbols': (1, 10, 100), 'bars': (BARS_PER_DAY, BARS_PER_DAY * 21)},
+    'full': {'symbols': (1, 10, 100, 1000), 'bars': (BARS_PER_DAY, BARS_PER_DAY * 21, BARS_PER_DAY * 250)},
+}
+SUITE_MIN_TIME = 0.05  # 每轮计时的最短时长（秒），据此确定每轮的调用次数
+SUITE_REPEATS = 5  # 计时轮数，结果取各轮每次调用耗时的中位数
+SUITE_THRESHOLD = 0.25  # 与基线比较时，中位数变化超过该比例才视为回退或提升
+SUITE_ENV_FIELDS = ('machine', 'processor', 'cpus', 'platform', 'python')  # 与基线不一致时不判定回退
+SCREEN_BARS = 400  # 筛选矩阵的K线数量（与 screener.SCREEN_LOOKBACK 一致）
+
+CASES = {}  # 用例名 -> (scale 维度, setup)
+
+
+def case(name, dims=()):
+    """注册用例：setup(**scale) 返回 (无参函数, 每次调用包含的操作数)"""
+    def register(setup):
+        CASES[name] = (dims, setup)
+        return setup
+    return register
+
+
+def trade_main():
+    """导入 main 并关闭其日志输出（基准只计算逻辑本身的耗时），每个用例使用空的订阅缓存"""
+    import main
+    from market_data import MarketDataCache
+    main.logger = logging.getLogger('Trade')
+    main.logger.setLevel(logging.CRITICAL)
+    main.market_data = MarketDataCache(maxlen=main.MAX_QUEUE_SIZE)
+    return main
+
+
+def symbols_of(n):
+    return [f'HK.{i:05d}' for i in range(n)]
+
+
+@case('calculate_ma', dims=('bars',))
+def setup_ma(bars):
+    from indicators import calculate_ma
+    data = make_kline(bars)
+    return lambda: calculate_ma(data, 20), 1
+
+
+@case('calculate_macd', dims=('bars',))
+def setup_macd(bars):
+    from indicators import calculate_macd
+    data = make_kline(bars)
+    return lambda: calculate_macd(data), 1
+
+
+@case('indicator_engine.update', dims=('bars',))
+def setup_indicator_update(bars):
+    """增量指标：已处理 bars 根K线后，最新一根K线的一次更新"""
+    from indicators import IndicatorEngine
+    data = make_kline(bars)
+    engine = IndicatorEngine()
+    engine.feed('HK.00700', data)
+    time_key, close = data['time_key'].iloc[-1], float(data['close'].iloc[-1])
+    return lambda: engine.update('HK.00700', time_key, close), 1
+
+
+@case('bar_aggregator.update', dims=('bars',))
+def setup_bar_update(bars):
+    """由1分钟K线合成10分钟K线：只处理新到的K线（轮询时的常见情况）"""
+    from bars import BarAggregator
+    data = make_kline(bars)
+    aggregator = BarAggregator(minutes=10)
+    aggregator.update('HK.00700', data)
+    return lambda: aggregator.update('HK.00700', data), 1
+
+
+@case('is_up_trend', dims=('bars',))
+def setup_up_trend(bars):
+    from bars import resample_kline
+    main = trade_main()
+    kline_10m = resample_kline(make_kline(bars), 10).iloc[:-1].tail(main.KLINE_10M_COUNT)
+    return lambda: main.is_up_trend(kline_10m), 1
+
+
+@case('is_reversal', dims=('bars',))
+def setup_reversal(bars):
+    from bars import resample_kline
+    main = trade_main()
+    kline_1m = make_kline(bars)
+    kline_10m = resample_kline(kline_1m, 10).iloc[:-1].tail(main.KLINE_10M_COUNT)
+    return lambda: main.is_reversal(kline_1m, kline_10m), 1
+
+
+@case('screen', dims=('symbols',))
+def setup_screen(symbols):
+    """代码池向量化筛选（每个代码 SCREEN_BARS 根1分钟K线）"""
+    from screener import BarMatrix, screen
+    open_, close, volume = make_kline_matrix(symbols, SCREEN_BARS)
+    times = pd.Timestamp('2026-01-05 09:31:00').value // 10 ** 9 + np.arange(SCREEN_BARS) * 60
+    matrix = BarMatrix(symbols_of(symbols), times, open_, close, np.maximum(open_, close),
+                       np.minimum(open_, close), volume)
+    return lambda: screen(matrix), 1
+
+
+def push_case(kind, generator, symbols, n_pushes=2000):
+    """推送回调：按原始推送格式（行情/逐笔为单行 DataFrame，摆盘为 dict）依次调用 on_push"""
+    main = trade_main()
+    handler = main.handler_class(kind)(main.logger)
+    records = generator(n_pushes, symbols_of(symbols))
+    pushes = records if kind == 'OrderBookHandler' else to_push_frames(records)
+
+    def run():
+        for data in pushes:
+            handler.on_push(data)
+    return run, len(pushes)
+
+
+@case('handler.quote', dims=('symbols',))
+def setup_handler_quote(symbols):
+    return push_case('QuoteHandler', make_quote_pushes, symbols)
+
+
+@case('handler.ticker', dims=('symbols',))
+def setup_handler_ticker(symbols):
+    return push_case('TickerHandler', make_ticker_pushes, symbols)
+
+
+@case('handler.order_book', dims=('symbols',))
+def setup_handler_order_book(symbols):
+    return push_case('OrderBookHandler', make_order_book_pushes, symbols)
+
+
+@case('get_latest_quote_data', dims=('symbols',))
+def setup_latest_quote(symbols):
+    """订阅缓存中有 symbols 个代码时，按代码查询最新行情"""
+    main = trade_main()
+    handler = main.handler_class('QuoteHandler')(main.logger)
+    codes = symbols_of(symbols)
+    for data in to_push_frames(make_quote_pushes(max(symbols * 10, 100), codes)):
+        handler.on_push(data)
+    return lambda: [main.get_latest_quote_data(code) for code in codes], len(codes)
+
+
+@case('get_latest_quote_data.any', dims=('symbols',))
+def setup_latest_quote_any(symbols):
+    """不指定代码：在 symbols 个代码中找最新的一条"""
+    main = trade_main()
+    handler = main.handler_class('QuoteHandler')(main.logger)
+    for data in to_push_frames(make_quote_pushes(max(symbols * 10, 100), symbols_of(symbols))):
+        handler.on_push(data)
+    return lambda: main.get_latest_quote_data(), 1
+
+
+@case('get_option_to_buy', dims=('symbols',))
+def setup_option_to_buy(symbols):
+    """在 symbols 个标的间轮流选期权（期权链已缓存；报价不合并、不使用快照，即每次都请求模拟上下文）"""
+    from benchmarks.sim_context import SimMarket, SimQuoteContext
+    from quote_batcher import QuoteBatcher
+    main = trade_main()
+    main.quote_batcher = QuoteBatcher(window=0, ttl=0)
+    market = SimMarket()
+    quote_ctx = SimQuoteContext(market, enforce_limits=False)
+    codes = symbols_of(symbols)
+    # 标的与期权合约的报价都需先订阅
+    option_codes = [code for underlying in codes for code in market.option_chain(underlying, 'CALL')['code']]
+    quote_ctx.subscribe(codes + option_codes, ['QUOTE'])
+    for code in codes:
+        main.get_option_to_buy(quote_ctx, code)
+
+    def run():
+        for code in codes:
+            main.get_option_to_buy(quote_ctx, code)
+    return run, len(codes)
+
+
+@case('option_chain.nearest_strikes', dims=('symbols',))
+def setup_nearest_strikes(symbols):
+    """期权链按距离排序取最近的候选合约（symbols 个到期日的期权链，每个到期日21个行权价）"""
+    from options import nearest_strikes, OPTION_CANDIDATES
+    chain = make_option_chain('HK.00700', 100.0, expiries=symbols)
+    return lambda: nearest_strikes(chain, 100.3, OPTION_CANDIDATES), 1
+
+
+def measure(func, ops, min_time=SUITE_MIN_TIME, repeats=SUITE_REPEATS):
+    """每轮调用 number 次（使单轮不短于 min_time），返回每次操作耗时（秒）的统计
+
+    与 timeit 一样在计时期间关闭垃圾回收，结果不受之前用例遗留对象数量的影响。
+    """
+    func()  # 预热（缓存、惰性导入）
+    enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        return _measure(func, ops, min_time, repeats)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _measure(func, ops, min_time, repeats):
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(int(min_time / elapsed * 1.2), 10))
+    samples = [elapsed / (number * ops)]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / (number * ops))
+    return {'median': statistics.median(samples), 'min': min(samples), 'mean': statistics.fmean(samples),
+            'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            'number': number, 'ops': ops, 'repeats': len(samples)}
+
+
+def expand(scale, filters=()):
+    """展开为 (结果键, 用例名, scale 参数)，键形如 calculate_macd[bars=330]"""
+    for name, (dims, _) in CASES.items():
+        if filters and not any(keyword in name for keyword in filters):
+            continue
+        combos = [{}]
+        for dim in dims:
+            combos = [dict(combo, **{dim: value}) for combo in combos for value in scale[dim]]
+        for params in combos:
+            key = name + ('[' + ','.join(f'{dim}={value}' for dim, value in params.items()) + ']' if params else '')
+            yield key, name, params
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'created': datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+            'python': platform.python_version(), 'platform': platform.platform(), 'machine': platform.machine(),
+            'processor': platform.processor(), 'cpus': os.cpu_count(),
+            'numpy': np.__version__, 'pandas': pd.__version__}
+
+
+def run_suite(scale_name='default', filters=(), min_time=SUITE_MIN_TIME, repeats=SUITE_REPEATS, verbose=True):
+    scale = SCALES[scale_name]
+    results = {}
+    for key, name, params in expand(scale, filters):
+        _, setup = CASES[name]
+        try:
+            func, ops = setup(**params)
+            results[key] = measure(func, ops, min_time, repeats)
+        except Exception as e:
+            results[key] = {'error': f'{type(e).__name__}: {e}'}
+        if verbose:
+            print(format_result(key, results[key]), flush=True)
+    return {'meta': dict(environment(), scale=scale_name, filters=list(filters), min_time=min_time, repeats=repeats),
+            'results': results}
+
+
+def format_seconds(seconds):
+    for unit, factor in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= factor:
+            return f'{seconds / factor:8.2f}{unit}'
+    return f'{seconds / 1e-9:8.1f}ns'
+
+
+def format_result(key, result):
+    if 'error' in result:
+        return f'{key:<48} 失败: {result["error"]}'
+    spread = result['stdev'] / result['median'] * 100 if result['median'] else 0.0
+    return f'{key:<48} {format_seconds(result["median"])}/次  ±{spread:4.1f}%  ({result["number"]}x{result["ops"]})'
+
+
+def compare(current, baseline, threshold=SUITE_THRESHOLD):
+    """按中位数比较，返回 [(键, 基线, 当前, 比值, 状态)]，状态为 回退/提升/持平/新增/失败/缺失
+
+    只有完整运行（未指定 --filter）且规模与基线相同时才列出基线中有、本次没有的用例（缺失）。
+    """
+    rows = []
+    base_results = baseline['results']
+    for key, result in current['results'].items():
+        base = base_results.get(key)
+        if base is None or 'median' not in base or 'median' not in result:
+            rows.append((key, None, result.get('median'), None, '新增' if base is None else '失败'))
+            continue
+        ratio = result['median'] / base['median'] if base['median'] else float('inf')
+        status = '回退' if ratio > 1 + threshold else '提升' if ratio < 1 / (1 + threshold) else '持平'
+        rows.append((key, base['median'], result['median'], ratio, status))
+    meta, base_meta = current.get('meta', {}), baseline.get('meta', {})
+    complete = not meta.get('filters') and meta.get('scale') == base_meta.get('scale')
+    for key in base_results if complete else ():
+        if key not in current['results']:
+            rows.append((key, base_results[key].get('median'), None, None, '缺失'))
+    return rows
+
+
+def environment_mismatch(current, baseline):
+    """基线与本次运行环境不同的字段 [(名称, 基线, 当前)]"""
+    base_meta, meta = baseline.get('meta', {}), current.get('meta', {})
+    return [(name, base_meta.get(name), meta.get(name)) for name in SUITE_ENV_FIELDS
+            if base_meta.get(name) != meta.get(name)]
+
+
+def print_comparison(rows, current, baseline):
+    base_meta = baseline.get('meta', {})
+    print(f'\n与基线比较（基线 {base_meta.get("created")} {base_meta.get("commit")}）')
+    for name, base, value in environment_mismatch(current, baseline):
+        print(f'注意: 基线与当前运行环境不同 {name}: {base} -> {value}')
+    for key, base, value, ratio, status in rows:
+        if ratio is None:
+            print(f'{key:<48} {status}')
+            continue
+        print(f'{key:<48} {format_seconds(base)} -> {format_seconds(value)}  {ratio:5.2f}x  {status}')
+
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='策略热点路径基准套件')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='default', help='数据规模档位')
+    parser.add_argument('--filter', action='append', default=[], help='只运行名称包含该关键字的用例（可重复）')
+    parser.add_argument('--min-time', type=float, default=SUITE_MIN_TIME, help='每轮计时的最短时长（秒）')
+    parser.add_argument('--repeats', type=int, default=SUITE_REPEATS, help='计时轮数')
+    parser.add_argument('--output', help='结果 JSON 文件')
+    parser.add_argument('--baseline', help='与该基线 JSON 比较，有回退时退出码为 1')
+    parser.add_argument('--threshold', type=float, default=SUITE_THRESHOLD, help='回退判定阈值（比例）')
+    parser.add_argument('--save-baseline', help='把本次结果保存为基线（基线与机器相关，不要提交到版本库）')
+    parser.add_argument('--ignore-env', action='store_true', help='运行环境与基线不同时仍按阈值判定回退')
+    parser.add_argument('--list', action='store_true', help='列出用例后退出')
+    args = parser.parse_args()
+
+    if args.list:
+        for key, _, _ in expand(SCALES[args.scale], args.filter):
+            print(key)
+        return 0
+
+    current = run_suite(args.scale, args.filter, args.min_time, args.repeats)
+    if args.output:
+        save_json(args.output, current)
+    if args.save_baseline:
+        save_json(args.save_baseline, current)
+        print(f'已保存基线: {args.save_baseline}')
+    if args.baseline:
+        baseline = load_json(args.baseline)
+        rows = compare(current, baseline, args.threshold)
+        print_comparison(rows, current, baseline)
+        regressions = [row for row in rows if row[4] == '回退']
+        if regressions and environment_mismatch(current, baseline) and not args.ignore_env:
+            print(f'\n{len(regressions)} 个用例变慢超过 {args.threshold:.0%}，但基线来自不同的运行环境，不判定为回退'
+                  f'（请在本机用 --save-baseline 重新生成基线，或指定 --ignore-env）')
+            return 0
+        if regressions:
+            print(f'\n{len(regressions)} 个用例回退超过 {args.threshold:.0%}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+
+def make_kline(n_bars, seed=0, code='HK.00700', start='2026-01-05 09:31:00', freq='min', base_price=100.0):
+    """生成带固定随机种子的合成K线（列与 request_history_kline 一致）"""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.001, n_bars)
+    close = base_price * np.exp(np.cumsum(returns))
+    open_ = np.empty(n_bars)
+    open_[0] = base_price
+    open_[1:] = close[:-1]
+    spread = np.abs(rng.normal(0, 0.0005, n_bars)) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.lognormal(8, 1, n_bars).astype('i8')
+    time_key = pd.date_range(start, periods=n_bars, freq=freq).strftime('%Y-%m-%d %H:%M:%S')
+    return pd.DataFrame({
+        'code': code,
+        'time_key': time_key,
+        'open': open_,
+        'close': close,
+        'high': high,
+        'low': low,
+        'volume': volume,
+        'turnover': volume * close,
+    })
+
+
+def make_kline_matrix(n_symbols, n_bars, seed=0):
+    """生成 (代码数, K线数) 的开收盘价与成交量矩阵"""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.001, (n_symbols, n_bars))
+    close = 100.0 * np.exp(np.cumsum(returns, axis=1))
+    open_ = np.empty_like(close)
+    open_[:, 0] = 100.0
+    open_[:, 1:] = close[:, :-1]
+    volume = rng.lognormal(8, 1, (n_symbols, n_bars))
+    return open_, close, volume
+
+
+def make_quote_pushes(n_pushes, codes, seed=0, start='2026-01-05 09:30:00'):
+    """生成行情推送记录（dict，字段与 StockQuoteHandlerBase 推送一致），时间按毫秒递增，偶尔乱序"""
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp(start)
+    offsets = np.cumsum(rng.integers(0, 5, n_pushes))
+    # 约 1% 的推送晚到，用于覆盖乱序的情况
+    late = rng.random(n_pushes) < 0.01
+    offsets[late] -= 50
+    stamps = base + pd.to_timedelta(offsets, unit='ms')
+    dates = stamps.strftime('%Y-%m-%d')
+    times = stamps.strftime('%H:%M:%S.%f')
+    prices = 100.0 + rng.normal(0, 0.1, n_pushes).cumsum()
+    code_idx = rng.integers(0, len(codes), n_pushes)
+    return [{'code': codes[code_idx[i]], 'data_date': dates[i], 'data_time': times[i][:12],
+             'last_price': prices[i], 'open_price': 100.0, 'high_price': max(prices[i], 100.0),
+             'low_price': min(prices[i], 100.0), 'volume': int(i), 'turnover': float(i) * prices[i]}
+            for i in range(n_pushes)]
+
+
+def make_ticker_pushes(n_pushes, codes, seed=0, start='2026-01-05 09:30:00'):
+    """生成逐笔成交推送记录（dict，字段与 TickerHandlerBase 推送一致）"""
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp(start)
+    offsets = np.cumsum(rng.integers(0, 5, n_pushes))
+    times = (base + pd.to_timedelta(offsets, unit='ms')).strftime('%Y-%m-%d %H:%M:%S.%f')
+    prices = 100.0 + rng.normal(0, 0.1, n_pushes).cumsum()
+    code_idx = rng.integers(0, len(codes), n_pushes)
+    volumes = rng.integers(1, 100, n_pushes)
+    directions = np.where(rng.random(n_pushes) < 0.5, 'BUY', 'SELL')
+    return [{'code': codes[code_idx[i]], 'time': times[i][:23], 'price': prices[i],
+             'volume': int(volumes[i]), 'turnover': prices[i] * volumes[i],
+             'ticker_direction': directions[i], 'sequence': i}
+            for i in range(n_pushes)]
+
+
+def make_order_book_pushes(n_pushes, codes, seed=0, depth=10, start='2026-01-05 09:30:00'):
+    """生成摆盘推送（dict，结构与 OrderBookHandlerBase 推送一致）"""
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp(start)
+    offsets = np.cumsum(rng.integers(0, 5, n_pushes))
+    times = (base + pd.to_timedelta(offsets, unit='ms')).strftime('%Y-%m-%d %H:%M:%S.%f')
+    mids = 1.0 + np.abs(rng.normal(0, 0.01, n_pushes).cumsum())
+    code_idx = rng.integers(0, len(codes), n_pushes)
+    pushes = []
+    for i in range(n_pushes):
+        tick = 0.01
+        bid0 = round(mids[i] - tick, 2)
+        ask0 = round(mids[i] + tick, 2)
+        volumes = rng.integers(1, 50, 2 * depth)
+        pushes.append({
+            'code': codes[code_idx[i]], 'name': '',
+            'svr_recv_time_bid': times[i][:23], 'svr_recv_time_ask': times[i][:23],
+            'Bid': [(round(bid0 - k * tick, 2), int(volumes[k]), 1, {}) for k in range(depth)],
+            'Ask': [(round(ask0 + k * tick, 2), int(volumes[depth + k]), 1, {}) for k in range(depth)],
+        })
+    return pushes
+
+
+def make_option_chain(code, spot, n_strikes=10, step=0.01, option_type='CALL', expiries=1, lot_size=500,
+                      start=None):
+    """生成期权链（列与 get_option_chain 一致）
+
+    每个到期日在平值上下各 n_strikes 个行权价（间距为标的价格的 step 比例），
+    到期日从 start（默认今天）起每30天一个，合约代码为 标的 + C/P + 行权价*1000 + 到期日序号。
+    """
+    start = pd.Timestamp(start) if start is not None else pd.Timestamp.now().normalize()
+    suffix = 'C' if str(option_type).upper().endswith('CALL') else 'P'
+    rows = []
+    for e in range(expiries):
+        expiry = (start + pd.Timedelta(days=30 * (e + 1))).strftime('%Y-%m-%d')
+        for k in range(-n_strikes, n_strikes + 1):
+            strike = round(spot * (1 + k * step), 2)
+            option_code = f'{code}{suffix}{int(strike * 1000)}' + (f'{e}' if expiries > 1 else '')
+            rows.append({'code': option_code, 'name': option_code, 'lot_size': lot_size, 'stock_type': 'DRVT',
+                         'option_type': 'CALL' if suffix == 'C' else 'PUT', 'stock_owner': code,
+                         'strike_time': expiry, 'strike_price': strike})
+    return pd.DataFrame(rows)
+
+
+def to_push_frames(records):
+    """将推送记录逐条包装为单行 DataFrame，模拟富途推送回调的入参"""
+    return [pd.DataFrame([record]) for record in records]
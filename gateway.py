@@ -0,0 +1,200 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager, ExitStack
+
+from rate_limits import OPEND_RATE_LIMITS
+
+logger = logging.getLogger('Trade')
+
+PRIORITY_ORDER = 0  # 下单路径（选期权、下单、止盈止损卖出）
+PRIORITY_ANALYSIS = 1  # 行情分析
+
+# 只读接口：参数相同的在途请求合并为一次
+COALESCE_METHODS = frozenset({
+    'request_history_kline', 'get_stock_quote', 'get_option_chain', 'get_market_snapshot',
+    'accinfo_query', 'position_list_query', 'order_list_query', 'deal_list_query',
+})
+# 与连接绑定的接口：订阅与推送只走第一个上下文；
+# 需要先订阅的读取接口（OpenD 只接受在本连接上已订阅的代码）也走第一个，所有订阅都在那里
+STATEFUL_METHODS = frozenset({
+    'subscribe', 'unsubscribe', 'unsubscribe_all', 'query_subscription', 'set_handler', 'start', 'stop',
+    'get_stock_quote', 'get_order_book', 'get_rt_ticker', 'get_cur_kline', 'get_rt_data', 'get_broker_queue',
+})
+TOKEN_BURST_RATIO = 1 / 3  # 令牌桶容量占接口限额的比例
+
+
+class TokenBucket:
+    """按优先级排队的令牌桶
+
+    capacity 为允许的突发次数，rate 为每秒补充的令牌数。等待中的请求按 (优先级, 到达顺序)
+    依次获得令牌，下单路径的请求不会排在分析请求之后。
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._waiters = []  # (priority, seq) 最小堆
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    @classmethod
+    def for_limit(cls, max_calls, period, burst_ratio=TOKEN_BURST_RATIO):
+        """由 OpenD 的 “period 秒内最多 max_calls 次” 换算：任意 period 秒内的突发加补充不超过 max_calls"""
+        capacity = max(1, int(max_calls * burst_ratio))
+        return cls(max(max_calls - capacity, 1) / period, capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=PRIORITY_ANALYSIS):
+        """阻塞直到取得令牌，返回等待的秒数"""
+        started = time.monotonic()
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiters[0] == ticket and self.tokens >= 1:
+                        self.tokens -= 1
+                        return time.monotonic() - started
+                    self._cond.wait(max((1 - self.tokens) / self.rate, 0.001))
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+
+def _freeze(value):
+    """把参数转换为可哈希的键（列表 -> 元组，字典 -> 排序后的元组）"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+class RequestGateway:
+    """OpenD 请求网关
+
+    - 多个上下文组成连接池，请求分给当前在途最少的上下文；订阅/推送及依赖订阅的接口固定走第一个；
+    - 受限接口按令牌桶限频（OpenD 的限额按账户计算，池中所有上下文共享同一个桶）；
+    - 参数完全相同的只读请求在途时合并，后来者等待同一结果；
+    - with gateway.priority(PRIORITY_ORDER) 中发出的请求优先获得令牌。
+    网关本身可以当作上下文使用（gateway.get_stock_quote(...)）；合并的请求返回同一个对象，调用方不应修改。
+    """
+
+    def __init__(self, contexts, limits=None, coalesce=COALESCE_METHODS, stateful=STATEFUL_METHODS):
+        if not isinstance(contexts, (list, tuple)):
+            contexts = [contexts]
+        self.contexts = list(contexts)
+        self.coalesce = coalesce
+        self.stateful = stateful
+        self._buckets = {name: TokenBucket.for_limit(*limit)
+                         for name, limit in (OPEND_RATE_LIMITS if limits is None else limits).items()}
+        self._in_use = [0] * len(self.contexts)
+        self._inflight = {}  # 请求键 -> Future
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {'calls': 0, 'upstream': 0, 'coalesced': 0, 'throttled': 0, 'throttle_seconds': 0.0}
+
+    @contextmanager
+    def priority(self, level):
+        """在 with 块内发出的请求使用指定优先级"""
+        previous = getattr(self._local, 'priority', PRIORITY_ANALYSIS)
+        self._local.priority = level
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def _pick(self):
+        with self._lock:
+            index = min(range(len(self.contexts)), key=self._in_use.__getitem__)
+            self._in_use[index] += 1
+        return index
+
+    def _release(self, index):
+        with self._lock:
+            self._in_use[index] -= 1
+
+    def _invoke(self, name, args, kwargs):
+        bucket = self._buckets.get(name)
+        if bucket is not None:
+            waited = bucket.acquire(getattr(self._local, 'priority', PRIORITY_ANALYSIS))
+            if waited > 0.001:
+                with self._lock:
+                    self.stats['throttled'] += 1
+                    self.stats['throttle_seconds'] += waited
+                logger.info("接口 %s 触发限频，等待 %.2f 秒", name, waited)
+        with self._lock:
+            self.stats['upstream'] += 1
+        if name in self.stateful:
+            return getattr(self.contexts[0], name)(*args, **kwargs)
+        index = self._pick()
+        try:
+            return getattr(self.contexts[index], name)(*args, **kwargs)
+        finally:
+            self._release(index)
+
+    def call(self, name, *args, **kwargs):
+        """调用上下文接口 name"""
+        with self._lock:
+            self.stats['calls'] += 1
+        if name not in self.coalesce:
+            return self._invoke(name, args, kwargs)
+        key = (name, _freeze(args), _freeze(kwargs))
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.stats['coalesced'] += 1
+        if not owner:
+            return future.result()
+        try:
+            result = self._invoke(name, args, kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        attr = getattr(self.contexts[0], name)
+        if not callable(attr):
+            return attr
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    def close(self):
+        for ctx in self.contexts:
+            ctx.close()
+
+
+@contextmanager
+def order_priority(*contexts):
+    """with 块内经网关发出的请求按下单路径优先（不是网关的上下文忽略）"""
+    with ExitStack() as stack:
+        for ctx in contexts:
+            if isinstance(ctx, RequestGateway):
+                stack.enter_context(ctx.priority(PRIORITY_ORDER))
+        yield
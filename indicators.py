@@ -0,0 +1,227 @@
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+MA_PERIODS = (5, 10, 20)  # 移动平均线周期
+
+
+def calculate_ma(data, period):
+    """计算移动平均线"""
+    return data['close'].rolling(window=period).mean()
+
+
+def calculate_macd(data, fast=12, slow=26, signal=9):
+    """计算MACD指标"""
+    exp1 = data['close'].ewm(span=fast, adjust=False).mean()
+    exp2 = data['close'].ewm(span=slow, adjust=False).mean()
+    macd = exp1 - exp2
+    signal_line = macd.ewm(span=signal, adjust=False).mean()
+    hist = macd - signal_line
+    return macd, signal_line, hist
+
+
+def batch_ema(values, span):
+    """按行计算 EMA（与 ewm(span, adjust=False).mean() 相同的递推），values 形状为 (代码数, K线数)
+
+    每行开头的 NaN 保持为 NaN，第一个有效值作为初值；循环沿时间轴进行，每步同时处理所有代码。
+    """
+    values = np.asarray(values, dtype='f8')
+    alpha = 2.0 / (span + 1)
+    old_wt, new_wt = 1.0 - alpha, alpha
+    if values.shape[-1] == 0:
+        return np.empty_like(values)
+    # 转置为 (K线数, 代码数)，每一步读写连续内存
+    columns = np.ascontiguousarray(values.T)
+    out = np.empty_like(columns)
+    current = columns[0].copy()
+    out[0] = current
+    for t in range(1, len(columns)):
+        value = columns[t]
+        current = np.where(np.isnan(current), value, (old_wt * current + new_wt * value) / (old_wt + new_wt))
+        out[t] = current
+    return out.T
+
+
+def batch_macd(close, fast=12, slow=26, signal=9):
+    """批量计算MACD（与 calculate_macd 一致），close 形状为 (代码数, K线数)"""
+    macd = batch_ema(close, fast) - batch_ema(close, slow)
+    signal_line = batch_ema(macd, signal)
+    return macd, signal_line, macd - signal_line
+
+
+class _IndicatorState:
+    """单个代码的指标运行状态（与历史长度无关的常数空间）"""
+
+    __slots__ = ('windows', 'sums', 'ema_fast', 'ema_slow', 'ema_signal',
+                 'macd', 'signal', 'prev_macd', 'prev_signal', 'time_key', 'count')
+
+    def __init__(self, ma_periods):
+        self.windows = {period: deque(maxlen=period) for period in ma_periods}
+        self.sums = {period: 0.0 for period in ma_periods}
+        self.ema_fast = None
+        self.ema_slow = None
+        self.ema_signal = None
+        self.macd = None
+        self.signal = None
+        self.prev_macd = None
+        self.prev_signal = None
+        self.time_key = None
+        self.count = 0
+
+    def copy(self):
+        state = _IndicatorState(())
+        state.windows = {period: deque(window, maxlen=period) for period, window in self.windows.items()}
+        state.sums = dict(self.sums)
+        for name in self.__slots__[2:]:
+            setattr(state, name, getattr(self, name))
+        return state
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in self.__slots__[2:]}
+        data['windows'] = {period: list(window) for period, window in self.windows.items()}
+        data['sums'] = dict(self.sums)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(())
+        state.windows = {period: deque(window, maxlen=period) for period, window in data['windows'].items()}
+        state.sums = dict(data['sums'])
+        for name in cls.__slots__[2:]:
+            setattr(state, name, data[name])
+        return state
+
+
+class IndicatorEngine:
+    """增量指标引擎
+
+    为每个代码保存 MA 的滚动和与 MACD 的 EMA 状态，每根新K线 O(1) 更新，
+    计算结果与 calculate_ma / calculate_macd（pandas rolling / ewm(adjust=False)）一致。
+    最后一根K线可能尚未走完，同一 time_key 重复推送时会基于上一根K线的状态重新计算。
+    """
+
+    def __init__(self, fast=12, slow=26, signal=9, ma_periods=MA_PERIODS):
+        self.fast = fast
+        self.slow = slow
+        self.signal = signal
+        self.ma_periods = tuple(ma_periods)
+        self._alpha_fast = 2.0 / (fast + 1)
+        self._alpha_slow = 2.0 / (slow + 1)
+        self._alpha_signal = 2.0 / (signal + 1)
+        self._states = {}  # code -> 已走完K线的状态
+        self._pending = {}  # code -> 包含最新一根K线的状态
+        self._lock = threading.Lock()
+
+    def reset(self, code=None):
+        """清除指定代码（或全部）的状态"""
+        with self._lock:
+            if code is None:
+                self._states.clear()
+                self._pending.clear()
+            else:
+                self._states.pop(code, None)
+                self._pending.pop(code, None)
+
+    def _apply(self, state, time_key, close):
+        """在 state 上应用一根K线"""
+        for period in self.ma_periods:
+            window = state.windows[period]
+            if len(window) == period:
+                state.sums[period] -= window[0]
+            window.append(close)
+            state.sums[period] += close
+            if state.count % period == 0:
+                # 每滚动一整个窗口重新求和一次，消除浮点累计误差
+                state.sums[period] = math.fsum(window)
+
+        if state.ema_fast is None:
+            state.ema_fast = close
+            state.ema_slow = close
+        else:
+            state.ema_fast = (1 - self._alpha_fast) * state.ema_fast + self._alpha_fast * close
+            state.ema_slow = (1 - self._alpha_slow) * state.ema_slow + self._alpha_slow * close
+        macd = state.ema_fast - state.ema_slow
+        if state.ema_signal is None:
+            state.ema_signal = macd
+        else:
+            state.ema_signal = (1 - self._alpha_signal) * state.ema_signal + self._alpha_signal * macd
+
+        state.prev_macd = state.macd
+        state.prev_signal = state.signal
+        state.macd = macd
+        state.signal = state.ema_signal
+        state.time_key = time_key
+        state.count += 1
+
+    def update(self, code, time_key, close):
+        """推入一根K线，返回最新指标"""
+        with self._lock:
+            pending = self._pending.get(code)
+            if pending is not None and time_key < pending.time_key:
+                # 早于已处理的K线，忽略
+                return self._result(pending)
+            if pending is not None and time_key != pending.time_key:
+                # 上一根K线已走完，固化其状态
+                self._states[code] = pending
+            base = self._states.get(code)
+            state = base.copy() if base is not None else _IndicatorState(self.ma_periods)
+            self._apply(state, time_key, float(close))
+            self._pending[code] = state
+            return self._result(state)
+
+    def feed(self, code, kline_data):
+        """将K线 DataFrame 中尚未处理的部分推入引擎，返回最新指标"""
+        if kline_data is None or kline_data.empty:
+            return self.latest(code)
+        time_keys = kline_data['time_key'].values
+        closes = kline_data['close'].values
+        pending = self._pending.get(code)
+        start = 0
+        if pending is not None and time_keys[0] > pending.time_key:
+            # 数据不包含已处理的最后一根K线（如由较早的快照恢复后中间缺了K线），无法接续，按本次数据重新计算
+            self.reset(code)
+        elif pending is not None:
+            # time_key 为定长字符串，可直接按字典序二分查找
+            start = int(time_keys.searchsorted(pending.time_key, side='left'))
+        result = None
+        for i in range(start, len(time_keys)):
+            result = self.update(code, time_keys[i], closes[i])
+        return result if result is not None else self.latest(code)
+
+    def export_state(self):
+        """导出各代码的指标状态（用于状态快照），参数一并保存以便恢复时校验"""
+        with self._lock:
+            return {'params': (self.fast, self.slow, self.signal, self.ma_periods),
+                    'states': {code: state.to_dict() for code, state in self._states.items()},
+                    'pending': {code: state.to_dict() for code, state in self._pending.items()}}
+
+    def restore_state(self, data):
+        """恢复 export_state 导出的状态，参数不一致时忽略，返回恢复的代码数"""
+        if tuple(data['params']) != (self.fast, self.slow, self.signal, self.ma_periods):
+            return 0
+        with self._lock:
+            self._states = {code: _IndicatorState.from_dict(state) for code, state in data['states'].items()}
+            self._pending = {code: _IndicatorState.from_dict(state) for code, state in data['pending'].items()}
+            return len(self._pending)
+
+    def latest(self, code):
+        """返回最新指标，未有数据时返回 None"""
+        with self._lock:
+            state = self._pending.get(code)
+            return self._result(state) if state is not None else None
+
+    def _result(self, state):
+        result = {}
+        for period in self.ma_periods:
+            window = state.windows[period]
+            result[f'ma{period}'] = state.sums[period] / period if len(window) == period else float('nan')
+        result['macd'] = state.macd
+        result['signal'] = state.signal
+        result['hist'] = state.macd - state.signal
+        result['prev_macd'] = state.prev_macd
+        result['prev_signal'] = state.prev_signal
+        result['time_key'] = state.time_key
+        result['count'] = state.count
+        return result
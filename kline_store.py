@@ -0,0 +1,305 @@
+import io
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger('Trade')
+
+# 本地K线缓存的存储结构（定长记录，可直接内存映射）
+KLINE_DTYPE = np.dtype([
+    ('time_key', 'i8'),  # 秒级时间戳（按交易所本地时间）
+    ('open', 'f8'),
+    ('close', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('volume', 'i8'),
+    ('turnover', 'f8'),
+    ('pe_ratio', 'f8'),
+    ('turnover_rate', 'f8'),
+    ('change_rate', 'f8'),
+    ('last_close', 'f8'),
+])
+
+KLINE_PAGE_SIZE = 1000  # 单次请求的最大K线数量
+
+
+def time_key_to_int(time_keys):
+    """将 time_key 字符串转换为秒级整数时间戳"""
+    values = pd.to_datetime(pd.Series(time_keys)).values
+    return values.astype('datetime64[s]').astype('i8')
+
+
+def int_to_time_key(values):
+    """将秒级整数时间戳转换回 time_key 字符串"""
+    return pd.to_datetime(np.asarray(values, dtype='i8'), unit='s').strftime('%Y-%m-%d %H:%M:%S')
+
+
+def frame_to_records(data):
+    """将富途返回的K线 DataFrame 转换为定长记录数组"""
+    records = np.zeros(len(data), dtype=KLINE_DTYPE)
+    if len(data) == 0:
+        return records
+    records['time_key'] = time_key_to_int(data['time_key'])
+    for name in KLINE_DTYPE.names[1:]:
+        if name in data.columns:
+            values = pd.to_numeric(data[name], errors='coerce')
+            if KLINE_DTYPE[name].kind == 'i':
+                values = values.fillna(0)
+            records[name] = values.values
+        elif KLINE_DTYPE[name].kind == 'f':
+            records[name] = np.nan
+    return records
+
+
+def records_to_frame(code, records):
+    """将定长记录数组还原为与 request_history_kline 一致的 DataFrame"""
+    data = pd.DataFrame({name: np.asarray(records[name]) for name in KLINE_DTYPE.names})
+    data['time_key'] = int_to_time_key(records['time_key'])
+    data.insert(0, 'code', code)
+    return data
+
+
+class KlineStore:
+    """本地增量K线缓存
+
+    每个 (代码, K线类型) 对应磁盘上的一个 .npy 文件，读取时以内存映射方式加载。
+    每次获取时只请求最后一根已存K线所在日期之后的数据并合并，
+    避免每轮都重新下载整个时间窗口。没有新K线时不写文件、不重建 DataFrame；
+    有新K线时只在文件末尾追加（并覆盖未走完的最后一根）。
+    retention_days 不为 None 时只保留最近若干天的K线，更早的数据在同步时裁掉。
+    """
+
+    def __init__(self, root='data/kline', refresh_interval=0, retention_days=None):
+        self.root = root
+        self.refresh_interval = refresh_interval  # 两次网络刷新的最小间隔（秒）
+        self.retention_days = retention_days  # 保留的天数，None 表示不裁剪
+        self._records = {}
+        self._frames = {}
+        self._meta = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}  # (code, ktype) -> Lock，不同代码可并发同步
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._key_locks[key] = lock
+            return lock
+
+    def _path(self, code, ktype):
+        return os.path.join(self.root, str(ktype), f'{code}.npy')
+
+    def _meta_path(self, code, ktype):
+        return os.path.join(self.root, str(ktype), f'{code}.json')
+
+    def _load(self, code, ktype):
+        """从内存或磁盘加载已缓存的K线"""
+        key = (code, ktype)
+        if key in self._records:
+            return self._records[key], self._meta[key]
+        records = np.zeros(0, dtype=KLINE_DTYPE)
+        meta = {}
+        path = self._path(code, ktype)
+        try:
+            if os.path.exists(path):
+                records = np.load(path, mmap_mode='r')
+            if os.path.exists(self._meta_path(code, ktype)):
+                with open(self._meta_path(code, ktype), 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+        except Exception as e:
+            logger.error("读取本地K线缓存 %s 失败: %s", path, str(e))
+            records = np.zeros(0, dtype=KLINE_DTYPE)
+            meta = {}
+        self._set(key, records, meta)
+        return records, meta
+
+    def _set(self, key, records, meta):
+        self._records[key] = records
+        self._meta[key] = meta
+        self._frames.pop(key, None)
+
+    def _save(self, code, ktype, records, meta):
+        """原子写入K线缓存文件"""
+        path = self._path(code, ktype)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(records))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error("写入本地K线缓存 %s 失败: %s", path, str(e))
+            return
+        self._save_meta(code, ktype, meta)
+
+    def _append(self, code, ktype, keep, new_records, merged, meta):
+        """保留文件中前 keep 条记录，其后写入 new_records 并更新文件头中的长度
+
+        已有的内存映射仍指向同一文件，只追加、不截断；文件头长度变化或文件不完整时整体重写。
+        """
+        path = self._path(code, ktype)
+        try:
+            header = io.BytesIO()
+            np.lib.format.write_array_header_1_0(header, {
+                'descr': np.lib.format.dtype_to_descr(KLINE_DTYPE), 'fortran_order': False,
+                'shape': (len(merged),)})
+            with open(path, 'r+b') as f:
+                np.lib.format.read_magic(f)
+                shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+                offset = f.tell()
+                if (dtype != KLINE_DTYPE or offset != len(header.getvalue()) or shape[0] < keep
+                        or keep + len(new_records) < shape[0]):
+                    raise ValueError('文件头不一致')
+                f.seek(offset + keep * KLINE_DTYPE.itemsize)
+                f.write(np.ascontiguousarray(new_records).tobytes())
+                f.seek(0)
+                f.write(header.getvalue())
+        except Exception as e:
+            logger.info("本地K线缓存 %s 无法追加，整体重写: %s", path, str(e))
+            self._save(code, ktype, merged, meta)
+            return
+        self._save_meta(code, ktype, meta)
+
+    def _save_meta(self, code, ktype, meta):
+        try:
+            tmp_meta = self._meta_path(code, ktype) + '.tmp'
+            with open(tmp_meta, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(tmp_meta, self._meta_path(code, ktype))
+        except Exception as e:
+            logger.error("写入本地K线缓存 %s 失败: %s", self._meta_path(code, ktype), str(e))
+
+    def _retention_start(self):
+        """保留窗口的起始日期（YYYY-MM-DD），不裁剪时返回 None"""
+        if self.retention_days is None:
+            return None
+        return (datetime.now() - timedelta(days=self.retention_days)).strftime('%Y-%m-%d')
+
+    def fetch(self, quote_ctx, code, ktype, start_str, end_str):
+        """分页请求历史K线，返回定长记录数组，失败返回 None"""
+        from futu import RET_OK
+
+        pages = []
+        page_req_key = None
+        while True:
+            ret, data, page_req_key = quote_ctx.request_history_kline(
+                code, start=start_str, end=end_str, ktype=ktype,
+                max_count=KLINE_PAGE_SIZE, page_req_key=page_req_key)
+            if ret != RET_OK:
+                logger.error("获取历史K线失败: %s", data)
+                return None
+            pages.append(frame_to_records(data))
+            if page_req_key is None:
+                break
+        return np.concatenate(pages) if pages else np.zeros(0, dtype=KLINE_DTYPE)
+
+    def update(self, quote_ctx, code, ktype, start_date, end_date):
+        """增量同步本地缓存，返回是否成功"""
+        key = (code, ktype)
+        records, meta = self._load(code, ktype)
+        start_str = start_date.strftime('%Y-%m-%d')
+        end_str = end_date.strftime('%Y-%m-%d')
+        retention_start = self._retention_start()
+        if retention_start is not None:
+            # 保留窗口之前的数据不再缓存，也不因此整体重新拉取
+            start_str = max(start_str, retention_start)
+
+        if meta.get('fetched_at', 0) + self.refresh_interval > time.time() and meta.get('end', '') >= end_str:
+            return True
+
+        covered_start = meta.get('start')
+        keep = 0
+        if len(records) == 0 or covered_start is None or start_str < covered_start:
+            # 没有缓存或请求区间早于已缓存区间，整体重新拉取
+            new_records = self.fetch(quote_ctx, code, ktype, start_str, end_str)
+            if new_records is None:
+                return False
+            covered_start = start_str
+            rewrite = True
+        else:
+            # 只请求最后一根已存K线所在日期之后的尾部数据
+            tail_start = int_to_time_key(records['time_key'][-1:])[0][:10]
+            new_records = self.fetch(quote_ctx, code, ktype, tail_start, end_str)
+            if new_records is None:
+                return False
+            # 尾部最后一根K线可能尚未走完，以新数据为准覆盖
+            keep = (int(np.searchsorted(records['time_key'], new_records['time_key'][0], side='left'))
+                    if len(new_records) else len(records))
+            rewrite = False
+        meta = {'start': covered_start, 'end': max(end_str, meta.get('end', '')), 'fetched_at': time.time()}
+        if not rewrite and records[keep:].tobytes() == new_records.tobytes():
+            # 没有新K线：只记录刷新时间，文件与已构造的 DataFrame 保持不变
+            self._meta[key] = meta
+            return True
+
+        # 裁掉保留窗口之前的K线
+        drop = 0
+        if retention_start is not None and not rewrite:
+            drop = int(np.searchsorted(records['time_key'][:keep], time_key_to_int([retention_start])[0]))
+            if drop:
+                meta['start'] = max(covered_start, retention_start)
+        merged = np.concatenate([records[drop:keep], new_records])
+
+        frame = self._frames.get(key)
+        self._set(key, merged, meta)
+        if frame is not None and not rewrite:
+            # 只为新K线构造 DataFrame 并接在已有部分之后
+            self._frames[key] = pd.concat([frame.iloc[drop:keep], records_to_frame(code, new_records)],
+                                          ignore_index=True)
+        if rewrite or drop:
+            self._save(code, ktype, merged, meta)
+        else:
+            self._append(code, ktype, keep, new_records, merged, meta)
+        logger.info("本地K线缓存 %s %s 已同步，新增请求 %d 条，共 %d 条",
+                    code, ktype, len(new_records), len(merged))
+        return True
+
+    def get_records(self, quote_ctx, code, start_date, end_date, ktype):
+        """同 get，但返回定长记录数组（不构造 DataFrame），用于批量加载多个代码"""
+        try:
+            with self._key_lock((code, ktype)):
+                ok = self.update(quote_ctx, code, ktype, start_date, end_date)
+                records, _ = self._load(code, ktype)
+            if not ok and len(records) == 0:
+                return None
+            if not ok:
+                logger.warning("K线增量同步失败，使用本地缓存数据: %s", code)
+            bounds = time_key_to_int([start_date.strftime('%Y-%m-%d') + ' 00:00:00',
+                                      end_date.strftime('%Y-%m-%d') + ' 23:59:59'])
+            lo = np.searchsorted(records['time_key'], bounds[0], side='left')
+            hi = np.searchsorted(records['time_key'], bounds[1], side='right')
+            return records[lo:hi]
+        except Exception as e:
+            logger.error("获取本地K线缓存时发生错误: %s", str(e))
+            return None
+
+    def get(self, quote_ctx, code, start_date, end_date, ktype):
+        """获取历史K线（优先使用本地缓存，仅请求缺失的尾部）"""
+        try:
+            with self._key_lock((code, ktype)):
+                ok = self.update(quote_ctx, code, ktype, start_date, end_date)
+                records, _ = self._load(code, ktype)
+                if not ok and len(records) == 0:
+                    return None
+                if not ok:
+                    logger.warning("K线增量同步失败，使用本地缓存数据: %s", code)
+                key = (code, ktype)
+                frame = self._frames.get(key)
+                if frame is None:
+                    frame = records_to_frame(code, records)
+                    self._frames[key] = frame
+            # 与按日期请求的语义保持一致：包含起止日期的全天数据
+            start_key = start_date.strftime('%Y-%m-%d')
+            end_key = end_date.strftime('%Y-%m-%d') + ' 23:59:59'
+            mask = (frame['time_key'] >= start_key) & (frame['time_key'] <= end_key)
+            return frame[mask].reset_index(drop=True)
+        except Exception as e:
+            logger.error("获取本地K线缓存时发生错误: %s", str(e))
+            return None
@@ -0,0 +1,169 @@
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger('Trade')
+
+LATENCY_SAMPLES = 1000  # 每个阶段保留的最近样本数，用于计算 p50/p99
+# 直方图桶上界（秒），与 Prometheus histogram 的 le 标签对应
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_NAME = 'trade_stage_latency_seconds'
+
+
+def percentile(samples, q):
+    """计算样本分位数（samples 需已排序）"""
+    if not samples:
+        return 0.0
+    index = min(int(round(q * (len(samples) - 1))), len(samples) - 1)
+    return samples[index]
+
+
+class Histogram:
+    """单个阶段的耗时统计：累计分桶计数（导出 Prometheus）+ 最近样本（计算分位数）"""
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'max', 'samples', '_lock')
+
+    def __init__(self, buckets=LATENCY_BUCKETS, samples=LATENCY_SAMPLES):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=samples)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+            self.samples.append(seconds)
+
+    def stats(self):
+        with self._lock:
+            ordered = sorted(self.samples)
+            count, total, peak = self.count, self.sum, self.max
+        return {'count': count, 'mean': total / count if count else 0.0, 'p50': percentile(ordered, 0.5),
+                'p99': percentile(ordered, 0.99), 'max': peak}
+
+
+class _Span:
+    __slots__ = ('recorder', 'name', 'started')
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.recorder.observe(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class LatencyRecorder:
+    """按阶段汇总耗时
+
+    with recorder.span('get_history_kline'): ... 或 @recorder.timed('is_up_trend')，
+    stats() 返回各阶段 p50/p99/max，to_prometheus() 输出 Prometheus 文本格式。
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, samples=LATENCY_SAMPLES):
+        self.buckets = buckets
+        self.samples = samples
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.get(name)
+                if histogram is None:
+                    histogram = Histogram(self.buckets, self.samples)
+                    self._histograms[name] = histogram
+        return histogram
+
+    def observe(self, name, seconds):
+        self.histogram(name).observe(seconds)
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def timed(self, name=None):
+        """函数耗时装饰器，默认以函数名作为阶段名"""
+        def decorator(func):
+            stage = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(stage, time.perf_counter() - started)
+            return wrapper
+        return decorator
+
+    def names(self):
+        return sorted(self._histograms)
+
+    def stats(self):
+        """返回 {阶段: {'count', 'mean', 'p50', 'p99', 'max'}}（秒）"""
+        return {name: self._histograms[name].stats() for name in self.names()}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def report(self, prefix='[延迟]'):
+        """打印各阶段耗时统计"""
+        for name, stat in self.stats().items():
+            logger.info("%s %-40s n=%d p50=%.2fms p99=%.2fms max=%.2fms", prefix, name, stat['count'],
+                        stat['p50'] * 1000, stat['p99'] * 1000, stat['max'] * 1000)
+
+    def to_prometheus(self, metric=METRIC_NAME):
+        """导出 Prometheus 文本格式（histogram，阶段名作为 stage 标签）"""
+        lines = [f'# HELP {metric} Latency of trading stages in seconds.', f'# TYPE {metric} histogram']
+        for name in self.names():
+            histogram = self._histograms[name]
+            with histogram._lock:
+                counts = list(histogram.counts)
+                count, total = histogram.count, histogram.sum
+            stage = name.replace('\\', '\\\\').replace('"', '\\"')
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {total:.9f}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def export_prometheus(self, path, metric=METRIC_NAME):
+        """原子写入 Prometheus 文本文件（可供 node_exporter textfile collector 采集）"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus(metric))
+        os.replace(tmp_path, path)
+
+
+_default_recorder = LatencyRecorder()
+
+
+def get_recorder():
+    """进程内共享的默认 LatencyRecorder"""
+    return _default_recorder
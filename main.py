@@ -1,32 +1,144 @@
 import sys
-from futu import *
 import pandas as pd
 from datetime import datetime, timedelta
 import time
 import argparse
-from futu import OptionType
 import socket
 import logging
 import os
-from collections import deque
 import traceback
+from kline_store import KlineStore
+from indicators import IndicatorEngine
+from signals import up_trend_stats, is_reversal_array
+from bars import BarAggregator
+from market_data import MarketDataCache, parse_time_ms
+from scheduler import StrategyScheduler, EVENT_BAR_CLOSE, EVENT_STATE_CHANGED, EVENT_TIMER
+from positions import PositionManager
+from analysis_pool import AnalysisPool
+from gateway import RequestGateway, order_priority
+from quote_batcher import QuoteBatcher
+from portfolio import PortfolioState
+from screener import Screener
+from order_book import OrderBookCache, ORDER_BOOK_LEVELS
+from order_pipeline import OrderPipeline
+from options import ContractTable, OptionChainCache, nearest_strikes, OPTION_CANDIDATES
+from subscriptions import SubscriptionManager
+from tick_log import TickRecorder
+from state_snapshot import StateSnapshot, describe as describe_snapshot
+from latency import get_recorder
+from async_logging import (BufferedFileHandler, BufferedStreamHandler, JsonFormatter, LazyFrame,
+                           make_async)
 
 # 全局变量
 CODE = 'HK.09988'  # 股票代码
 KLINE_10M_COUNT = 30  # 10分钟K线数量
+TREND_BAR_MINUTES = 10  # 趋势判定使用的K线周期（分钟），由1分钟K线合成
 SLEEP_INTERVAL = 1  # 轮询间隔改为1秒
 PROFIT_THRESHOLD = 0.20  # 止盈阈值
 LOSS_THRESHOLD = -0.05  # 止损阈值
-MAX_QUEUE_SIZE = 100  # 订阅数据队列最大长度
+MAX_QUEUE_SIZE = 100  # 每个代码保留的订阅数据条数（环形缓冲区长度）
+HANDLER_VERBOSE = False  # 推送回调是否打印完整推送内容
+FALLBACK_INTERVAL = 60  # 没有事件时策略的兜底执行间隔（秒）
+MAX_PENDING_EVENTS = 1000  # 待处理事件上限，超出时丢弃最早的行情事件
+LATENCY_REPORT_INTERVAL = 300  # 调度延迟统计的打印间隔（秒）
+LATENCY_METRICS_FILE = 'data/metrics/trade_latency.prom'  # 各阶段耗时直方图（Prometheus 文本格式），None 表示不导出
+POSITION_STALE_AFTER = 5  # 持仓超过该秒数没有推送时主动查询报价
+PORTFOLIO_RECONCILE_INTERVAL = 300  # 账户资金与持仓全量核对间隔（秒），其间由订单/成交推送增量更新
+SCREEN_UNIVERSE = []  # 全市场筛选的代码池（可为数百个港股代码），为空时不启用筛选
+SCREEN_INTERVAL = 60  # 筛选间隔（秒）
+ANALYSIS_WORKERS = 8  # 并发分析的代码数上限
+QUOTE_CONTEXT_POOL = 2  # 行情上下文连接数（订阅、推送与报价/摆盘等依赖订阅的接口固定使用第一个）
+QUOTE_BATCH_WINDOW = 0.003  # 报价请求合并窗口（秒），窗口内各线程的 get_stock_quote 合并为一次
+QUOTE_SNAPSHOT_TTL = 0.5  # 报价快照有效期（秒），同一周期内重复读取不再请求
+ORDER_BOOK_MAX_AGE = 3  # 已不再订阅摆盘的合约，摆盘超过该秒数未更新时不再用于定价（订阅期间一直有效）
+OPTION_MAX_SPREAD = 0.2  # 选期权时跳过买卖价差超过中间价该比例的合约
+ORDER_WORKERS = 2  # 异步下单线程数（可同时在途的下单请求数）
+ORDER_POLL_INTERVAL = 5  # 在途订单超过该秒数没有推送时查询订单列表
+BUY_FILL_TIMEOUT = 10  # 入场买入限价单等待成交的秒数，超时撤销剩余数量（信号已过时，不再追价）
+SELL_FILL_TIMEOUT = 10  # 止盈止损卖出等待成交的秒数，超时撤销剩余数量，按实际成交数量稍后重试剩余部分
+OPTION_MONITOR_COUNT = 10  # 每个标的订阅的平值附近期权合约数量
+KLINE_CACHE_DIR = 'data/kline'  # 本地K线缓存目录
+KLINE_REFRESH_INTERVAL = 5  # 同一K线在该秒数内不重复请求
+KLINE_RETENTION_DAYS = 60  # 本地K线缓存保留的天数（需覆盖 analyze_stock 的30天窗口），None 表示不裁剪
+TICK_RECORD_DIR = None  # 推送录制目录（如 'data/ticks'），None 表示不录制
+LOG_ASYNC = True  # 日志由后台线程批量写入，磁盘与终端 I/O 不阻塞交易路径
+LOG_JSON = False  # 文件日志输出为每行一个 JSON 对象
+STATE_SNAPSHOT_FILE = 'data/state/snapshot.pkl.z'  # 状态快照文件（指标、K线合成、合约、期权链、持仓），None 表示不保存
 
-# 用于存储订阅数据的队列
-quote_queue = deque(maxlen=MAX_QUEUE_SIZE)
-ticker_queue = deque(maxlen=MAX_QUEUE_SIZE)
+# 策略日志（from futu import * 会导入富途自身的 logger，这里显式覆盖）
+logger = logging.getLogger('Trade')
+logger_ready = False
+log_listener = None
 
-def setup_logger():
-    """设置日志"""
-    global logger
-    if logger is not None:
+# 订阅数据缓存：按代码的环形缓冲区 + 最新快照
+market_data = MarketDataCache(maxlen=MAX_QUEUE_SIZE)
+
+# 本地增量K线缓存
+kline_store = KlineStore(root=KLINE_CACHE_DIR, refresh_interval=KLINE_REFRESH_INTERVAL,
+                         retention_days=KLINE_RETENTION_DAYS)
+
+# 增量指标引擎（MA5/10/20 与 MACD）
+indicator_engine = IndicatorEngine()
+
+# 由1分钟K线增量合成的趋势K线
+bar_aggregator = BarAggregator(minutes=TREND_BAR_MINUTES)
+
+# 期权合约静态信息（手数、行权价、到期日）
+contract_table = ContractTable()
+
+# 期权链缓存（按 TTL / 到期日 / 行权价范围刷新）与订阅管理
+option_chain_cache = OptionChainCache(contract_table=contract_table)
+subscription_manager = SubscriptionManager()
+
+# 报价请求合并与短期快照（行情推送同时写入快照）
+quote_batcher = QuoteBatcher(window=QUOTE_BATCH_WINDOW, ttl=QUOTE_SNAPSHOT_TTL)
+
+# 按合约的买卖盘（摆盘推送原地更新），下单时据此计算可立即成交的限价
+order_books = OrderBookCache()
+
+# 推送录制（定长二进制记录，可用 tick_log.py 回放）
+tick_recorder = TickRecorder(TICK_RECORD_DIR) if TICK_RECORD_DIR else None
+
+# 各阶段耗时统计（K线获取、指标、信号判定、选期权、下单、推送回调）
+latency_recorder = get_recorder()
+
+# 代码池向量化筛选（只有触发信号的代码进入选期权与下单）
+screener = Screener(interval=SCREEN_INTERVAL)
+
+# 多代码并发分析线程池
+analysis_pool = AnalysisPool(max_workers=ANALYSIS_WORKERS)
+
+# 事件驱动的策略调度器，推送回调中发布事件，不同代码的事件并发处理
+strategy_scheduler = StrategyScheduler(max_pending=MAX_PENDING_EVENTS,
+                                       fallback_interval=FALLBACK_INTERVAL,
+                                       report_interval=LATENCY_REPORT_INTERVAL,
+                                       executor=analysis_pool,
+                                       latency=latency_recorder)
+
+# 持仓止盈止损监控（推送驱动，可同时管理多个持仓）
+position_manager = PositionManager(PROFIT_THRESHOLD, LOSS_THRESHOLD, stale_after=POSITION_STALE_AFTER,
+                                   sell_timeout=SELL_FILL_TIMEOUT)
+
+# 账户资金与持仓（推送增量维护，定期全量核对）
+portfolio = PortfolioState(reconcile_interval=PORTFOLIO_RECONCILE_INTERVAL)
+portfolio_logged_version = None
+
+# 进程状态快照：定时写入，启动时恢复（热重启），崩溃或部署后无需重新预热即可判定信号
+state_snapshot = StateSnapshot(STATE_SNAPSHOT_FILE, {'indicators': indicator_engine, 'bars': bar_aggregator,
+                                                     'contracts': contract_table, 'option_chains': option_chain_cache,
+                                                     'positions': position_manager})
+
+# 异步订单管道：下单不阻塞策略线程，订单状态与实际成交均价由订单推送更新
+order_pipeline = OrderPipeline(workers=ORDER_WORKERS, poll_interval=ORDER_POLL_INTERVAL, latency=latency_recorder)
+
+def setup_logger(async_mode=LOG_ASYNC, json_format=LOG_JSON):
+    """设置日志
+
+    async_mode 时文件与控制台输出由后台线程批量写入，调用线程只把日志记录放入队列；
+    json_format 时文件日志每行输出一个 JSON 对象。
+    """
+    global log_listener, logger_ready
+    if logger_ready:
         return logger
         
     try:
@@ -36,36 +148,42 @@ def setup_logger():
             os.makedirs(log_dir)
             
         # 设置日志文件名
-        log_file = os.path.join(log_dir, f'trade_{datetime.now().strftime("%Y%m%d")}.log')
+        log_file = os.path.join(log_dir, f'trade_{datetime.now().strftime("%Y%m%d")}.{"jsonl" if json_format else "log"}')
         
-        # 创建logger
-        logger = logging.getLogger('Trade')
         logger.setLevel(logging.INFO)
         
         # 清除已有的handlers
         if logger.handlers:
             logger.handlers.clear()
+        
+        handlers = []
+        text_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s')
             
         # 文件处理器
         try:
-            fh = logging.FileHandler(log_file, encoding='utf-8', mode='a')
+            fh = (BufferedFileHandler if async_mode else logging.FileHandler)(log_file, encoding='utf-8', mode='a')
             fh.setLevel(logging.INFO)
-            file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s')
-            fh.setFormatter(file_formatter)
-            logger.addHandler(fh)
+            fh.setFormatter(JsonFormatter() if json_format else text_formatter)
+            handlers.append(fh)
             print(f"日志文件创建成功: {log_file}")
         except Exception as e:
             print(f"创建日志文件失败: {str(e)}")
             
         # 控制台处理器
-        ch = logging.StreamHandler(sys.stdout)
+        ch = (BufferedStreamHandler if async_mode else logging.StreamHandler)(sys.stdout)
         ch.setLevel(logging.INFO)
-        console_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s')
-        ch.setFormatter(console_formatter)
-        logger.addHandler(ch)
+        ch.setFormatter(text_formatter)
+        handlers.append(ch)
+        
+        if async_mode:
+            log_listener = make_async(logger, handlers)
+        else:
+            for handler in handlers:
+                logger.addHandler(handler)
+        logger_ready = True
         
         # 测试日志
-        logger.info("日志系统初始化成功")
+        logger.info("日志系统初始化成功（%s）", '异步' if async_mode else '同步')
         print("日志系统初始化完成")
         
         return logger
@@ -74,25 +192,24 @@ def setup_logger():
         print(f"设置日志系统时发生错误: {str(e)}")
         raise
 
+def shutdown_logger():
+    """停止后台日志线程并写完剩余日志"""
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        log_listener = None
+
+@latency_recorder.timed('get_history_kline')
 def get_history_kline(quote_ctx, code, start_date, end_date, ktype):
-    """获取历史K线数据"""
-    try:
-        # 将日期转换为字符串格式
-        start_str = start_date.strftime('%Y-%m-%d')
-        end_str = end_date.strftime('%Y-%m-%d')
-        ret, data, *_ = quote_ctx.request_history_kline(code, start=start_str, end=end_str, ktype=ktype)
-        if ret != RET_OK:
-            logger.error("获取历史K线失败: %s", data)
-            return None
-        return data
-    except Exception as e:
-        logger.error("获取历史K线时发生错误: %s", str(e))
-        return None
+    """获取历史K线数据（经本地缓存，只请求缺失的尾部）"""
+    return kline_store.get(quote_ctx, code, start_date, end_date, ktype)
 
 def get_stock_quote(quote_ctx, code):
     """获取股票实时行情"""
+    from futu import RET_OK
+
     try:
-        ret, data, *_ = quote_ctx.get_stock_quote([code])
+        ret, data = quote_batcher.get_stock_quote(quote_ctx, [code])
         if ret != RET_OK:
             logger.error("获取股票行情失败: %s", data)
             return None
@@ -103,6 +220,8 @@ def get_stock_quote(quote_ctx, code):
 
 def get_account_funds(trade_ctx):
     """获取账户资金状况"""
+    from futu import RET_OK, TrdEnv
+
     try:
         ret, data = trade_ctx.accinfo_query(trd_env=TrdEnv.SIMULATE)
         if ret != RET_OK:
@@ -115,6 +234,8 @@ def get_account_funds(trade_ctx):
 
 def get_positions(trade_ctx):
     """获取持仓信息"""
+    from futu import RET_OK, TrdEnv
+
     try:
         ret, data = trade_ctx.position_list_query(trd_env=TrdEnv.SIMULATE)
         if ret != RET_OK:
@@ -127,6 +248,8 @@ def get_positions(trade_ctx):
 
 def place_order(trade_ctx, code, price, qty, trd_side, order_type):
     """下单"""
+    from futu import RET_OK, TrdEnv
+
     try:
         ret, data, *_ = trade_ctx.place_order(price=price, qty=qty, code=code, 
                                              trd_side=trd_side, order_type=order_type,
@@ -139,253 +262,458 @@ def place_order(trade_ctx, code, price, qty, trd_side, order_type):
         logger.error("下单时发生错误: %s", str(e))
         return None
 
-def subscribe_option_quotes(quote_ctx, option_codes):
-    """订阅期权实时行情"""
-    ret, data, *_ = quote_ctx.subscribe(option_codes, [SubType.QUOTE, SubType.TICKER, SubType.ORDER_BOOK])
-    if ret != RET_OK:
-        logger.info("订阅期权行情失败: %s", data)
-        return False
-    return True
-
-class QuoteHandler(StockQuoteHandlerBase):
-    def __init__(self, logger):
+class _QuoteHandler:
+    def __init__(self, logger, verbose=HANDLER_VERBOSE):
         super().__init__()
         self.logger = logger
+        self.verbose = verbose
         
     def on_recv_rsp(self, rsp_pb):
-        result = super().on_recv_rsp(rsp_pb)
-        logger.info('[DEBUG] QuoteHandler super().on_recv_rsp 返回: %s %s', type(result), result)
-        # 临时只返回 result，便于观察
-        return result
+        from futu import RET_OK
+
+        recv_ns = time.time_ns()
+        ret_code, data = super().on_recv_rsp(rsp_pb)
+        if ret_code != RET_OK:
+            self.logger.error("行情推送解析失败: %s", data)
+            return ret_code, data
+        if tick_recorder is not None:
+            tick_recorder.record_quote(data, recv_ns)
+        self.on_push(data)
+        return ret_code, data
+
+    @latency_recorder.timed('handler.quote')
+    def on_push(self, data):
+        """处理解析后的行情推送（DataFrame），写入按代码的环形缓冲区与报价快照"""
+        codes = market_data.add_quote_frame(data)
+        quote_batcher.put(data, codes)
+        for code in codes:
+            strategy_scheduler.on_quote(code, market_data.quotes.get_time(code))
+            if position_manager.get(code) is not None:
+                quote = market_data.latest_quote(code)
+                if quote is not None:
+                    position_manager.on_price(code, quote['last_price'])
+        if self.verbose:
+            self.logger.info('[DEBUG] QuoteHandler 收到推送: %s', data)
 
-class OrderBookHandler(OrderBookHandlerBase):
-    def __init__(self, logger):
+class _OrderBookHandler:
+    def __init__(self, logger, verbose=HANDLER_VERBOSE):
         super().__init__()
         self.logger = logger
+        self.verbose = verbose
         
     def on_recv_rsp(self, rsp_pb):
-        result = super().on_recv_rsp(rsp_pb)
-        logger.info('[DEBUG] OrderBookHandler super().on_recv_rsp 返回: %s %s', type(result), result)
-        return result
+        from futu import RET_OK
+
+        recv_ns = time.time_ns()
+        ret_code, data = super().on_recv_rsp(rsp_pb)
+        if ret_code != RET_OK:
+            self.logger.error("摆盘推送解析失败: %s", data)
+            return ret_code, data
+        if tick_recorder is not None:
+            tick_recorder.record_order_book(data, recv_ns)
+        self.on_push(data)
+        return ret_code, data
+
+    @latency_recorder.timed('handler.order_book')
+    def on_push(self, data):
+        """处理解析后的摆盘推送（dict），写入按代码的环形缓冲区并更新买卖盘"""
+        market_data.add_order_book(data)
+        order_books.update(data)
+        if self.verbose:
+            self.logger.info('[DEBUG] OrderBookHandler 收到推送: %s', data)
 
-class TickerHandler(TickerHandlerBase):
-    def __init__(self, logger):
+class _TickerHandler:
+    def __init__(self, logger, verbose=HANDLER_VERBOSE):
         super().__init__()
         self.logger = logger
+        self.verbose = verbose
         
     def on_recv_rsp(self, rsp_pb):
-        result = super().on_recv_rsp(rsp_pb)
-        logger.info('[DEBUG] TickerHandler super().on_recv_rsp 返回: %s %s', type(result), result)
-        return result
+        from futu import RET_OK
 
-def get_latest_quote_data():
-    """从订阅队列中获取最新的行情数据"""
-    if not quote_queue:
-        return None
-    
-    # 获取最新的数据
-    latest_data = quote_queue[-1]
-    latest_time = pd.to_datetime(latest_data['svr_recv_time_bid'])  # 使用服务器推送时间
-    
-    # 检查队列中是否有更新的数据
-    for data in reversed(list(quote_queue)[:-1]):
-        current_time = pd.to_datetime(data['svr_recv_time_bid'])
-        if current_time > latest_time:
-            latest_data = data
-            latest_time = current_time
-    
-    return latest_data
+        recv_ns = time.time_ns()
+        ret_code, data = super().on_recv_rsp(rsp_pb)
+        if ret_code != RET_OK:
+            self.logger.error("逐笔推送解析失败: %s", data)
+            return ret_code, data
+        if tick_recorder is not None:
+            tick_recorder.record_ticker(data, recv_ns)
+        self.on_push(data)
+        return ret_code, data
 
-def get_latest_ticker_data():
-    """从订阅队列中获取最新的逐笔成交数据"""
-    if not ticker_queue:
-        return None
-    
-    try:
-        # 获取最新的数据
-        latest_data = ticker_queue[-1]
-        if 'time' not in latest_data:
-            logger.info("逐笔成交数据缺少时间字段")
-            return None
-            
-        latest_time = pd.to_datetime(latest_data['time'])
-        
-        # 检查队列中是否有更新的数据
-        for data in reversed(list(ticker_queue)[:-1]):
-            if 'time' not in data:
-                continue
-            current_time = pd.to_datetime(data['time'])
-            if current_time > latest_time:
-                latest_data = data
-                latest_time = current_time
-        
-        return latest_data
-    except Exception as e:
-        logger.info("获取最新逐笔成交数据时发生错误: %s", str(e))
-        return None
+    @latency_recorder.timed('handler.ticker')
+    def on_push(self, data):
+        """处理解析后的逐笔成交推送（DataFrame），写入按代码的环形缓冲区"""
+        market_data.add_ticker_frame(data)
+        if self.verbose:
+            self.logger.info('[DEBUG] TickerHandler 收到推送: %s', data)
+
+class _TradeOrderHandler:
+    def __init__(self, logger, verbose=HANDLER_VERBOSE):
+        super().__init__()
+        self.logger = logger
+        self.verbose = verbose
+
+    def on_recv_rsp(self, rsp_pb):
+        from futu import RET_OK
+
+        ret_code, data = super().on_recv_rsp(rsp_pb)
+        if ret_code != RET_OK:
+            self.logger.error("订单推送解析失败: %s", data)
+            return ret_code, data
+        self.on_push(data)
+        return ret_code, data
+
+    def on_push(self, data):
+        """处理订单推送（DataFrame），按累计成交数量更新账户状态与在途订单"""
+        portfolio.on_order(data)
+        order_pipeline.on_order(data)
+        if self.verbose:
+            self.logger.info('[DEBUG] TradeOrderHandler 收到推送: %s', data)
+
+class _TradeDealHandler:
+    def __init__(self, logger, verbose=HANDLER_VERBOSE):
+        super().__init__()
+        self.logger = logger
+        self.verbose = verbose
+
+    def on_recv_rsp(self, rsp_pb):
+        from futu import RET_OK
+
+        ret_code, data = super().on_recv_rsp(rsp_pb)
+        if ret_code != RET_OK:
+            self.logger.error("成交推送解析失败: %s", data)
+            return ret_code, data
+        self.on_push(data)
+        return ret_code, data
+
+    def on_push(self, data):
+        """处理成交推送（DataFrame），逐笔更新账户状态"""
+        portfolio.on_deal(data)
+        if self.verbose:
+            self.logger.info('[DEBUG] TradeDealHandler 收到推送: %s', data)
+
+# 推送回调类：回调逻辑在上面的类中，富途的 HandlerBase 基类在首次使用时才导入，import main 不加载 futu
+HANDLER_BASES = {
+    'QuoteHandler': (_QuoteHandler, 'StockQuoteHandlerBase'),
+    'OrderBookHandler': (_OrderBookHandler, 'OrderBookHandlerBase'),
+    'TickerHandler': (_TickerHandler, 'TickerHandlerBase'),
+    'TradeOrderHandler': (_TradeOrderHandler, 'TradeOrderHandlerBase'),
+    'TradeDealHandler': (_TradeDealHandler, 'TradeDealHandlerBase'),
+}
+handler_classes = {}
 
+def handler_class(name):
+    """返回继承富途推送基类的回调类（首次调用时创建）"""
+    cls = handler_classes.get(name)
+    if cls is None:
+        import futu
+        callbacks, base = HANDLER_BASES[name]
+        cls = type(name, (callbacks, getattr(futu, base)), {'__module__': __name__})
+        handler_classes[name] = cls
+    return cls
+
+def __getattr__(name):
+    # main.QuoteHandler 等按需创建（tick_log 回放与压测脚本使用）
+    if name in HANDLER_BASES:
+        return handler_class(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_latest_quote_data(code=None):
+    """从订阅缓存中获取最新的行情数据（不指定代码时返回所有代码中最新的一条）"""
+    return market_data.latest_quote(code)
+
+def get_latest_ticker_data(code=None):
+    """从订阅缓存中获取最新的逐笔成交数据（不指定代码时返回所有代码中最新的一条）"""
+    return market_data.latest_ticker(code)
+
+@latency_recorder.timed('is_reversal')
 def is_reversal(kline_1m, kline_10m):
     """判断是否出现反转信号"""
     if kline_1m.empty or kline_10m.empty:
         return False
     
-    # 获取最近1分钟K线数据
-    last_1m = kline_1m.iloc[-1]
-    
-    # 获取最近10分钟K线数据
-    last_10m = kline_10m.iloc[-1]
-    
     # 判断条件：
     # 1. 1分钟K线收盘价高于开盘价（上涨）
     # 2. 1分钟K线收盘价高于10分钟K线收盘价（突破）
     # 3. 1分钟K线成交量大于10分钟K线平均成交量2倍，1分钟K线成交量并且大于前一分钟成交量两倍
-    avg_volume_10m = kline_10m['volume'].mean()
+    # 4. 最近1分钟涨幅 > 前1分钟跌幅2倍
+    return is_reversal_array(kline_1m['open'].to_numpy(), kline_1m['close'].to_numpy(),
+                             kline_1m['volume'].to_numpy(), kline_10m['close'].to_numpy(),
+                             kline_10m['volume'].to_numpy())
 
-     # 新增：最近1分钟涨幅 > 前1分钟跌幅2倍
-    if len(kline_1m) >= 2:
-        last_up = (kline_1m['close'].iloc[-1] - kline_1m['open'].iloc[-1]) / kline_1m['open'].iloc[-1]
-        prev_down = (kline_1m['open'].iloc[-2] - kline_1m['close'].iloc[-2]) / kline_1m['open'].iloc[-2]
-        if not (last_up > 2 * prev_down and last_up > 0):
-            return False
-    
-    return (last_1m['close'] > last_1m['open'] and 
-            last_1m['close'] > last_10m['close'] and 
-            last_1m['volume'] > avg_volume_10m * 2 and last_1m['volume'] > kline_1m['volume'].iloc[-2] * 2)
+def get_underlying_price(quote_ctx, code):
+    """标的或合约的最新价：优先使用订阅推送，没有时查询报价"""
+    quote = market_data.latest_quote(code)
+    if quote is not None:
+        return quote['last_price']
+    quote_data = get_stock_quote(quote_ctx, code)
+    if quote_data is None or quote_data.empty:
+        return None
+    return quote_data['last_price'].iloc[0]
 
 def monitor_option_chain(quote_ctx, code, option_type):
+    from futu import SubType
+
     logger.info("开始监控期权 %s", code)
-    ret, data, *_ = quote_ctx.get_option_chain(code, option_type=option_type)
-    if ret != RET_OK:
-        logger.error("获取期权链失败: %s", data)
-        return
-    option_codes = data['code'].dropna().tolist()[:10]
-    if not option_codes:
+    price = get_underlying_price(quote_ctx, code)
+    data = option_chain_cache.get(quote_ctx, code, option_type, price=price)
+    if data is None or data.empty:
         logger.error("未找到可用的期权代码")
         return
+    # 订阅行权价最接近标的价格的合约，集合不变时不产生订阅请求
+    if price is not None:
+        data = nearest_strikes(data, price, OPTION_MONITOR_COUNT)
+    option_codes = data['code'].dropna().tolist()[:OPTION_MONITOR_COUNT]
     logger.info("选择监控以下 %d 个期权代码: %s", len(option_codes), option_codes)
-    subscribe_option_quotes(quote_ctx, option_codes)
-    quote_ctx.set_handler(QuoteHandler(logger))
-    quote_ctx.set_handler(OrderBookHandler(logger))
-    quote_ctx.set_handler(TickerHandler(logger))
-    logger.info("期权行情订阅和handler设置完成")
+    subscription_manager.set_group(quote_ctx, f'option_chain:{code}:{option_type}', option_codes,
+                                   [SubType.QUOTE, SubType.TICKER, SubType.ORDER_BOOK])
     # 不要while True，直接return
 
+def register_handlers(quote_ctx, trade_ctx=None):
+    """设置推送回调（只需在启动时设置一次）"""
+    for name in ('QuoteHandler', 'OrderBookHandler', 'TickerHandler'):
+        quote_ctx.set_handler(handler_class(name)(logger))
+    if trade_ctx is not None:
+        for name in ('TradeOrderHandler', 'TradeDealHandler'):
+            trade_ctx.set_handler(handler_class(name)(logger))
+    logger.info("推送handler设置完成")
+
+def subscribe_entry(quote_ctx, code, codes, subtypes):
+    """选期权前订阅标的或候选合约（OpenD 只返回本连接已订阅代码的报价），入场完成后由 enter_option_position 移除"""
+    if not subscription_manager.add(quote_ctx, f'entry:{code}', codes, subtypes):
+        logger.warning("订阅 %s 失败，报价查询可能失败", codes)
+
+@latency_recorder.timed('get_option_to_buy')
 def get_option_to_buy(quote_ctx, code):
-    # 获取当前股票价格
-    ret, stock_quote, *_ = quote_ctx.get_stock_quote([code])
+    from futu import RET_OK, OptionType, SubType
+
+    # 获取当前股票价格（筛选命中的代码可能尚未订阅）
+    subscribe_entry(quote_ctx, code, [code], [SubType.QUOTE])
+    ret, stock_quote = quote_batcher.get_stock_quote(quote_ctx, [code])
     if ret != RET_OK or stock_quote.empty:
         logger.info("获取股票报价失败: %s", stock_quote)
         return None, None, None, None
     stock_price = stock_quote.iloc[0]['last_price']
     
-    # 获取期权链，选取行权价最接近当前股价的看涨期权
-    ret, data, *_ = quote_ctx.get_option_chain(code, option_type=OptionType.CALL)
-    if ret != RET_OK or data.empty:
-        logger.info("期权链获取失败: %s", data)
+    # 获取期权链（缓存），选取行权价最接近当前股价的看涨期权
+    data = option_chain_cache.get(quote_ctx, code, OptionType.CALL, price=stock_price)
+    if data is None or data.empty:
+        logger.info("期权链获取失败: %s", code)
         return None, None, None, None
-    data['strike_diff'] = (data['strike_price'] - stock_price).abs()
-    data = data.sort_values('strike_diff')
-    for idx, row in data.iterrows():
-        option_code = row['code']
-        strike_price = row['strike_price']
-        ret, quote, *_ = quote_ctx.get_stock_quote([option_code])
-        if ret == RET_OK and not quote.empty:
-            lot_size = quote.iloc[0]['lot_size']
-            logger.info("期权合约乘数: %s", lot_size)
-            # 买入张数=1000/当前行权价取整，并确保是lot_size的整数倍
-            qty = int(1000 // strike_price)
-            qty = max(qty, 1) * lot_size
-            logger.info("计算得到的买入数量: %d (考虑了合约乘数 %s)", qty, lot_size)
-            return option_code, strike_price, qty, lot_size
+    
+    # 一次批量查询最近几个行权价合约的报价，按距离顺序取第一个有报价的合约
+    candidates = nearest_strikes(data, stock_price, OPTION_CANDIDATES)
+    subscribe_entry(quote_ctx, code, candidates['code'].tolist(), [SubType.QUOTE, SubType.ORDER_BOOK])
+    ret, quotes = quote_batcher.get_stock_quote(quote_ctx, candidates['code'].tolist())
+    if ret != RET_OK or quotes.empty:
+        logger.info("获取期权报价失败: %s", quotes)
+        return None, None, None, None
+    quoted = dict(zip(quotes['code'], quotes['lot_size'])) if 'lot_size' in quotes.columns else {
+        option_code: None for option_code in quotes['code']}
+    prices = dict(zip(quotes['code'], quotes['last_price'])) if 'last_price' in quotes.columns else {}
+    for option_code, strike_price in zip(candidates['code'], candidates['strike_price']):
+        if option_code not in quoted:
+            continue
+        lot_size = quoted[option_code] or contract_table.lot_size(option_code)
+        if not lot_size:
+            continue
+        # 有摆盘时跳过价差过大的合约，并以卖一价估算买入成本
+        book = current_order_book(option_code)
+        if book is not None:
+            spread = book.spread()
+            if spread is None or spread[1] > OPTION_MAX_SPREAD:
+                logger.info("期权 %s 买卖价差过大或单边无挂单，跳过: %s", option_code, spread)
+                continue
+            prices[option_code] = book.best_ask()[0]
+        contract_table.update_lot_size(option_code, lot_size)
+        logger.info("期权合约乘数: %s", lot_size)
+        # 买入张数=1000/当前行权价取整，并确保是lot_size的整数倍
+        qty = int(1000 // strike_price)
+        qty = max(qty, 1) * lot_size
+        # 按账户现金限制买入数量
+        price = prices.get(option_code)
+        if portfolio.ready and portfolio.cash is not None and price and price > 0:
+            affordable = int(portfolio.cash // (price * lot_size)) * lot_size
+            if affordable < qty:
+                logger.info("账户现金 %.2f 不足，买入数量由 %d 调整为 %d", portfolio.cash, qty, affordable)
+                qty = affordable
+            if qty <= 0:
+                return None, None, None, None
+        logger.info("计算得到的买入数量: %d (考虑了合约乘数 %s)", qty, lot_size)
+        return option_code, strike_price, qty, lot_size
     return None, None, None, None
 
-def buy_option(trade_ctx, option_code, qty):
-    logger.info("市价买入期权: %s, 数量: %d", option_code, qty)
+def current_order_book(code):
+    """合约的当前摆盘：订阅摆盘期间保留最后一次推送（OpenD 只在摆盘变化时推送），未订阅时按 ORDER_BOOK_MAX_AGE 过期"""
+    from futu import SubType
+
+    subscribed = subscription_manager.is_subscribed(code, SubType.ORDER_BOOK)
+    return order_books.get(code, max_age=None if subscribed else ORDER_BOOK_MAX_AGE)
+
+def refresh_order_book(quote_ctx, code):
+    """查询一次摆盘并写入缓存（需已订阅摆盘），返回摆盘，失败返回 None"""
+    from futu import RET_OK, SubType
+
+    if not subscription_manager.is_subscribed(code, SubType.ORDER_BOOK):
+        return None
+    try:
+        ret, data = quote_ctx.get_order_book(code, num=ORDER_BOOK_LEVELS)
+    except Exception as e:
+        logger.error("获取摆盘 %s 时发生错误: %s", code, str(e))
+        return None
+    if ret != RET_OK:
+        logger.error("获取摆盘 %s 失败: %s", code, data)
+        return None
+    return order_books.update(data)
+
+def order_price(quote_ctx, code, qty, buy):
+    """按摆盘计算限价单价格，返回 (price, order_type)，没有可用价格时返回 (None, None)
+
+    港股期权不接受市价单，始终下限价单：摆盘可用时价格为吃到 qty 所需的最差一档（可见深度不足时为最深一档，
+    剩余部分挂单等待）；缓存中没有摆盘时先查询一次摆盘；对手盘仍为空时以最新价挂单。
+    """
+    from futu import OrderType
+
+    for book in (current_order_book(code), refresh_order_book(quote_ctx, code)):
+        if book is None:
+            continue
+        avg_price, filled, limit_price = book.estimate_fill(qty, buy)
+        if filled > 0:
+            if filled < qty:
+                logger.warning("%s 可见对手盘只有 %d，少于下单数量 %d", code, filled, qty)
+            logger.info("%s 按摆盘限价 %.3f 下单，预计成交均价 %.4f", code, limit_price, avg_price)
+            return limit_price, OrderType.NORMAL
+    price = get_underlying_price(quote_ctx, code)
+    if price is None or not price > 0:
+        logger.error("%s 没有摆盘也没有最新价，无法定价", code)
+        return None, None
+    logger.warning("%s 对手盘为空，按最新价 %.3f 挂限价单", code, price)
+    return price, OrderType.NORMAL
+
+def round_to_lot(option_code, qty):
+    """按合约信息表中的每手股数向下取整，未知手数时原样返回"""
+    lot_size = contract_table.lot_size(option_code)
+    if lot_size is None:
+        logger.warning("合约 %s 手数未知，按原数量下单", option_code)
+        return qty
+    return (qty // lot_size) * lot_size
+
+def send_order(trade_ctx, code, qty, trd_side, price, order_type, remark):
+    """订单管道的下单函数（在下单线程中执行，按下单路径优先），返回 place_order 的结果"""
+    from futu import TrdEnv
+
+    with order_priority(trade_ctx):
+        return trade_ctx.place_order(price=price, qty=qty, code=code, trd_side=trd_side, order_type=order_type,
+                                     adjust_limit=0, trd_env=TrdEnv.SIMULATE, remark=remark)
+
+def cancel_order(trade_ctx, order_id):
+    """撤销订单的剩余数量"""
+    from futu import ModifyOrderOp, TrdEnv
+
+    with order_priority(trade_ctx):
+        return trade_ctx.modify_order(ModifyOrderOp.CANCEL, order_id, 0, 0, trd_env=TrdEnv.SIMULATE)
+
+def buy_option(quote_ctx, trade_ctx, option_code, qty, on_fill=None):
+    """提交买入订单（不等待成交），返回 OrderTicket；每次成交时调用 on_fill(ticket, 成交数量, 成交均价)"""
+    from futu import TrdSide
+
+    logger.info("买入期权: %s, 数量: %d", option_code, qty)
     # 确保数量是lot_size的整数倍
-    ret, quote, *_ = trade_ctx.get_stock_quote([option_code])
-    if ret == RET_OK and not quote.empty:
-        lot_size = quote.iloc[0]['lot_size']
-        qty = (qty // lot_size) * lot_size  # 确保是lot_size的整数倍
-        print("调整后的买入数量: %d (合约乘数: %s)", qty, lot_size)
+    qty = round_to_lot(option_code, qty)
+    logger.info("调整后的买入数量: %d (合约乘数: %s)", qty, contract_table.lot_size(option_code))
+    if qty <= 0:
+        logger.error("买入数量不足一手: %s", option_code)
+        return None
     
-    ret, data, *_ = trade_ctx.place_order(price=0, qty=qty, code=option_code, trd_side=TrdSide.BUY, order_type=OrderType.MARKET, adjust_limit=0, trd_env=TrdEnv.SIMULATE)
-    print("买入结果", ret, data)
-    # 获取实际成交价
-    if ret == RET_OK and 'deal_price' in data:
-        deal_price = data['deal_price']
-    else:
-        deal_price = None
-    return ret == RET_OK, deal_price
+    price, order_type = order_price(quote_ctx, option_code, qty, buy=True)
+    if order_type is None:
+        return None
+    return order_pipeline.submit(option_code, qty, TrdSide.BUY, price, order_type, on_fill=on_fill,
+                                 timeout=BUY_FILL_TIMEOUT)
 
 def monitor_profit_loss(trade_ctx, option_code, buy_price, qty):
-    """监控期权盈亏"""
+    """登记持仓，由 position_manager 在行情推送中监控盈亏（不阻塞）"""
     if buy_price is None:
         return
+    position_manager.open(option_code, buy_price, qty)
+    # 新持仓尽快写入快照，进程在下一次定时快照前退出也能恢复监控；
+    # 本函数在成交推送线程中执行，只标记并发布事件，由调度线程写入
+    state_snapshot.mark_dirty()
+    strategy_scheduler.publish(EVENT_STATE_CHANGED, None)
 
-    while True:
-        try:
-            # 获取当前价格
-            ret, quote, *_ = trade_ctx.get_stock_quote([option_code])
-            if ret != RET_OK or quote.empty:
-                time.sleep(1)
-                continue
-                
-            current_price = quote.iloc[0]['last_price']
-            profit_ratio = (current_price - buy_price) / buy_price
-            
-            # 止盈止损
-            if profit_ratio >= PROFIT_THRESHOLD or profit_ratio <= LOSS_THRESHOLD:
-                logger.info("触发止盈止损: 当前价格 %.2f, 买入价格 %.2f, 盈亏比例 %.2f%%", 
-                          current_price, buy_price, profit_ratio * 100)
-                sell_all(trade_ctx, option_code, qty, buy_price)
-                break
-                
-            time.sleep(1)
-        except Exception as e:
-            logger.error("监控盈亏时发生错误: %s", str(e))
-            time.sleep(1)
+def get_quote_prices(quote_ctx, codes):
+    """批量查询最新价，返回 {code: last_price}（用于持仓监控，按下单路径优先）"""
+    from futu import RET_OK
 
+    with order_priority(quote_ctx):
+        ret, data = quote_batcher.get_stock_quote(quote_ctx, codes)
+    if ret != RET_OK:
+        logger.error("获取股票行情失败: %s", data)
+        return {}
+    return dict(zip(data['code'], data['last_price']))
+
+@latency_recorder.timed('is_up_trend')
 def is_up_trend(kline_10m):
     """判断是否处于上涨趋势"""
     if len(kline_10m) < 2:
         return False
         
     # 计算上涨和下跌的K线数量
-    up_count = 0
-    down_count = 0
-    up_sum = 0
-    down_sum = 0
-    
-    for i in range(1, len(kline_10m)):
-        change = (kline_10m['close'].iloc[i] - kline_10m['close'].iloc[i-1]) / kline_10m['close'].iloc[i-1]
-        if change > 0:
-            up_count += 1
-            up_sum += change
-        else:
-            down_count += 1
-            down_sum += change
+    up_count, down_count, up_sum, down_sum = up_trend_stats(kline_10m['close'].to_numpy())
     
     logger.info("[趋势判定] 10分钟上涨K线数: %d, 下跌K线数: %d, 上涨幅和: %.4f, 下跌幅和: %.4f", 
                up_count, down_count, up_sum, down_sum)
     
     # 上涨K线数量大于下跌K线数量，且上涨幅度和大于下跌幅度和
-    return up_count > down_count and up_sum > abs(down_sum)
+    return bool(up_count > down_count and up_sum > abs(down_sum))
+
+def confirm_no_position(trade_ctx, codes):
+    """返回账户确实没有持仓的代码：缓存中数量为 0 时重新全量核对一次再判断（缓存可能尚未计入成交），
+    账户状态不可用或核对失败时返回空列表
+    """
+    from futu import TrdEnv
+
+    if not portfolio.ready:
+        return []
+    empty = [code for code in codes if portfolio.qty(code) <= 0]
+    if not empty or not portfolio.reconcile(trade_ctx, TrdEnv.SIMULATE):
+        return []
+    return [code for code in empty if portfolio.qty(code) <= 0]
 
-def sell_all(trade_ctx, option_code, qty, buy_price):
+def sell_all(quote_ctx, trade_ctx, option_code, qty, buy_price, on_done=None):
+    """提交卖出订单（不等待成交），返回 OrderTicket，订单到达终态时调用 on_done(ticket)；
+    账户已无持仓时返回 True，无法下单时返回 False
+    """
+    from futu import TrdSide
+
+    # 不超过账户实际持仓（部分成交时持仓少于登记数量）
+    if confirm_no_position(trade_ctx, [option_code]):
+        # 账户已没有该合约（已卖出或从未成交），不再下单，直接结束监控
+        logger.warning("账户无持仓 %s，不再卖出，停止监控", option_code)
+        return True
+    held = portfolio.qty(option_code)
+    if portfolio.ready and held < qty:
+        logger.info("账户持仓 %s 为 %d，卖出数量由 %d 调整为 %d", option_code, held, qty, held)
+        qty = held
     # 确保卖出数量是lot_size的整数倍
-    ret, quote, *_ = trade_ctx.get_stock_quote([option_code])
-    if ret == RET_OK and not quote.empty:
-        lot_size = quote.iloc[0]['lot_size']
-        qty = (qty // lot_size) * lot_size  # 确保是lot_size的整数倍
+    qty = round_to_lot(option_code, qty)
     
-    ret, data, *_ = trade_ctx.place_order(price=0, qty=qty, code=option_code, trd_side=TrdSide.SELL, order_type=OrderType.MARKET, adjust_limit=0, trd_env=TrdEnv.SIMULATE)
-    if ret == RET_OK:
-        logger.info("成功卖出期权: %s, 数量: %d", option_code, qty)
-    else:
-        logger.error("卖出期权失败: %s", data)
+    if qty <= 0:
+        logger.error("卖出数量不足一手: %s", option_code)
+        return False
+    
+    # 经订单管道提交，成交结果由 on_done 交给持仓监控按实际成交数量处理；超时未成交由持仓监控撤销剩余数量
+    price, order_type = order_price(quote_ctx, option_code, qty, buy=False)
+    if order_type is None:
+        return False
+    logger.info("提交卖出期权: %s, 数量: %d, 价格: %s", option_code, qty, price)
+    return order_pipeline.submit(option_code, qty, TrdSide.SELL, price, order_type, on_done=on_done)
+
+def trend_reversal_strategy(quote_ctx, trade_ctx, stock_code, event=None):
+    """趋势反转策略，event 为触发本次执行的调度事件（用于统计K线走完到下单的延迟）"""
+    from futu import KLType
 
-def trend_reversal_strategy(quote_ctx, trade_ctx, stock_code):
-    """趋势反转策略"""
     try:
         logger.info("\n[流程图策略] 开始分析股票 %s", stock_code)
         
@@ -393,11 +721,15 @@ def trend_reversal_strategy(quote_ctx, trade_ctx, stock_code):
         end_date = datetime.now()
         start_date = end_date - timedelta(days=1)
         
-        # 获取1分钟和10分钟K线
+        # 获取1分钟K线，10分钟K线由1分钟K线合成（只取已走完的K线）
         kline_1m = get_history_kline(quote_ctx, stock_code, start_date, end_date, KLType.K_1M)
-        kline_10m = get_history_kline(quote_ctx, stock_code, start_date, end_date, KLType.K_1M)
+        if kline_1m is None:
+            logger.warning("[流程图策略] K线数据不足: %s", stock_code)
+            return
+        bar_aggregator.update(stock_code, kline_1m)
+        kline_10m = bar_aggregator.frame(stock_code, count=KLINE_10M_COUNT)
         
-        if kline_1m is None or kline_10m is None:
+        if kline_10m.empty:
             logger.warning("[流程图策略] K线数据不足: %s", stock_code)
             return
             
@@ -419,63 +751,73 @@ def trend_reversal_strategy(quote_ctx, trade_ctx, stock_code):
         kline_time = None
         
         # 尝试从订阅数据获取最新价格
-        quote_data = get_latest_quote_data()
+        quote_data = get_latest_quote_data(stock_code)
         if quote_data is not None and 'last_price' in quote_data:
             current_price = quote_data['last_price']
-            quote_time = pd.to_datetime(quote_data['svr_recv_time_bid'])
+            quote_time = market_data.quotes.get_time(stock_code)
             
         # 从K线数据获取最新价格
         if not kline_1m.empty:
             kline_price = kline_1m['close'].iloc[-1]
-            kline_time = kline_1m['time_key'].iloc[-1]
+            kline_time = parse_time_ms(kline_1m['time_key'].iloc[-1])
             
-            if quote_time is None or quote_time < kline_time:
+            if quote_time is None or (kline_time is not None and quote_time < kline_time):
                 current_price = kline_price
                 
         if current_price is None:
             logger.info("无订阅数据，使用K线数据作为当前价格: %s", current_price)
             return
             
-        logger.info("使用%s数据作为当前价格: %s", '订阅' if quote_time > kline_time else 'K线', current_price)
+        use_quote = quote_time is not None and (kline_time is None or quote_time >= kline_time)
+        logger.info("使用%s数据作为当前价格: %s", '订阅' if use_quote else 'K线', current_price)
+        enter_option_position(quote_ctx, trade_ctx, stock_code, event)
         
+    except Exception as e:
+        logger.error("[流程图策略] 分析股票 %s 时发生错误: %s", stock_code, str(e), exc_info=True)
+
+def enter_option_position(quote_ctx, trade_ctx, stock_code, event=None):
+    """买入信号触发后选期权并提交买入订单（成交后登记持仓监控），返回是否已提交"""
+    try:
+        return _enter_option_position(quote_ctx, trade_ctx, stock_code, event)
+    finally:
+        # 选期权时订阅的标的与候选合约不再需要（买入的合约已加入持仓分组；订阅满一分钟后才会反订阅）
+        subscription_manager.remove(quote_ctx, f'entry:{stock_code}')
+
+def _enter_option_position(quote_ctx, trade_ctx, stock_code, event):
+    from futu import SubType
+
+    # 选期权与下单的请求优先于分析请求
+    with order_priority(quote_ctx, trade_ctx):
         # 获取期权链
         option_code, strike_price, qty, lot_size = get_option_to_buy(quote_ctx, stock_code)
         
         if option_code is None:
             logger.warning("[流程图策略] 获取期权链失败: %s", stock_code)
-            return
-    
-        # 买入期权
-        success, buy_price = buy_option(trade_ctx, option_code, qty)
+            return False
     
-        if not success:
-            logger.error("[流程图策略] 买入期权失败: %s", option_code)
-            return
-            
-        logger.info("[流程图策略] 选择期权: %s, 行权价: %.2f", option_code, strike_price)
-        logger.info("[流程图策略] 成功买入期权: %s", option_code)
-        
-        # 监控盈亏
-        monitor_profit_loss(trade_ctx, option_code, buy_price, qty)
-        
-    except Exception as e:
-        logger.error("[流程图策略] 分析股票 %s 时发生错误: %s", stock_code, str(e), exc_info=True)
+        # 买入期权（异步提交），按实际成交数量与成交均价登记持仓监控
+        ticket = buy_option(quote_ctx, trade_ctx, option_code, qty,
+                            on_fill=lambda _, fill_qty, fill_price:
+                            monitor_profit_loss(trade_ctx, option_code, fill_price, fill_qty))
+    if event is not None and event.kind == EVENT_BAR_CLOSE and event.ts is not None:
+        latency_recorder.observe('bar_close_to_order', event.age())
 
-def calculate_ma(data, period):
-    """计算移动平均线"""
-    return data['close'].rolling(window=period).mean()
-
-def calculate_macd(data, fast=12, slow=26, signal=9):
-    """计算MACD指标"""
-    exp1 = data['close'].ewm(span=fast, adjust=False).mean()
-    exp2 = data['close'].ewm(span=slow, adjust=False).mean()
-    macd = exp1 - exp2
-    signal_line = macd.ewm(span=signal, adjust=False).mean()
-    hist = macd - signal_line
-    return macd, signal_line, hist
+    if ticket is None:
+        logger.error("[流程图策略] 买入期权失败: %s", option_code)
+        return False
+        
+    logger.info("[流程图策略] 选择期权: %s, 行权价: %.2f", option_code, strike_price)
+    logger.info("[流程图策略] 已提交买入订单: %s", option_code)
+    
+    # 订阅持仓合约行情与摆盘，由推送驱动盈亏监控，卖出时按摆盘定价
+    if not subscription_manager.add(quote_ctx, 'positions', [option_code], [SubType.QUOTE, SubType.ORDER_BOOK]):
+        logger.warning("[流程图策略] 订阅持仓合约行情失败，将轮询报价: %s", option_code)
+    return True
 
 def analyze_stock(quote_ctx, stock_code):
     """分析股票"""
+    from futu import KLType
+
     try:
         logger.info("\n开始分析股票 %s", stock_code)
         
@@ -494,15 +836,10 @@ def analyze_stock(quote_ctx, stock_code):
             
         logger.info("成功获取历史K线数据，共 %d 条记录", len(kline_data))
         
-        # 计算技术指标
+        # 计算技术指标（只处理新到的K线）
         logger.info("计算技术指标...")
-        kline_data['ma5'] = calculate_ma(kline_data, 5)
-        kline_data['ma10'] = calculate_ma(kline_data, 10)
-        kline_data['ma20'] = calculate_ma(kline_data, 20)
-        macd, signal, hist = calculate_macd(kline_data)
-        kline_data['macd'] = macd
-        kline_data['signal'] = signal
-        kline_data['hist'] = hist
+        with latency_recorder.span('indicators'):
+            indicators = indicator_engine.feed(stock_code, kline_data)
         
         # 获取实时行情
         logger.info("获取实时行情...")
@@ -525,22 +862,23 @@ def analyze_stock(quote_ctx, stock_code):
             return None
             
         # 判断趋势
-        trend = 'UP' if current_price > kline_data['ma20'].iloc[-1] else 'DOWN'
+        trend = 'UP' if current_price > indicators['ma20'] else 'DOWN'
         
         # 判断MACD信号
-        macd_signal = 'BUY' if (kline_data['macd'].iloc[-1] > kline_data['signal'].iloc[-1] and 
-                               kline_data['macd'].iloc[-2] <= kline_data['signal'].iloc[-2]) else 'SELL'
+        macd_signal = 'BUY' if (indicators['prev_macd'] is not None and
+                               indicators['macd'] > indicators['signal'] and 
+                               indicators['prev_macd'] <= indicators['prev_signal']) else 'SELL'
         
         result = {
             'current_price': current_price,
             'trend': trend,
             'macd_signal': macd_signal,
-            'ma5': kline_data['ma5'].iloc[-1] if not pd.isna(kline_data['ma5'].iloc[-1]) else 0,
-            'ma10': kline_data['ma10'].iloc[-1] if not pd.isna(kline_data['ma10'].iloc[-1]) else 0,
-            'ma20': kline_data['ma20'].iloc[-1] if not pd.isna(kline_data['ma20'].iloc[-1]) else 0,
-            'macd': kline_data['macd'].iloc[-1] if not pd.isna(kline_data['macd'].iloc[-1]) else 0,
-            'signal': kline_data['signal'].iloc[-1] if not pd.isna(kline_data['signal'].iloc[-1]) else 0,
-            'hist': kline_data['hist'].iloc[-1] if not pd.isna(kline_data['hist'].iloc[-1]) else 0
+            'ma5': indicators['ma5'] if not pd.isna(indicators['ma5']) else 0,
+            'ma10': indicators['ma10'] if not pd.isna(indicators['ma10']) else 0,
+            'ma20': indicators['ma20'] if not pd.isna(indicators['ma20']) else 0,
+            'macd': indicators['macd'] if not pd.isna(indicators['macd']) else 0,
+            'signal': indicators['signal'] if not pd.isna(indicators['signal']) else 0,
+            'hist': indicators['hist'] if not pd.isna(indicators['hist']) else 0
         }
         
         logger.info("分析完成: %s", result)
@@ -550,82 +888,196 @@ def analyze_stock(quote_ctx, stock_code):
         logger.error("分析股票 %s 时发生错误: %s", stock_code, str(e), exc_info=True)
         return None
 
-def main():
+def log_account_status(trade_ctx):
+    """到期时全量核对账户状态，资金或持仓有变化时打印"""
+    from futu import TrdEnv
+
+    global portfolio_logged_version
+    if portfolio.due():
+        portfolio.reconcile(trade_ctx, TrdEnv.SIMULATE)
+    if not portfolio.ready or portfolio.version == portfolio_logged_version:
+        return
+    portfolio_logged_version = portfolio.version
+    logger.info("\n" + "="*50)
+    logger.info("账户状态 - %s", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    logger.info("\n账户现金: %s, 购买力: %s", portfolio.cash, portfolio.power)
+    positions = portfolio.frame()
+    logger.info("\n当前持仓:")
+    if not positions.empty:
+        logger.info("%s", LazyFrame(positions))
+    else:
+        logger.warning("当前持仓为空")
+
+def export_latency_metrics(path):
+    """导出各阶段耗时直方图（Prometheus 文本格式）"""
+    try:
+        latency_recorder.export_prometheus(path)
+    except OSError as e:
+        logger.error("导出延迟统计失败: %s", str(e))
+
+def run_macd_strategy(quote_ctx, stock_code):
+    """MACD策略"""
+    logger.info("\n[MACD策略] 分析股票: %s", stock_code)
+    result_macd = analyze_stock(quote_ctx, stock_code)
+    if result_macd is not None:
+        logger.info("[MACD策略] 当前价格: %s", result_macd.get('current_price', 'N/A'))
+        logger.info("[MACD策略] 趋势: %s", result_macd.get('trend', 'N/A'))
+        logger.info("[MACD策略] MACD信号: %s", result_macd.get('macd_signal', 'N/A'))
+        logger.info("[MACD策略] MA5: %.2f", result_macd.get('ma5', 0))
+        logger.info("[MACD策略] MA10: %.2f", result_macd.get('ma10', 0))
+        logger.info("[MACD策略] MA20: %.2f", result_macd.get('ma20', 0))
+        logger.info("[MACD策略] MACD: %.2f", result_macd.get('macd', 0))
+        logger.info("[MACD策略] Signal: %.2f", result_macd.get('signal', 0))
+        logger.info("[MACD策略] Hist: %.2f", result_macd.get('hist', 0))
+        
+        if result_macd.get('macd_signal') == 'BUY':
+            logger.info("[MACD策略] 发现买入信号: %s", stock_code)
+            # order_result = place_order(trade_ctx, stock_code, 0, 100, TrdSide.BUY, OrderType.MARKET)
+            # logger.info("下单结果: %s", order_result)
+    else:
+        logger.warning("[MACD策略] 分析结果为空")
+    return result_macd
+
+def run_trend_strategy(quote_ctx, trade_ctx, stock_code, event=None):
+    """流程图策略"""
+    logger.info("\n[流程图策略] 分析股票: %s", stock_code)
+    result_trend = trend_reversal_strategy(quote_ctx, trade_ctx, stock_code, event)
+    if result_trend is not None:
+        logger.info("[流程图策略] 结果: %s", result_trend)
+    else:
+        logger.warning("[流程图策略] 分析结果为空")
+    return result_trend
+
+def load_screen_records(quote_ctx, codes):
+    """并发加载代码池最近一天的1分钟K线（经本地缓存，只请求缺失的尾部），返回 {code: 记录数组}"""
+    from futu import KLType
+
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=1)
+    results = analysis_pool.map(
+        lambda code: kline_store.get_records(quote_ctx, code, start_date, end_date, KLType.K_1M), codes)
+    return {code: records for code, records, _ in results if records is not None}
+
+def on_screen_hits(quote_ctx, trade_ctx, hits):
+    """筛选命中：趋势反转信号走选期权与下单流程，MACD 信号只记录（与 run_macd_strategy 一致）"""
+    for row in hits.itertuples(index=False):
+        if row.macd_buy:
+            logger.info("[筛选] MACD 买入信号: %s 当前价格 %.3f", row.code, row.last_price)
+        if row.trend_reversal:
+            logger.info("[筛选] 触发趋势反转买入信号: %s 当前价格 %.3f", row.code, row.last_price)
+            try:
+                enter_option_position(quote_ctx, trade_ctx, row.code)
+            except Exception as e:
+                logger.error("[筛选] 买入 %s 时发生错误: %s", row.code, str(e), exc_info=True)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='期权趋势反转策略')
+    parser.add_argument('--state-file', default=STATE_SNAPSHOT_FILE, help='状态快照文件')
+    parser.add_argument('--no-restore', action='store_true', help='不从状态快照恢复（冷启动）')
+    parser.add_argument('--show-state', action='store_true', help='打印状态快照内容后退出（不连接 OpenD）')
+    return parser.parse_args(argv)
+
+def show_state():
+    """打印状态快照摘要与持仓"""
+    state = state_snapshot.load()
+    if state is None:
+        print(f"没有可用的状态快照: {state_snapshot.path}")
+        return
+    saved_at = datetime.fromtimestamp(state['saved_at'])
+    print(f"状态快照 {state_snapshot.path}，保存于 {saved_at:%Y-%m-%d %H:%M:%S}"
+          f"（{(datetime.now() - saved_at).total_seconds():.0f} 秒前）")
+    for name, count in describe_snapshot(state).items():
+        print(f"  {name:<14} {count}")
+    for code, buy_price, qty, opened_at in state['components'].get('positions', []):
+        print(f"  持仓 {code} 买入价格 {buy_price:.4f} 数量 {qty} 登记于 "
+              f"{datetime.fromtimestamp(opened_at):%Y-%m-%d %H:%M:%S}")
+
+def resume_positions(quote_ctx, trade_ctx):
+    """由快照恢复的持仓与账户核对：账户已没有的合约停止监控，其余重新订阅行情"""
+    from futu import SubType
+
+    for code in confirm_no_position(trade_ctx, position_manager.codes()):
+        position_manager.close(code)
+        logger.warning("账户无持仓 %s，停止监控", code)
+    codes = position_manager.codes()
+    if codes and not subscription_manager.add(quote_ctx, 'positions', codes, [SubType.QUOTE, SubType.ORDER_BOOK]):
+        logger.warning("订阅持仓合约行情失败，将轮询报价: %s", codes)
+
+def main(argv=None):
     """主函数"""
+    args = parse_args(argv)
+    state_snapshot.path = args.state_file
+    if args.show_state:
+        show_state()
+        return
+    
+    from futu import SubType, OptionType, TrdEnv, OpenQuoteContext, OpenSecTradeContext
+    
     logger = setup_logger()
     logger.info("启动程序...")
     
-    # 创建行情和交易上下文
-    quote_ctx = OpenQuoteContext(host='127.0.0.1', port=11111)
-    trade_ctx = OpenSecTradeContext(host='127.0.0.1', port=11111)
+    # 热重启：连接前先恢复指标、K线合成、合约信息、期权链与持仓
+    if not args.no_restore:
+        state_snapshot.restore()
+    
+    # 创建行情和交易上下文，经请求网关访问（连接池、相同请求合并、按接口限频、下单优先）
+    quote_ctx = RequestGateway([OpenQuoteContext(host='127.0.0.1', port=11111) for _ in range(QUOTE_CONTEXT_POOL)])
+    trade_ctx = RequestGateway(OpenSecTradeContext(host='127.0.0.1', port=11111))
     
     try:
+        register_handlers(quote_ctx, trade_ctx)
+        portfolio.reconcile(trade_ctx, TrdEnv.SIMULATE)
+        resume_positions(quote_ctx, trade_ctx)
+        order_pipeline.start(
+            place_func=lambda code, qty, trd_side, price, order_type, remark:
+            send_order(trade_ctx, code, qty, trd_side, price, order_type, remark),
+            query_func=lambda: trade_ctx.order_list_query(trd_env=TrdEnv.SIMULATE),
+            cancel_func=lambda order_id: cancel_order(trade_ctx, order_id))
+        position_manager.start(
+            sell_func=lambda code, qty, buy_price, on_done:
+            sell_all(quote_ctx, trade_ctx, code, qty, buy_price, on_done),
+            quote_func=lambda codes: get_quote_prices(quote_ctx, codes),
+            close_func=lambda code: subscription_manager.remove(quote_ctx, 'positions', [code]),
+            cancel_func=order_pipeline.cancel)
+        
         # 订阅基本行情数据
         stock_list = ['HK.00700']
-        ret, data = quote_ctx.subscribe(stock_list, [SubType.QUOTE])
-        if ret != RET_OK:
-            logger.error("订阅行情失败: %s", data)
+        if not subscription_manager.set_group(quote_ctx, 'watchlist', stock_list, [SubType.QUOTE]):
+            logger.error("订阅行情失败: %s", stock_list)
             return
         logger.info("成功订阅基本行情数据")
         
-        while True:
-            logger.info("\n" + "="*50)
-            logger.info("开始新一轮分析 - %s", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-            
-            # 获取账户资金状况
-            logger.info("\n获取账户资金状况...")
-            account_funds = get_account_funds(trade_ctx)
-            logger.info("\n账户资金状况:")
-            if account_funds is not None and not account_funds.empty:
-                logger.info(account_funds.to_string())
-            else:
-                logger.warning("账户资金数据为空")
-            
-            # 获取持仓信息
-            logger.info("\n获取持仓信息...")
-            positions = get_positions(trade_ctx)
-            logger.info("\n当前持仓:")
-            if positions is not None and not positions.empty:
-                logger.info(positions.to_string())
-            else:
-                logger.warning("当前持仓为空")
-            
-            # 分析股票
-            for stock_code in stock_list:
-                if stock_code == 'HK.00700':
-                    monitor_option_chain(quote_ctx, stock_code, OptionType.CALL)
-                
-                # MACD策略
-                logger.info("\n[MACD策略] 分析股票: %s", stock_code)
-                result_macd = analyze_stock(quote_ctx, stock_code)
-                if result_macd is not None:
-                    logger.info("[MACD策略] 当前价格: %s", result_macd.get('current_price', 'N/A'))
-                    logger.info("[MACD策略] 趋势: %s", result_macd.get('trend', 'N/A'))
-                    logger.info("[MACD策略] MACD信号: %s", result_macd.get('macd_signal', 'N/A'))
-                    logger.info("[MACD策略] MA5: %.2f", result_macd.get('ma5', 0))
-                    logger.info("[MACD策略] MA10: %.2f", result_macd.get('ma10', 0))
-                    logger.info("[MACD策略] MA20: %.2f", result_macd.get('ma20', 0))
-                    logger.info("[MACD策略] MACD: %.2f", result_macd.get('macd', 0))
-                    logger.info("[MACD策略] Signal: %.2f", result_macd.get('signal', 0))
-                    logger.info("[MACD策略] Hist: %.2f", result_macd.get('hist', 0))
-                    
-                    if result_macd.get('macd_signal') == 'BUY':
-                        logger.info("[MACD策略] 发现买入信号: %s", stock_code)
-                        # order_result = place_order(trade_ctx, stock_code, 0, 100, TrdSide.BUY, OrderType.MARKET)
-                        # logger.info("下单结果: %s", order_result)
-                else:
-                    logger.warning("[MACD策略] 分析结果为空")
-                
-                # 流程图策略
-                logger.info("\n[流程图策略] 分析股票: %s", stock_code)
-                result_trend = trend_reversal_strategy(quote_ctx, trade_ctx, stock_code)
-                if result_trend is not None:
-                    logger.info("[流程图策略] 结果: %s", result_trend)
-                else:
-                    logger.warning("[流程图策略] 分析结果为空")
-            
-            logger.info("\n等待60秒后进行下一轮分析...")
-            time.sleep(60)
+        # K线走完或定时兜底时只触发相关代码的策略
+        strategy_scheduler.register('account', lambda code, event: log_account_status(trade_ctx),
+                                    events=(EVENT_TIMER,))
+        strategy_scheduler.register('option_chain',
+                                    lambda code, event: monitor_option_chain(quote_ctx, code, OptionType.CALL),
+                                    events=(EVENT_TIMER,), codes=[code for code in stock_list if code == 'HK.00700'])
+        strategy_scheduler.register('macd', lambda code, event: run_macd_strategy(quote_ctx, code),
+                                    events=(EVENT_BAR_CLOSE, EVENT_TIMER), codes=stock_list)
+        strategy_scheduler.register('trend_reversal',
+                                    lambda code, event: run_trend_strategy(quote_ctx, trade_ctx, code, event),
+                                    events=(EVENT_BAR_CLOSE, EVENT_TIMER), codes=stock_list)
+        
+        if state_snapshot.path:
+            strategy_scheduler.register('state_snapshot',
+                                        lambda code, event: state_snapshot.save() if event.kind == EVENT_TIMER
+                                        else state_snapshot.save_if_dirty(),
+                                        events=(EVENT_TIMER, EVENT_STATE_CHANGED))
+        
+        if LATENCY_METRICS_FILE:
+            strategy_scheduler.register('latency_export',
+                                        lambda code, event: export_latency_metrics(LATENCY_METRICS_FILE),
+                                        events=(EVENT_TIMER,))
+        
+        if SCREEN_UNIVERSE:
+            screener.start(SCREEN_UNIVERSE,
+                           load_func=lambda codes: load_screen_records(quote_ctx, codes),
+                           hit_func=lambda hits: on_screen_hits(quote_ctx, trade_ctx, hits))
+            logger.info("启动代码池筛选: %d 个代码，间隔 %d 秒", len(SCREEN_UNIVERSE), SCREEN_INTERVAL)
+        
+        logger.info("启动事件驱动调度，兜底间隔 %d 秒", FALLBACK_INTERVAL)
+        strategy_scheduler.run()
             
     except KeyboardInterrupt:
         logger.info("\n程序被用户中断")
@@ -633,8 +1085,19 @@ def main():
         logger.error("主循环发生错误: %s", str(e), exc_info=True)
     finally:
         logger.info("程序结束，清理资源...")
+        strategy_scheduler.report()
+        state_snapshot.save()
+        if LATENCY_METRICS_FILE:
+            export_latency_metrics(LATENCY_METRICS_FILE)
+        screener.stop()
+        position_manager.stop()
+        order_pipeline.stop()
+        analysis_pool.shutdown()
+        if tick_recorder is not None:
+            tick_recorder.close()
         quote_ctx.close()
         trade_ctx.close()
+        shutdown_logger()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,276 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+EXCHANGE_TZ = timezone(timedelta(hours=8))  # 推送与K线时间为交易所（北京/香港）时间
+_day_start_ms = {}  # 'YYYY-MM-DD' -> 当日零点的毫秒时间戳
+_day_lock = threading.Lock()
+
+
+def parse_time_ms(value):
+    """将 'YYYY-MM-DD HH:MM:SS[.ffffff]'（交易所时间）解析为毫秒整数时间戳，无法解析时返回 None
+
+    按固定的 +08:00 解析，结果与 time.time() 可直接比较，与运行主机的时区无关。
+    只在每个交易日第一次出现时调用 datetime，其余按定长切片计算，
+    推送回调中可以低成本地预先解析时间。
+    """
+    if not isinstance(value, str) or len(value) < 19:
+        return None
+    try:
+        day = value[:10]
+        day_ms = _day_start_ms.get(day)
+        if day_ms is None:
+            with _day_lock:
+                day_ms = int(datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=EXCHANGE_TZ).timestamp() * 1000)
+                _day_start_ms[day] = day_ms
+        ms = (int(value[11:13]) * 3600 + int(value[14:16]) * 60 + int(value[17:19])) * 1000
+        if len(value) > 20 and value[19] == '.':
+            ms += int(value[20:23].ljust(3, '0'))
+        return day_ms + ms
+    except ValueError:
+        return None
+
+
+def frame_columns(data, names):
+    """一次性取出 DataFrame 的多列（对单行推送帧比逐列 data[name] 快一个数量级）"""
+    values = data.to_numpy()
+    columns = data.columns.tolist()
+    return [values[:, columns.index(name)] for name in names]
+
+
+class LatestSnapshot:
+    """按代码保存最新一条记录
+
+    写入时比较预先解析好的整数时间戳，读取为 O(1) 的字典查找，不产生额外分配。
+    推送回调在富途的单个回调线程中执行，元组整体替换保证读取方看到一致的数据。
+    """
+
+    def __init__(self):
+        self._latest = {}  # code -> (ts, record)
+        self._newest = None  # 所有代码中最新的 (ts, record)
+
+    def update(self, code, ts, record):
+        current = self._latest.get(code)
+        if current is None or ts >= current[0]:
+            self._latest[code] = (ts, record)
+        newest = self._newest
+        if newest is None or ts >= newest[0]:
+            self._newest = (ts, record)
+
+    def get(self, code=None):
+        """获取指定代码（不指定时为所有代码中）的最新记录"""
+        entry = self._newest if code is None else self._latest.get(code)
+        return entry[1] if entry is not None else None
+
+    def get_time(self, code=None):
+        entry = self._newest if code is None else self._latest.get(code)
+        return entry[0] if entry is not None else None
+
+    def codes(self):
+        return list(self._latest)
+
+
+# 环形缓冲区中的定长记录结构
+QUOTE_DTYPE = np.dtype([
+    ('ts', 'i8'),
+    ('last_price', 'f8'),
+    ('open_price', 'f8'),
+    ('high_price', 'f8'),
+    ('low_price', 'f8'),
+    ('volume', 'i8'),
+    ('turnover', 'f8'),
+])
+
+TICKER_DTYPE = np.dtype([
+    ('ts', 'i8'),
+    ('price', 'f8'),
+    ('volume', 'i8'),
+    ('turnover', 'f8'),
+    ('direction', 'i1'),  # 1 主动买入，-1 主动卖出，0 中性
+    ('sequence', 'i8'),
+])
+
+ORDER_BOOK_DTYPE = np.dtype([
+    ('ts', 'i8'),
+    ('bid_price', 'f8'),
+    ('bid_volume', 'i8'),
+    ('ask_price', 'f8'),
+    ('ask_volume', 'i8'),
+])
+
+TICKER_DIRECTIONS = {'BUY': 1, 'SELL': -1}
+
+
+class RingBuffer:
+    """定长 NumPy 结构化数组实现的环形缓冲区（单写多读）"""
+
+    __slots__ = ('data', 'capacity', 'count')
+
+    def __init__(self, dtype, capacity):
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.capacity = capacity
+        self.count = 0  # 累计写入条数
+
+    def append(self, row):
+        self.data[self.count % self.capacity] = row
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def latest(self):
+        """最新一条记录（拷贝），为空时返回 None"""
+        if self.count == 0:
+            return None
+        return self.data[(self.count - 1) % self.capacity].copy()
+
+    def to_array(self, n=None):
+        """按时间顺序返回最近 n 条记录的拷贝"""
+        size = len(self)
+        n = size if n is None else min(n, size)
+        return self.data[np.arange(self.count - n, self.count) % self.capacity]
+
+
+class _Record:
+    """只读的轻量推送记录，支持 record['field'] / 'field' in record 访问"""
+
+    __slots__ = ()
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name)
+
+    def __contains__(self, name):
+        return name in self.__slots__
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def keys(self):
+        return list(self.__slots__)
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+
+class QuoteRecord(_Record):
+    __slots__ = ('code', 'ts', 'last_price', 'open_price', 'high_price', 'low_price', 'volume', 'turnover')
+
+    def __init__(self, code, ts, last_price, open_price, high_price, low_price, volume, turnover):
+        self.code = code
+        self.ts = ts
+        self.last_price = last_price
+        self.open_price = open_price
+        self.high_price = high_price
+        self.low_price = low_price
+        self.volume = volume
+        self.turnover = turnover
+
+
+class TickerRecord(_Record):
+    __slots__ = ('code', 'ts', 'price', 'volume', 'turnover', 'ticker_direction', 'sequence')
+
+    def __init__(self, code, ts, price, volume, turnover, ticker_direction, sequence):
+        self.code = code
+        self.ts = ts
+        self.price = price
+        self.volume = volume
+        self.turnover = turnover
+        self.ticker_direction = ticker_direction
+        self.sequence = sequence
+
+
+class MarketDataCache:
+    """订阅推送数据缓存
+
+    每个代码一组定长环形缓冲区保存最近的行情/逐笔/买卖一档历史，
+    另有按代码的最新快照用于 O(1) 查询。
+    """
+
+    def __init__(self, maxlen=100):
+        self.maxlen = maxlen
+        self.quote_buffers = {}
+        self.ticker_buffers = {}
+        self.order_book_buffers = {}
+        self.quotes = LatestSnapshot()
+        self.tickers = LatestSnapshot()
+
+    def _buffer(self, buffers, code, dtype):
+        buffer = buffers.get(code)
+        if buffer is None:
+            buffer = RingBuffer(dtype, self.maxlen)
+            buffers[code] = buffer
+        return buffer
+
+    def add_quote(self, code, ts, last_price, open_price=np.nan, high_price=np.nan,
+                  low_price=np.nan, volume=0, turnover=0.0):
+        """写入一条行情"""
+        self._buffer(self.quote_buffers, code, QUOTE_DTYPE).append(
+            (ts, last_price, open_price, high_price, low_price, volume, turnover))
+        self.quotes.update(code, ts, QuoteRecord(code, ts, last_price, open_price, high_price,
+                                                 low_price, volume, turnover))
+
+    def add_ticker(self, code, ts, price, volume, turnover=0.0, ticker_direction='NEUTRAL', sequence=0):
+        """写入一条逐笔成交"""
+        self._buffer(self.ticker_buffers, code, TICKER_DTYPE).append(
+            (ts, price, volume, turnover, TICKER_DIRECTIONS.get(ticker_direction, 0), sequence))
+        self.tickers.update(code, ts, TickerRecord(code, ts, price, volume, turnover,
+                                                   ticker_direction, sequence))
+
+    def add_quote_frame(self, data):
+        """解码行情推送 DataFrame，返回写入的代码列表"""
+        codes, dates, times, *columns = frame_columns(
+            data, ('code', 'data_date', 'data_time', 'last_price', 'open_price',
+                   'high_price', 'low_price', 'volume', 'turnover'))
+        for i in range(len(codes)):
+            ts = parse_time_ms(f'{dates[i]} {times[i]}')
+            if ts is None:
+                continue
+            self.add_quote(codes[i], ts, *(column[i] for column in columns))
+        return list(codes)
+
+    def add_ticker_frame(self, data):
+        """解码逐笔成交推送 DataFrame，返回写入的代码列表"""
+        codes, times, prices, volumes, turnovers, directions, sequences = frame_columns(
+            data, ('code', 'time', 'price', 'volume', 'turnover', 'ticker_direction', 'sequence'))
+        for i in range(len(codes)):
+            ts = parse_time_ms(times[i])
+            if ts is None:
+                continue
+            self.add_ticker(codes[i], ts, prices[i], volumes[i], turnovers[i], directions[i], sequences[i])
+        return list(codes)
+
+    def add_order_book(self, data):
+        """解码摆盘推送（dict），只保存买卖一档，返回代码"""
+        code = data['code']
+        ts = parse_time_ms(data.get('svr_recv_time_bid')) or parse_time_ms(data.get('svr_recv_time_ask')) or 0
+        bid = data['Bid'][0] if data.get('Bid') else (np.nan, 0)
+        ask = data['Ask'][0] if data.get('Ask') else (np.nan, 0)
+        self._buffer(self.order_book_buffers, code, ORDER_BOOK_DTYPE).append(
+            (ts, bid[0], bid[1], ask[0], ask[1]))
+        return code
+
+    def latest_quote(self, code=None):
+        return self.quotes.get(code)
+
+    def latest_ticker(self, code=None):
+        return self.tickers.get(code)
+
+    def quote_history(self, code, n=None):
+        """返回指定代码最近 n 条行情（结构化数组）"""
+        buffer = self.quote_buffers.get(code)
+        return buffer.to_array(n) if buffer is not None else np.zeros(0, dtype=QUOTE_DTYPE)
+
+    def ticker_history(self, code, n=None):
+        """返回指定代码最近 n 条逐笔成交（结构化数组）"""
+        buffer = self.ticker_buffers.get(code)
+        return buffer.to_array(n) if buffer is not None else np.zeros(0, dtype=TICKER_DTYPE)
+
+    def order_book_history(self, code, n=None):
+        """返回指定代码最近 n 条买卖一档（结构化数组）"""
+        buffer = self.order_book_buffers.get(code)
+        return buffer.to_array(n) if buffer is not None else np.zeros(0, dtype=ORDER_BOOK_DTYPE)
@@ -0,0 +1,204 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+from market_data import EXCHANGE_TZ
+
+logger = logging.getLogger('Trade')
+
+OPTION_CANDIDATES = 5  # 选择期权时一次批量查询报价的最近行权价合约数量
+OPTION_CHAIN_TTL = 3600  # 期权链缓存有效期（秒）
+OPTION_CHAIN_MIN_REFRESH = 60  # 因标的价格超出行权价范围而刷新的最小间隔（秒）
+
+
+class ContractInfo:
+    """期权合约静态信息"""
+
+    __slots__ = ('code', 'name', 'lot_size', 'strike_price', 'strike_time', 'option_type', 'stock_owner')
+
+    def __init__(self, code, name=None, lot_size=None, strike_price=None, strike_time=None,
+                 option_type=None, stock_owner=None):
+        self.code = code
+        self.name = name
+        self.lot_size = lot_size
+        self.strike_price = strike_price
+        self.strike_time = strike_time
+        self.option_type = option_type
+        self.stock_owner = stock_owner
+
+    def __repr__(self):
+        return (f'ContractInfo({self.code}, lot_size={self.lot_size}, strike_price={self.strike_price}, '
+                f'strike_time={self.strike_time}, option_type={self.option_type})')
+
+
+class ContractTable:
+    """按合约代码缓存的静态信息表（手数、行权价、到期日），下单路径不再为此查询报价"""
+
+    def __init__(self):
+        self._contracts = {}
+        self._lock = threading.Lock()
+
+    def update_from_chain(self, chain):
+        """用 get_option_chain 返回的 DataFrame 更新合约信息"""
+        if chain is None or chain.empty:
+            return 0
+        columns = {name: chain[name].values if name in chain.columns else [None] * len(chain)
+                   for name in ContractInfo.__slots__}
+        with self._lock:
+            for i, code in enumerate(columns['code']):
+                if not isinstance(code, str):
+                    continue
+                info = self._contracts.get(code)
+                if info is None:
+                    info = ContractInfo(code)
+                    self._contracts[code] = info
+                for name in ContractInfo.__slots__[1:]:
+                    value = columns[name][i]
+                    if value is not None:
+                        setattr(info, name, value)
+        return len(chain)
+
+    def update_lot_size(self, code, lot_size):
+        with self._lock:
+            info = self._contracts.get(code)
+            if info is None:
+                info = ContractInfo(code)
+                self._contracts[code] = info
+            info.lot_size = lot_size
+
+    def get(self, code):
+        return self._contracts.get(code)
+
+    def export_state(self):
+        """导出合约信息（用于状态快照），每个合约为按 ContractInfo.__slots__ 排列的元组"""
+        with self._lock:
+            return [tuple(getattr(info, name) for name in ContractInfo.__slots__)
+                    for info in self._contracts.values()]
+
+    def restore_state(self, rows):
+        """恢复 export_state 导出的合约信息（已有的合约不覆盖），返回合约数"""
+        with self._lock:
+            for row in rows:
+                self._contracts.setdefault(row[0], ContractInfo(*row))
+        return len(rows)
+
+    def lot_size(self, code):
+        """合约每手股数，未知时返回 None"""
+        info = self._contracts.get(code)
+        if info is None or not info.lot_size:
+            return None
+        return int(info.lot_size)
+
+    def __len__(self):
+        return len(self._contracts)
+
+    def __contains__(self, code):
+        return code in self._contracts
+
+
+def nearest_strikes(chain, price, count):
+    """按行权价与标的价格的距离排序，返回最近的 count 个合约（DataFrame）"""
+    data = chain.assign(strike_diff=(chain['strike_price'] - price).abs())
+    return data.sort_values('strike_diff', kind='mergesort').head(count)
+
+
+class _ChainEntry:
+    __slots__ = ('chain', 'fetched_at', 'min_strike', 'max_strike', 'first_expiry')
+
+    def __init__(self, chain):
+        self.chain = chain
+        self.fetched_at = time.monotonic()
+        self.min_strike = chain['strike_price'].min() if not chain.empty else None
+        self.max_strike = chain['strike_price'].max() if not chain.empty else None
+        self.first_expiry = chain['strike_time'].min() if 'strike_time' in chain.columns and not chain.empty else None
+
+
+class OptionChainCache:
+    """按 (标的, 期权类型) 缓存期权链
+
+    超过 ttl、最近到期日已过（需要剔除到期合约并拉取新系列）
+    或标的价格超出缓存中的行权价范围时才重新请求，其余时间直接返回缓存。
+    """
+
+    def __init__(self, ttl=OPTION_CHAIN_TTL, contract_table=None, min_refresh=OPTION_CHAIN_MIN_REFRESH):
+        self.ttl = ttl
+        self.min_refresh = min_refresh
+        self.contract_table = contract_table
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}  # (标的, 期权类型) -> Lock，不同标的可并发刷新
+        self.requests = 0
+
+    def _stale(self, entry, price):
+        age = time.monotonic() - entry.fetched_at
+        if age >= self.ttl:
+            return '缓存过期'
+        if entry.first_expiry is not None and str(entry.first_expiry) < datetime.now(EXCHANGE_TZ).strftime('%Y-%m-%d'):
+            return '有合约已到期'
+        if (price is not None and entry.min_strike is not None and age >= self.min_refresh and
+                not entry.min_strike <= price <= entry.max_strike):
+            return '标的价格超出行权价范围'
+        return None
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._key_locks[key] = lock
+            return lock
+
+    def get(self, quote_ctx, code, option_type, price=None):
+        """获取期权链 DataFrame，失败返回 None（有旧缓存时返回旧缓存）
+
+        同一 (标的, 期权类型) 的刷新串行（并发调用只请求一次），不同标的的请求互不阻塞。
+        """
+        from futu import RET_OK
+
+        key = (code, option_type)
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+                reason = self._stale(entry, price) if entry is not None else '无缓存'
+                if reason is None:
+                    return entry.chain
+                self.requests += 1
+            logger.info("刷新期权链 %s %s: %s", code, option_type, reason)
+            ret, data, *_ = quote_ctx.get_option_chain(code, option_type=option_type)
+            if ret != RET_OK:
+                logger.error("获取期权链失败: %s", data)
+                return entry.chain if entry is not None else None
+            if 'strike_time' in data.columns:
+                # 剔除已到期的合约（按交易所日期）
+                data = data[data['strike_time'].astype(str) >= datetime.now(EXCHANGE_TZ).strftime('%Y-%m-%d')]
+            data = data.reset_index(drop=True)
+            with self._lock:
+                self._entries[key] = _ChainEntry(data)
+        if self.contract_table is not None:
+            self.contract_table.update_from_chain(data)
+        return data
+
+    def export_state(self):
+        """导出缓存的期权链与获取时间（墙钟时间，用于状态快照）"""
+        offset = time.time() - time.monotonic()
+        with self._lock:
+            return {key: (entry.chain, entry.fetched_at + offset) for key, entry in self._entries.items()}
+
+    def restore_state(self, data):
+        """恢复 export_state 导出的期权链，按原获取时间继续计算有效期，返回期权链数量"""
+        offset = time.time() - time.monotonic()
+        with self._lock:
+            for key, (chain, fetched_at) in data.items():
+                entry = _ChainEntry(chain)
+                entry.fetched_at = min(fetched_at - offset, entry.fetched_at)
+                self._entries.setdefault(key, entry)
+        return len(data)
+
+    def invalidate(self, code=None):
+        with self._lock:
+            if code is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == code]:
+                    del self._entries[key]
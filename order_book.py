@@ -0,0 +1,143 @@
+import threading
+import time
+
+import numpy as np
+
+ORDER_BOOK_LEVELS = 10  # 每边保存的档位数（与摆盘推送的最大档数一致）
+ORDER_BOOK_MAX_AGE = 3.0  # 默认的过期秒数（OpenD 只在摆盘变化时推送，订阅期间的摆盘应按 max_age=None 读取）
+
+
+class OrderBook:
+    """单个合约的买卖盘
+
+    每边为按档位排列的价格/数量数组（买盘价格从高到低，卖盘从低到高），
+    推送到达时原地覆盖，不分配新对象；查询只遍历有效档位（最多 levels 档）。
+    """
+
+    __slots__ = ('code', 'bid_price', 'bid_volume', 'ask_price', 'ask_volume', 'n_bid', 'n_ask',
+                 'updated', 'updates', '_lock')
+
+    def __init__(self, code, levels=ORDER_BOOK_LEVELS):
+        self.code = code
+        self.bid_price = np.zeros(levels)
+        self.bid_volume = np.zeros(levels, dtype='i8')
+        self.ask_price = np.zeros(levels)
+        self.ask_volume = np.zeros(levels, dtype='i8')
+        self.n_bid = 0
+        self.n_ask = 0
+        self.updated = 0.0  # 最近一次推送的 monotonic 时间
+        self.updates = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _fill(prices, volumes, levels):
+        n = min(len(levels), len(prices))
+        for i in range(n):
+            level = levels[i]
+            prices[i] = level[0]
+            volumes[i] = level[1]
+        return n
+
+    def update(self, data, now=None):
+        """用摆盘推送（dict，Bid/Ask 为 [(价格, 数量, 订单数, 明细), ...]）覆盖两边档位"""
+        bids = data.get('Bid') or ()
+        asks = data.get('Ask') or ()
+        with self._lock:
+            self.n_bid = self._fill(self.bid_price, self.bid_volume, bids)
+            self.n_ask = self._fill(self.ask_price, self.ask_volume, asks)
+            self.updated = time.monotonic() if now is None else now
+            self.updates += 1
+
+    def age(self, now=None):
+        return (time.monotonic() if now is None else now) - self.updated
+
+    def best_bid(self):
+        """返回 (价格, 数量)，买盘为空时返回 None"""
+        with self._lock:
+            return (float(self.bid_price[0]), int(self.bid_volume[0])) if self.n_bid else None
+
+    def best_ask(self):
+        with self._lock:
+            return (float(self.ask_price[0]), int(self.ask_volume[0])) if self.n_ask else None
+
+    def spread(self):
+        """返回 (买卖价差, 价差占中间价的比例)，任一边为空时返回 None"""
+        with self._lock:
+            if not self.n_bid or not self.n_ask:
+                return None
+            bid, ask = float(self.bid_price[0]), float(self.ask_price[0])
+        mid = (bid + ask) / 2
+        return ask - bid, (ask - bid) / mid if mid > 0 else float('inf')
+
+    def depth(self, buy):
+        """买入（buy=True）时卖盘的可见总量，卖出时买盘的可见总量"""
+        with self._lock:
+            return int(self.ask_volume[:self.n_ask].sum()) if buy else int(self.bid_volume[:self.n_bid].sum())
+
+    def estimate_fill(self, qty, buy):
+        """估算以对手盘逐档成交 qty 的结果，返回 (成交均价, 可成交数量, 需要吃到的最差价格)
+
+        对手盘为空时返回 (None, 0, None)；可见深度不足时可成交数量小于 qty，最差价格为最深一档。
+        """
+        with self._lock:
+            if buy:
+                prices, volumes, n = self.ask_price, self.ask_volume, self.n_ask
+            else:
+                prices, volumes, n = self.bid_price, self.bid_volume, self.n_bid
+            remaining = qty
+            value = 0.0
+            worst = None
+            for i in range(n):
+                if remaining <= 0:
+                    break
+                take = min(remaining, int(volumes[i]))
+                if take <= 0:
+                    continue
+                worst = float(prices[i])
+                value += take * worst
+                remaining -= take
+        filled = qty - remaining
+        return (value / filled if filled else None), filled, worst
+
+    def snapshot(self):
+        """返回 {'bid': [(价格, 数量)], 'ask': [...]}（用于日志）"""
+        with self._lock:
+            return {'bid': list(zip(self.bid_price[:self.n_bid].tolist(), self.bid_volume[:self.n_bid].tolist())),
+                    'ask': list(zip(self.ask_price[:self.n_ask].tolist(), self.ask_volume[:self.n_ask].tolist()))}
+
+
+class OrderBookCache:
+    """按合约的摆盘，由 OrderBookHandler 推送或 get_order_book 的结果更新
+
+    OpenD 只在摆盘变化时推送，订阅期间长时间没有推送的摆盘仍是当前摆盘；
+    调用方按是否仍在订阅决定 get 的 max_age。
+    """
+
+    def __init__(self, levels=ORDER_BOOK_LEVELS):
+        self.levels = levels
+        self._books = {}
+        self._lock = threading.Lock()
+
+    def update(self, data, now=None):
+        code = data['code']
+        book = self._books.get(code)
+        if book is None:
+            with self._lock:
+                book = self._books.setdefault(code, OrderBook(code, self.levels))
+        book.update(data, now)
+        return book
+
+    def get(self, code, max_age=ORDER_BOOK_MAX_AGE, now=None):
+        """返回合约的摆盘，没有推送或超过 max_age 秒未更新时返回 None（max_age 为 None 时不检查）"""
+        book = self._books.get(code)
+        if book is None or book.updates == 0:
+            return None
+        if max_age is not None and book.age(now) > max_age:
+            return None
+        return book
+
+    def codes(self):
+        return list(self._books)
+
+    def __len__(self):
+        return len(self._books)
@@ -0,0 +1,275 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+
+from latency import get_recorder
+
+logger = logging.getLogger('Trade')
+
+ORDER_WORKERS = 2  # 提交订单的后台线程数（同时在途的 place_order 请求数）
+ORDER_POLL_INTERVAL = 5  # 在途订单超过该秒数没有推送时查询一次订单列表
+ORDER_CANCEL_RETRY = 1  # 检查超时订单的间隔（秒），撤单失败时按该间隔重试
+ORDER_REMARK_PREFIX = 'pipe-'  # 订单备注前缀，用于在 place_order 返回前匹配订单推送
+# 终态：到达后订单不会再有成交
+ORDER_FINAL_STATUSES = frozenset({'FILLED_ALL', 'CANCELLED_PART', 'CANCELLED_ALL', 'FAILED', 'DISABLED',
+                                  'DELETED', 'SUBMIT_FAILED', 'FILL_CANCELLED', 'TIMEOUT'})
+
+
+class OrderTicket:
+    """一笔经订单管道提交的订单，成交数量与均价由订单推送更新"""
+
+    __slots__ = ('id', 'code', 'qty', 'trd_side', 'price', 'order_type', 'remark', 'order_id', 'status',
+                 'dealt_qty', 'dealt_avg_price', 'error', 'submitted_at', 'updated_at', 'expires_at', 'on_fill',
+                 'on_done', '_done')
+
+    def __init__(self, ticket_id, code, qty, trd_side, price, order_type, on_fill=None, on_done=None,
+                 timeout=None):
+        self.id = ticket_id
+        self.code = code
+        self.qty = qty
+        self.trd_side = trd_side
+        self.price = price
+        self.order_type = order_type
+        self.remark = f'{ORDER_REMARK_PREFIX}{ticket_id}'
+        self.order_id = None
+        self.status = 'WAITING_SUBMIT'
+        self.dealt_qty = 0
+        self.dealt_avg_price = 0.0
+        self.error = None
+        self.submitted_at = time.perf_counter()
+        self.updated_at = time.monotonic()
+        self.expires_at = self.updated_at + timeout if timeout else None  # 超过该 monotonic 时间未到终态则撤销剩余数量
+        self.on_fill = on_fill  # on_fill(ticket, 新增成交数量, 新增部分的成交均价)
+        self.on_done = on_done  # on_done(ticket)，订单到达终态时调用
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def filled(self):
+        return self.dealt_qty >= self.qty
+
+    def wait(self, timeout=None):
+        """等待订单到达终态，超时返回 False"""
+        return self._done.wait(timeout)
+
+    def __repr__(self):
+        return (f'OrderTicket({self.code} {self.trd_side} {self.dealt_qty}/{self.qty} @ {self.dealt_avg_price}, '
+                f'status={self.status}, order_id={self.order_id})')
+
+
+class OrderPipeline:
+    """异步订单管道
+
+    submit 只把订单放入队列并立即返回 OrderTicket，后台线程调用 place_func 提交；
+    订单状态与成交由交易推送（on_order）更新，按备注或订单号匹配，推送早于 place_order 返回也能匹配；
+    超过 poll_interval 秒没有推送的在途订单由 query_func 查询订单列表兜底；
+    提交时指定了 timeout 的订单超时未到终态时由后台线程经 cancel_func 撤销剩余数量。
+    成交回调在推送线程中执行，应尽快返回。
+    """
+
+    def __init__(self, workers=ORDER_WORKERS, poll_interval=ORDER_POLL_INTERVAL, latency=None):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.latency = latency or get_recorder()
+        self._queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self._by_remark = {}  # remark -> 在途的 OrderTicket
+        self._by_order_id = {}  # order_id -> 在途的 OrderTicket
+        self._lock = threading.Lock()
+        self._threads = []
+        self._running = False
+        self._place_func = None
+        self._query_func = None
+        self._cancel_func = None
+        self.stats = {'submitted': 0, 'rejected': 0, 'filled': 0, 'cancelled': 0, 'polls': 0}
+
+    def start(self, place_func, query_func=None, cancel_func=None):
+        """启动后台线程
+
+        place_func(code, qty, trd_side, price, order_type, remark) 返回 place_order 的 (ret, data)；
+        query_func() 返回 order_list_query 的 (ret, data)；cancel_func(order_id) 撤单。
+        """
+        self._place_func = place_func
+        self._query_func = query_func
+        self._cancel_func = cancel_func
+        if self._running:
+            return
+        self._running = True
+        self._threads = [threading.Thread(target=self._run, name=f'OrderWorker-{i}', daemon=True)
+                         for i in range(self.workers)]
+        if query_func is not None or cancel_func is not None:
+            self._threads.append(threading.Thread(target=self._poll_loop, name='OrderPoller', daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._running = False
+        for _ in range(self.workers):
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def submit(self, code, qty, trd_side, price=0, order_type=None, on_fill=None, on_done=None, timeout=None):
+        """提交订单（不阻塞），返回 OrderTicket；timeout 秒内未到终态时撤销剩余数量"""
+        ticket = OrderTicket(next(self._ids), code, qty, trd_side, price, order_type, on_fill, on_done, timeout)
+        with self._lock:
+            self._by_remark[ticket.remark] = ticket
+            self.stats['submitted'] += 1
+        self._queue.put(ticket)
+        return ticket
+
+    def in_flight(self):
+        with self._lock:
+            return list(self._by_remark.values())
+
+    def cancel(self, ticket):
+        """撤销订单的剩余数量，返回撤单请求是否成功（结果以推送为准）"""
+        from futu import RET_OK
+
+        if ticket.done or ticket.order_id is None or self._cancel_func is None:
+            return False
+        try:
+            ret, data, *_ = self._cancel_func(ticket.order_id)
+        except Exception as e:
+            logger.error("撤销订单 %s 时发生错误: %s", ticket.order_id, str(e))
+            return False
+        if ret != RET_OK:
+            logger.error("撤销订单 %s 失败: %s", ticket.order_id, data)
+            return False
+        return True
+
+    def _submit(self, ticket):
+        from futu import RET_OK
+
+        side = str(ticket.trd_side).lower()
+        started = time.perf_counter()
+        try:
+            ret, data, *_ = self._place_func(ticket.code, ticket.qty, ticket.trd_side, ticket.price,
+                                             ticket.order_type, ticket.remark)
+        except Exception as e:
+            ret, data = None, str(e)
+        self.latency.observe(f'place_order.{side}', time.perf_counter() - started)
+        if ret != RET_OK:
+            logger.error("下单失败: %s %s %d, %s", ticket.code, ticket.trd_side, ticket.qty, data)
+            ticket.error = data
+            with self._lock:
+                self.stats['rejected'] += 1
+            self._update(ticket, 'SUBMIT_FAILED', 0, 0.0)
+            return
+        self.on_order(data)
+
+    def _run(self):
+        while self._running:
+            ticket = self._queue.get()
+            if ticket is None:
+                break
+            self._submit(ticket)
+
+    def _match(self, order_id, remark):
+        ticket = self._by_remark.get(remark)
+        if ticket is None:
+            return self._by_order_id.get(order_id)
+        if ticket.order_id is None:
+            ticket.order_id = order_id
+            self._by_order_id[order_id] = ticket
+        return ticket
+
+    def on_order(self, data):
+        """订单推送或查询结果（DataFrame）：更新匹配到的在途订单，非本管道提交的订单忽略"""
+        if data is None or len(data) == 0:
+            return
+        remarks = data['remark'] if 'remark' in data.columns else [''] * len(data)
+        for order_id, remark, status, dealt_qty, avg_price in zip(
+                data['order_id'], remarks, data['order_status'], data['dealt_qty'], data['dealt_avg_price']):
+            with self._lock:
+                ticket = self._match(str(order_id), remark)
+            if ticket is not None:
+                self._update(ticket, status, dealt_qty, avg_price)
+
+    def _update(self, ticket, status, dealt_qty, avg_price):
+        fill = None
+        with self._lock:
+            if ticket.done:
+                return
+            if dealt_qty > ticket.dealt_qty:
+                # 按累计成交数量与均价计算本次新增部分，重复或乱序的推送不会重复计入
+                value = dealt_qty * avg_price - ticket.dealt_qty * ticket.dealt_avg_price
+                fill = (dealt_qty - ticket.dealt_qty, value / (dealt_qty - ticket.dealt_qty))
+                ticket.dealt_qty, ticket.dealt_avg_price = dealt_qty, avg_price
+            ticket.status = status
+            ticket.updated_at = time.monotonic()
+            final = status in ORDER_FINAL_STATUSES
+            if final:
+                self._by_remark.pop(ticket.remark, None)
+                self._by_order_id.pop(ticket.order_id, None)
+                if ticket.filled:
+                    self.stats['filled'] += 1
+                elif status != 'SUBMIT_FAILED':
+                    self.stats['cancelled'] += 1
+        side = str(ticket.trd_side).lower()
+        if fill is not None:
+            logger.info("订单成交: %s %s %d @ %.4f (累计 %d/%d)", ticket.code, ticket.trd_side, fill[0], fill[1],
+                        ticket.dealt_qty, ticket.qty)
+            if ticket.filled:
+                self.latency.observe(f'order_fill.{side}', time.perf_counter() - ticket.submitted_at)
+            self._callback(ticket.on_fill, ticket, *fill)
+        if final:
+            ticket._done.set()
+            self._callback(ticket.on_done, ticket)
+
+    @staticmethod
+    def _callback(func, *args):
+        if func is None:
+            return
+        try:
+            func(*args)
+        except Exception as e:
+            logger.error("订单回调发生错误: %s", str(e), exc_info=True)
+
+    def _cancel_expired(self, now):
+        """撤销超时仍未到终态的订单（尚未返回订单号或撤单失败时稍后再试），结果以推送为准"""
+        for ticket in self.in_flight():
+            if ticket.expires_at is None or now < ticket.expires_at:
+                continue
+            if ticket.order_id is not None:
+                logger.warning("订单 %s %s 超时未全部成交 (%d/%d)，撤销剩余数量", ticket.code, ticket.trd_side,
+                               ticket.dealt_qty, ticket.qty)
+                if self.cancel(ticket):
+                    ticket.expires_at = None
+                    continue
+            ticket.expires_at = now + ORDER_CANCEL_RETRY
+
+    def _poll_loop(self):
+        """兜底：撤销超时订单；长时间没有推送的在途订单，查询一次订单列表"""
+        from futu import RET_OK
+
+        polled_at = time.monotonic()
+        while self._running:
+            time.sleep(min(self.poll_interval, ORDER_CANCEL_RETRY))
+            now = time.monotonic()
+            if self._cancel_func is not None:
+                self._cancel_expired(now)
+            if self._query_func is None or now - polled_at < self.poll_interval:
+                continue
+            polled_at = now
+            stale = [ticket for ticket in self.in_flight()
+                     if ticket.order_id is not None and now - ticket.updated_at >= self.poll_interval]
+            if not stale:
+                continue
+            try:
+                ret, data, *_ = self._query_func()
+            except Exception as e:
+                logger.error("查询订单列表时发生错误: %s", str(e))
+                continue
+            with self._lock:
+                self.stats['polls'] += 1
+            if ret != RET_OK:
+                logger.error("查询订单列表失败: %s", data)
+                continue
+            self.on_order(data)
@@ -0,0 +1,178 @@
+import logging
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger('Trade')
+
+PORTFOLIO_RECONCILE_INTERVAL = 300  # 与 accinfo_query / position_list_query 全量核对的间隔（秒）
+PORTFOLIO_COLUMNS = ['code', 'qty', 'cost_price']
+
+
+class PortfolioState:
+    """内存中的账户资金与持仓
+
+    由订单推送（累计成交数量 dealt_qty）和成交推送（逐笔 deal）增量更新，两者按订单合并：
+    每个订单只计入已知的最大成交数量，推送重复、乱序或两种推送都收到时都不会重复计算。
+    每隔 reconcile_interval 秒用全量查询覆盖一次，纠正手续费、推送丢失等造成的偏差；
+    查询期间由推送计入成交的代码保留推送维护的数量（查询结果可能早于这笔成交），留待下一次核对。
+    cash / qty(code) 为 O(1) 读取；version 在每次变化时递增，可用于判断是否需要重新打印。
+    """
+
+    def __init__(self, reconcile_interval=PORTFOLIO_RECONCILE_INTERVAL):
+        self.reconcile_interval = reconcile_interval
+        self.cash = None
+        self.power = None  # 最大购买力
+        self._positions = {}  # code -> [数量, 成本价]
+        self._fills = {}  # order_id -> [已计入数量, 已计入金额, 成交推送累计数量]
+        self._deals = set()  # 已处理的 deal_id
+        self._sequence = 0  # 每计入一笔成交递增
+        self._touched = {}  # code -> 最近一次计入成交时的 _sequence
+        self._lock = threading.Lock()
+        self.version = 0
+        self.reconciled_at = None  # 最近一次全量核对的 monotonic 时间
+        self.stats = {'orders': 0, 'deals': 0, 'fills': 0, 'reconciles': 0, 'drift': 0, 'raced': 0}
+
+    @property
+    def ready(self):
+        """是否已完成过一次全量核对（之前 cash 与持仓不可用）"""
+        return self.reconciled_at is not None
+
+    def qty(self, code):
+        position = self._positions.get(code)
+        return position[0] if position is not None else 0
+
+    def position(self, code):
+        """返回 (数量, 成本价)，没有持仓时返回 None"""
+        position = self._positions.get(code)
+        return tuple(position) if position is not None else None
+
+    def positions(self):
+        with self._lock:
+            return {code: tuple(position) for code, position in self._positions.items()}
+
+    def frame(self):
+        """持仓 DataFrame（用于打印）"""
+        rows = [(code, qty, cost) for code, (qty, cost) in self.positions().items()]
+        return pd.DataFrame(rows, columns=PORTFOLIO_COLUMNS)
+
+    def due(self, now=None):
+        """是否到了全量核对的时间"""
+        if self.reconciled_at is None:
+            return True
+        now = time.monotonic() if now is None else now
+        return now - self.reconciled_at >= self.reconcile_interval
+
+    def _apply(self, code, buy, qty, value):
+        """计入一笔成交（调用方持有锁）"""
+        position = self._positions.get(code)
+        if buy:
+            if position is None:
+                self._positions[code] = [qty, value / qty]
+            else:
+                total = position[0] + qty
+                position[1] = (position[0] * position[1] + value) / total if total else 0.0
+                position[0] = total
+            if self.cash is not None:
+                self.cash -= value
+        else:
+            if position is not None:
+                position[0] -= qty
+                if position[0] <= 0:
+                    del self._positions[code]
+            if self.cash is not None:
+                self.cash += value
+        self._sequence += 1
+        self._touched[code] = self._sequence
+        self.version += 1
+        self.stats['fills'] += 1
+
+    @staticmethod
+    def _is_buy(trd_side):
+        from futu import TrdSide
+        return trd_side in (TrdSide.BUY, TrdSide.BUY_BACK)
+
+    def on_order(self, data):
+        """订单推送：按累计成交数量与成交均价计入新增部分"""
+        if data is None or data.empty:
+            return
+        with self._lock:
+            for order_id, code, trd_side, dealt_qty, avg_price in zip(
+                    data['order_id'], data['code'], data['trd_side'], data['dealt_qty'], data['dealt_avg_price']):
+                self.stats['orders'] += 1
+                fill = self._fills.setdefault(order_id, [0, 0.0, 0])
+                if dealt_qty > fill[0]:
+                    value = dealt_qty * avg_price
+                    self._apply(code, self._is_buy(trd_side), dealt_qty - fill[0], value - fill[1])
+                    fill[0], fill[1] = dealt_qty, value
+
+    def on_deal(self, data):
+        """成交推送：逐笔计入，已由订单推送计入的部分跳过"""
+        if data is None or data.empty:
+            return
+        with self._lock:
+            for deal_id, order_id, code, trd_side, qty, price in zip(
+                    data['deal_id'], data['order_id'], data['code'], data['trd_side'], data['qty'], data['price']):
+                if deal_id in self._deals:
+                    continue
+                self._deals.add(deal_id)
+                self.stats['deals'] += 1
+                fill = self._fills.setdefault(order_id, [0, 0.0, 0])
+                fill[2] += qty
+                if fill[2] > fill[0]:
+                    extra = fill[2] - fill[0]
+                    self._apply(code, self._is_buy(trd_side), extra, extra * price)
+                    fill[0], fill[1] = fill[2], fill[1] + extra * price
+
+    def reconcile(self, trade_ctx, trd_env):
+        """全量查询资金与持仓并覆盖内存状态，返回是否成功"""
+        from futu import RET_OK
+
+        with self._lock:
+            sequence = self._sequence
+        try:
+            ret, funds = trade_ctx.accinfo_query(trd_env=trd_env)
+            if ret != RET_OK:
+                logger.error("获取账户资金状况失败: %s", funds)
+                return False
+            ret, data = trade_ctx.position_list_query(trd_env=trd_env)
+            if ret != RET_OK:
+                logger.error("获取持仓信息失败: %s", data)
+                return False
+        except Exception as e:
+            logger.error("核对账户状态时发生错误: %s", str(e))
+            return False
+        positions = {code: [qty, cost] for code, qty, cost in zip(data['code'], data['qty'], data['cost_price'])
+                     if qty > 0}
+        cash = float(funds['cash'].iloc[0]) if not funds.empty else None
+        power = float(funds['power'].iloc[0]) if not funds.empty and 'power' in funds.columns else None
+        with self._lock:
+            # 查询期间有推送计入成交的代码：查询结果可能不含这笔成交，保留推送维护的持仓与现金
+            raced = {code for code, seq in self._touched.items() if seq > sequence}
+            if raced:
+                self.stats['raced'] += 1
+                logger.info("核对期间收到成交推送，保留推送维护的持仓: %s", sorted(raced))
+                for code in raced:
+                    position = self._positions.get(code)
+                    if position is None:
+                        positions.pop(code, None)
+                    else:
+                        positions[code] = list(position)
+                if self.cash is not None:
+                    cash = self.cash
+            if self.reconciled_at is not None:
+                drift = {code for code in set(positions) | set(self._positions)
+                         if code not in raced and self.qty(code) != (positions[code][0] if code in positions else 0)}
+                if drift:
+                    self.stats['drift'] += 1
+                    logger.warning("推送维护的持仓与查询结果不一致，以查询为准: %s", sorted(drift))
+            changed = positions != self._positions or cash != self.cash
+            self._positions = positions
+            self.cash = cash
+            self.power = power
+            self.reconciled_at = time.monotonic()
+            self.stats['reconciles'] += 1
+            if changed:
+                self.version += 1
+        return True
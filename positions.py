@@ -0,0 +1,259 @@
+import logging
+import queue
+import threading
+import time
+
+from latency import get_recorder
+
+logger = logging.getLogger('Trade')
+
+SELL_RETRY_INTERVAL = 5  # 卖出失败后的重试间隔（秒）
+
+
+class Position:
+    """一笔持仓"""
+
+    __slots__ = ('code', 'buy_price', 'qty', 'opened_at', 'last_price', 'last_update', 'closing', 'retry_at',
+                 'triggered_at', 'ticket', 'cancel_at')
+
+    def __init__(self, code, buy_price, qty):
+        self.code = code
+        self.buy_price = buy_price
+        self.qty = qty
+        self.opened_at = time.time()
+        self.last_price = None
+        self.last_update = 0.0  # 最近一次收到价格的 monotonic 时间
+        self.closing = False  # 已提交卖出，等待结果
+        self.retry_at = 0.0
+        self.triggered_at = None  # 触发止盈止损的 perf_counter 时刻
+        self.ticket = None  # 在途的卖出订单
+        self.cancel_at = 0.0  # 在途卖出订单超时撤单的 monotonic 时间
+
+    def profit_ratio(self, price):
+        return (price - self.buy_price) / self.buy_price
+
+
+class PositionManager:
+    """持仓止盈止损监控
+
+    推送回调中对每个持仓合约的最新价调用 on_price，O(1) 判断阈值；
+    触发后把卖出请求交给后台线程执行，不阻塞推送回调和策略主循环。
+    卖出只提交订单不等待成交：订单到达终态时（on_done）由后台线程按实际成交数量扣减持仓，
+    全部卖出后停止监控，否则稍后重试剩余数量；超过 sell_timeout 秒未到终态的卖出订单撤销剩余数量。
+    超过 stale_after 秒没有推送的持仓由后台线程批量查询报价兜底。
+    """
+
+    def __init__(self, profit_threshold, loss_threshold, stale_after=5, poll_interval=1, latency=None,
+                 sell_timeout=10):
+        self.profit_threshold = profit_threshold
+        self.loss_threshold = loss_threshold
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self.sell_timeout = sell_timeout
+        self.latency = latency or get_recorder()
+        self._positions = {}
+        self._lock = threading.Lock()
+        self._sell_queue = queue.Queue()
+        self._sell_func = None
+        self._quote_func = None
+        self._close_func = None
+        self._cancel_func = None
+        self._thread = None
+        self._running = False
+
+    def start(self, sell_func, quote_func=None, close_func=None, cancel_func=None):
+        """启动后台线程
+
+        sell_func(code, qty, buy_price, on_done) 提交卖出订单并返回 OrderTicket（到达终态时调用 on_done(ticket)），
+        确认账户已无该持仓时返回 True（停止监控），提交失败返回 False（稍后重试）；
+        quote_func(codes) 返回 {code: last_price}，用于没有推送时的兜底查询；
+        close_func(code) 在持仓停止监控后调用（如取消该合约的行情订阅）；
+        cancel_func(ticket) 撤销超时未成交的卖出订单。
+        """
+        self._sell_func = sell_func
+        self._quote_func = quote_func
+        self._close_func = close_func
+        self._cancel_func = cancel_func
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='PositionManager', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._sell_queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def open(self, code, buy_price, qty):
+        """登记新持仓，同一合约重复买入时按数量加权合并成本"""
+        with self._lock:
+            position = self._positions.get(code)
+            if position is None:
+                self._positions[code] = Position(code, buy_price, qty)
+            else:
+                total = position.qty + qty
+                position.buy_price = (position.buy_price * position.qty + buy_price * qty) / total
+                position.qty = total
+        logger.info("开始监控持仓: %s, 买入价格 %.4f, 数量 %d", code, buy_price, qty)
+
+    def close(self, code):
+        with self._lock:
+            position = self._positions.pop(code, None)
+        if position is not None:
+            self._closed(code)
+        return position
+
+    def _closed(self, code):
+        if self._close_func is None:
+            return
+        try:
+            self._close_func(code)
+        except Exception as e:
+            logger.error("持仓 %s 停止监控后的清理发生错误: %s", code, str(e))
+
+    def get(self, code):
+        return self._positions.get(code)
+
+    def codes(self):
+        return list(self._positions)
+
+    def export_state(self):
+        """导出持仓（用于状态快照），每个持仓为 (代码, 买入价格, 数量, 登记时间)"""
+        with self._lock:
+            return [(position.code, position.buy_price, position.qty, position.opened_at)
+                    for position in self._positions.values()]
+
+    def restore_state(self, rows):
+        """恢复 export_state 导出的持仓（已在监控的合约不覆盖），返回恢复的持仓数"""
+        restored = 0
+        with self._lock:
+            for code, buy_price, qty, opened_at in rows:
+                if code in self._positions:
+                    continue
+                position = Position(code, buy_price, qty)
+                position.opened_at = opened_at
+                self._positions[code] = position
+                restored += 1
+        for code, buy_price, qty, _ in rows:
+            logger.info("恢复持仓监控: %s, 买入价格 %.4f, 数量 %d", code, buy_price, qty)
+        return restored
+
+    def __len__(self):
+        return len(self._positions)
+
+    def on_price(self, code, price):
+        """收到持仓合约的最新价（推送回调中调用），触发阈值时提交卖出"""
+        position = self._positions.get(code)
+        if position is None or price is None or price != price:
+            return False
+        position.last_price = price
+        position.last_update = time.monotonic()
+        if position.closing or position.last_update < position.retry_at:
+            return False
+        profit_ratio = position.profit_ratio(price)
+        if profit_ratio >= self.profit_threshold or profit_ratio <= self.loss_threshold:
+            position.closing = True
+            position.triggered_at = time.perf_counter()
+            logger.info("触发止盈止损: %s 当前价格 %.4f, 买入价格 %.4f, 盈亏比例 %.2f%%",
+                        code, price, position.buy_price, profit_ratio * 100)
+            self._sell_queue.put(position)
+            return True
+        return False
+
+    def _sell(self, position):
+        if position.triggered_at is not None:
+            # 价格触及阈值到开始卖出的排队延迟
+            self.latency.observe('stop_to_sell', time.perf_counter() - position.triggered_at)
+        try:
+            with self.latency.span('sell'):
+                result = self._sell_func(position.code, position.qty, position.buy_price,
+                                         lambda ticket: self._sell_queue.put((position, ticket)))
+        except Exception as e:
+            logger.error("卖出持仓 %s 时发生错误: %s", position.code, str(e), exc_info=True)
+            result = False
+        if result is True:
+            self._remove(position, '账户无持仓')
+        elif not result:
+            self._retry(position)
+        else:
+            # 订单已提交，保持 closing 直到订单到达终态，期间不会重复卖出
+            position.ticket = result
+            position.cancel_at = time.monotonic() + self.sell_timeout
+
+    def _finish_sell(self, position, ticket):
+        """卖出订单到达终态：按实际成交数量扣减持仓，全部卖出后停止监控，否则稍后重试剩余数量"""
+        position.ticket = None
+        with self._lock:
+            position.qty -= min(ticket.dealt_qty, position.qty)
+            remaining = position.qty
+        if ticket.filled or remaining <= 0:
+            logger.info("持仓 %s 已卖出 %d，成交均价 %.4f", position.code, ticket.dealt_qty, ticket.dealt_avg_price)
+            self._remove(position, '已卖出')
+            return
+        logger.warning("持仓 %s 卖出未全部成交 (%d/%d, %s)，剩余 %d 稍后重试", position.code, ticket.dealt_qty,
+                       ticket.qty, ticket.error or ticket.status, remaining)
+        self._retry(position)
+
+    def _remove(self, position, reason):
+        with self._lock:
+            closed = self._positions.get(position.code) is position
+            if closed:
+                del self._positions[position.code]
+        logger.info("持仓 %s %s，停止监控", position.code, reason)
+        if closed:
+            self._closed(position.code)
+
+    @staticmethod
+    def _retry(position):
+        position.retry_at = time.monotonic() + SELL_RETRY_INTERVAL
+        position.closing = False
+
+    def _cancel_expired(self):
+        """撤销超过 sell_timeout 秒仍未到达终态的卖出订单（撤单失败时下一个周期再试），结果以订单推送为准"""
+        if self._cancel_func is None:
+            return
+        now = time.monotonic()
+        for position in list(self._positions.values()):
+            ticket = position.ticket
+            if ticket is None or ticket.done or now < position.cancel_at:
+                continue
+            logger.warning("卖出 %s 在 %s 秒内未全部成交 (%d/%d)，撤销剩余数量", position.code, self.sell_timeout,
+                           ticket.dealt_qty, ticket.qty)
+            position.cancel_at = now + self.sell_timeout
+            try:
+                self._cancel_func(ticket)
+            except Exception as e:
+                logger.error("撤销卖出订单 %s 时发生错误: %s", position.code, str(e))
+
+    def _poll_stale(self):
+        """为长时间没有推送的持仓批量查询报价"""
+        if self._quote_func is None:
+            return
+        now = time.monotonic()
+        stale = [p.code for p in list(self._positions.values())
+                 if not p.closing and now - p.last_update >= self.stale_after]
+        if not stale:
+            return
+        try:
+            prices = self._quote_func(stale) or {}
+        except Exception as e:
+            logger.error("查询持仓报价时发生错误: %s", str(e))
+            return
+        for code, price in prices.items():
+            self.on_price(code, price)
+
+    def _run(self):
+        while self._running:
+            try:
+                item = self._sell_queue.get(timeout=self.poll_interval)
+            except queue.Empty:
+                item = None
+            if isinstance(item, tuple):
+                self._finish_sell(*item)
+            elif item is not None:
+                self._sell(item)
+            self._cancel_expired()
+            if item is None:
+                self._poll_stale()
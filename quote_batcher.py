@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger('Trade')
+
+QUOTE_BATCH_WINDOW = 0.003  # 收集报价请求的时间窗口（秒），窗口内的请求合并为一次
+QUOTE_SNAPSHOT_TTL = 0.5  # 报价快照的有效期（秒），有效期内重复读取不再请求
+QUOTE_BATCH_MAX_CODES = 400  # 单次 get_stock_quote 的代码数上限
+
+
+class _Batch:
+    __slots__ = ('codes', 'callers', 'errors', 'done', 'rows')
+
+    def __init__(self):
+        self.codes = {}  # 按加入顺序去重
+        self.callers = []  # 各调用方需要请求的代码（元组），下标即调用方序号
+        self.errors = {}  # 调用方序号 -> (ret, 错误信息)
+        self.done = threading.Event()
+        self.rows = {}  # code -> (frame, 行号)
+
+
+class QuoteBatcher:
+    """get_stock_quote 的请求合并与快照缓存
+
+    - 各线程在 window 秒内发出的报价请求合并为一次多代码请求（超过 max_codes 时分批），
+      第一个请求的线程负责发出，其余线程等待同一结果，再各自取出需要的代码；
+    - 返回的每行报价缓存 ttl 秒，期间同一代码的读取直接命中；行情推送也可以通过 put 写入快照；
+    - 返回值与上下文一致：(ret, DataFrame)，行顺序与请求的代码一致，没有报价的代码不出现在结果中；
+    - 合并请求失败时（如其中一个代码未订阅或无效，OpenD 会拒绝整次请求）按调用方分别重试，
+      错误只返回给请求了问题代码的调用方。
+    合并请求由第一个线程在其当前的网关优先级下发出。
+    """
+
+    def __init__(self, window=QUOTE_BATCH_WINDOW, ttl=QUOTE_SNAPSHOT_TTL, max_codes=QUOTE_BATCH_MAX_CODES):
+        self.window = window
+        self.ttl = ttl
+        self.max_codes = max_codes
+        self._pending = {}  # id(quote_ctx) -> 正在收集的 _Batch
+        self._snapshots = {}  # code -> (更新时间, frame, 行号)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'cache_hits': 0, 'batched': 0, 'upstream': 0, 'upstream_codes': 0,
+                      'retries': 0}
+
+    def put(self, data, codes=None, now=None):
+        """写入报价快照（get_stock_quote 返回值或行情推送的 DataFrame）
+
+        codes 为 data 按行顺序的代码列表，调用方已解码时传入可省去一次列访问（推送回调中使用）。
+        """
+        if codes is None:
+            if data is None or 'code' not in data.columns:
+                return
+            codes = data['code'].tolist()
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for pos, code in enumerate(codes):
+                self._snapshots[code] = (now, data, pos)
+
+    def invalidate(self, codes=None):
+        with self._lock:
+            if codes is None:
+                self._snapshots.clear()
+            else:
+                for code in codes:
+                    self._snapshots.pop(code, None)
+
+    def _request(self, quote_ctx, batch, codes):
+        """请求一组代码，成功时写入快照与批次结果，返回 (ret, data)"""
+        from futu import RET_OK
+
+        ret, data, *_ = quote_ctx.get_stock_quote(codes)
+        with self._lock:
+            self.stats['upstream'] += 1
+            self.stats['upstream_codes'] += len(codes)
+        if ret == RET_OK:
+            codes = data['code'].tolist()
+            self.put(data, codes)
+            for pos, code in enumerate(codes):
+                batch.rows[code] = (data, pos)
+        return ret, data
+
+    def _retry_callers(self, quote_ctx, batch, chunk, ret, data):
+        """合并请求失败：按调用方分别重试，只让请求了问题代码的调用方失败"""
+        from futu import RET_OK
+
+        chunk = set(chunk)
+        callers = [(index, [code for code in codes if code in chunk]) for index, codes in enumerate(batch.callers)]
+        callers = [(index, codes) for index, codes in callers if codes]
+        if len({tuple(codes) for _, codes in callers}) <= 1:
+            logger.error("批量获取股票行情失败: %s", data)
+            for index, _ in callers:
+                batch.errors[index] = (ret, data)
+            return
+        logger.warning("合并的报价请求失败，按调用方分别重试: %s", data)
+        with self._lock:
+            self.stats['retries'] += 1
+        for index, codes in callers:
+            codes = [code for code in codes if code not in batch.rows]
+            if not codes:
+                continue
+            ret, data = self._request(quote_ctx, batch, codes)
+            if ret != RET_OK:
+                logger.error("获取股票行情失败: %s %s", codes, data)
+                batch.errors[index] = (ret, data)
+
+    def _fetch(self, quote_ctx, batch):
+        """由批次的第一个线程调用：按 max_codes 分批请求并写入快照"""
+        from futu import RET_ERROR, RET_OK
+
+        codes = list(batch.codes)
+        try:
+            for start in range(0, len(codes), self.max_codes):
+                chunk = codes[start:start + self.max_codes]
+                ret, data = self._request(quote_ctx, batch, chunk)
+                if ret != RET_OK:
+                    self._retry_callers(quote_ctx, batch, chunk, ret, data)
+        except Exception as e:
+            logger.error("批量获取股票行情时发生错误: %s", str(e))
+            for index in range(len(batch.callers)):
+                batch.errors.setdefault(index, (RET_ERROR, str(e)))
+        finally:
+            batch.done.set()
+
+    @staticmethod
+    def _assemble(codes, rows):
+        """按 codes 顺序拼接各行，来自同一个 frame 的行一次取出"""
+        picked = [(code, rows[code]) for code in codes if code in rows]
+        if not picked:
+            return pd.DataFrame(columns=['code'])
+        frame = picked[0][1][0]
+        if all(row[0] is frame for _, row in picked):
+            return frame.iloc[[row[1] for _, row in picked]].reset_index(drop=True)
+        return pd.concat([row[0].iloc[[row[1]]] for _, row in picked], ignore_index=True)
+
+    def get_stock_quote(self, quote_ctx, codes):
+        """查询 codes 的报价，返回 (ret, DataFrame)；失败时 data 为错误信息"""
+        from futu import RET_OK
+
+        codes = list(dict.fromkeys(codes))
+        now = time.monotonic()
+        rows = {}
+        with self._lock:
+            self.stats['requests'] += 1
+            missing = []
+            for code in codes:
+                snapshot = self._snapshots.get(code)
+                if snapshot is not None and now - snapshot[0] <= self.ttl:
+                    rows[code] = snapshot[1:]
+                else:
+                    missing.append(code)
+            if missing:
+                batch = self._pending.get(id(quote_ctx))
+                leader = batch is None
+                if leader:
+                    batch = _Batch()
+                    self._pending[id(quote_ctx)] = batch
+                else:
+                    self.stats['batched'] += 1
+                index = len(batch.callers)
+                batch.callers.append(tuple(missing))
+                batch.codes.update(dict.fromkeys(missing))
+            else:
+                self.stats['cache_hits'] += 1
+        if not missing:
+            return RET_OK, self._assemble(codes, rows)
+        if leader:
+            if self.window > 0:
+                time.sleep(self.window)
+            with self._lock:
+                self._pending.pop(id(quote_ctx), None)
+            self._fetch(quote_ctx, batch)
+        else:
+            batch.done.wait()
+        error = batch.errors.get(index)
+        if error is not None:
+            return error
+        rows.update((code, batch.rows[code]) for code in missing if code in batch.rows)
+        return RET_OK, self._assemble(codes, rows)
+
@@ -0,0 +1,50 @@
+import threading
+import time
+from collections import deque
+
+# OpenD 接口频率限制：接口名 -> (次数, 秒)
+OPEND_RATE_LIMITS = {
+    'request_history_kline': (60, 30),
+    'get_option_chain': (10, 30),
+    'place_order': (15, 30),
+    'modify_order': (20, 30),
+    'order_list_query': (10, 30),
+    'accinfo_query': (10, 30),
+    'position_list_query': (10, 30),
+}
+
+
+class SlidingWindowLimiter:
+    """滑动窗口限频：任意 period 秒内最多 max_calls 次"""
+
+    def __init__(self, max_calls, period):
+        self.max_calls = max_calls
+        self.period = period
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def _try(self):
+        """尝试占用一次调用，成功返回 0，否则返回需要等待的秒数（调用方持有锁）"""
+        now = time.monotonic()
+        while self._calls and now - self._calls[0] >= self.period:
+            self._calls.popleft()
+        if len(self._calls) < self.max_calls:
+            self._calls.append(now)
+            return 0.0
+        return self.period - (now - self._calls[0])
+
+    def try_acquire(self):
+        """不阻塞：允许调用时占用并返回 True，超出频率时返回 False"""
+        with self._lock:
+            return self._try() == 0.0
+
+    def acquire(self):
+        """阻塞直到允许一次调用，返回等待的秒数"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                delay = self._try()
+            if delay == 0.0:
+                return waited
+            time.sleep(delay)
+            waited += delay
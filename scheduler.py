@@ -0,0 +1,220 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from latency import LatencyRecorder
+
+logger = logging.getLogger('Trade')
+
+EVENT_BAR_CLOSE = 'bar_close'  # 1分钟K线走完
+EVENT_QUOTE = 'quote'  # 收到行情推送
+EVENT_TIMER = 'timer'  # 定时兜底
+EVENT_STATE_CHANGED = 'state_changed'  # 需要尽快写入快照的状态变化（如新持仓）
+
+
+class Event:
+    """调度事件，ts 为事件发生时间（Unix 毫秒时间戳，与 time.time() 同一时钟），enqueued 为入队时刻（monotonic）"""
+
+    __slots__ = ('kind', 'code', 'ts', 'enqueued', 'coalesced')
+
+    def __init__(self, kind, code, ts=None):
+        self.kind = kind
+        self.code = code
+        self.ts = ts
+        self.enqueued = time.monotonic()
+        self.coalesced = 0
+
+    def age(self):
+        """事件发生至今的秒数（墙钟时间），没有发生时间时返回 None"""
+        if self.ts is None:
+            return None
+        return time.time() - self.ts / 1000.0
+
+    def __repr__(self):
+        return f'Event({self.kind}, {self.code}, ts={self.ts}, coalesced={self.coalesced})'
+
+
+class _Strategy:
+    __slots__ = ('name', 'func', 'events', 'codes', 'last_run')
+
+    def __init__(self, name, func, events, codes):
+        self.name = name
+        self.func = func
+        self.events = frozenset(events)
+        self.codes = list(codes)
+        self.last_run = {}  # code -> 上次执行的 monotonic 时间
+
+
+class StrategyScheduler:
+    """事件驱动的策略调度器
+
+    推送回调通过 on_quote 发布事件，K线按分钟走完时产生 bar_close 事件，
+    只触发订阅了该事件类型和代码的策略，没有策略订阅的事件类型或代码不入队
+    （期权候选、持仓合约等只为行情订阅的代码不产生事件）。
+    同一 (事件类型, 代码) 尚未处理时新事件会被合并，
+    队列超过 max_pending 时丢弃最早的行情事件，避免事件堆积。
+    长时间没有事件的代码由定时器按 fallback_interval 兜底执行。
+    """
+
+    def __init__(self, max_pending=1000, fallback_interval=60, report_interval=300, executor=None, latency=None):
+        self.max_pending = max_pending
+        self.executor = executor  # AnalysisPool，设置后不同代码的事件并发处理
+        self.fallback_interval = fallback_interval
+        self.report_interval = report_interval
+        self._strategies = []
+        self._kinds = set()  # 已注册策略订阅的事件类型
+        self._codes = set()  # 已注册策略关注的代码（None 为与代码无关的任务）
+        self._pending = OrderedDict()  # (kind, code) -> Event
+        self._cond = threading.Condition()
+        self._running = False
+        self._bar_minute = {}  # code -> 最近推送所在分钟
+        self.latency = latency or LatencyRecorder()  # 各项延迟的直方图，可与其他模块共享
+        self._stats_lock = threading.Lock()
+        self._counters = {'published': 0, 'coalesced': 0, 'dropped': 0, 'dispatched': 0}
+        self._last_report = time.monotonic()
+
+    def register(self, name, func, events=(EVENT_BAR_CLOSE, EVENT_TIMER), codes=(None,)):
+        """注册策略 func(code, event)，codes 为关注的代码列表（None 表示与代码无关的任务）"""
+        strategy = _Strategy(name, func, events, codes)
+        self._strategies.append(strategy)
+        self._kinds.update(strategy.events)
+        self._codes.update(strategy.codes)
+
+    def publish(self, kind, code, ts=None):
+        """发布事件（线程安全，可在推送回调中调用），没有策略处理的事件类型或代码直接忽略"""
+        if kind not in self._kinds or (code is not None and code not in self._codes):
+            return
+        key = (kind, code)
+        with self._cond:
+            self._counters['published'] += 1
+            event = self._pending.get(key)
+            if event is not None:
+                # 尚未处理的同类事件合并为一个，保留最新的时间
+                event.ts = ts if ts is not None else event.ts
+                event.coalesced += 1
+                self._counters['coalesced'] += 1
+                return
+            if len(self._pending) >= self.max_pending:
+                self._drop_one()
+            self._pending[key] = Event(kind, code, ts)
+            self._cond.notify()
+
+    def _drop_one(self):
+        """队列已满时丢弃最早的行情事件，没有行情事件时丢弃最早的事件"""
+        for key, event in self._pending.items():
+            if event.kind == EVENT_QUOTE:
+                del self._pending[key]
+                break
+        else:
+            self._pending.popitem(last=False)
+        self._counters['dropped'] += 1
+
+    def on_quote(self, code, ts):
+        """行情推送入口：发布 quote 事件，跨分钟时发布上一分钟的 bar_close 事件"""
+        if ts is None or code not in self._codes:
+            return
+        minute = ts // 60000
+        last_minute = self._bar_minute.get(code)
+        self._bar_minute[code] = minute
+        if last_minute is not None and minute > last_minute:
+            self.publish(EVENT_BAR_CLOSE, code, (last_minute + 1) * 60000)
+        self.publish(EVENT_QUOTE, code, ts)
+
+    def _due_timers(self, now):
+        """找出超过 fallback_interval 未执行的 (策略, 代码)，返回最近的下次到期时间"""
+        next_due = now + self.fallback_interval
+        for strategy in self._strategies:
+            if EVENT_TIMER not in strategy.events:
+                continue
+            for code in strategy.codes:
+                last_run = strategy.last_run.get(code)
+                if last_run is None or last_run + self.fallback_interval <= now:
+                    self.publish(EVENT_TIMER, code, int(time.time() * 1000))
+                else:
+                    next_due = min(next_due, last_run + self.fallback_interval)
+        return next_due
+
+    def _record(self, name, seconds):
+        self.latency.observe(name, seconds)
+
+    def _dispatch(self, event):
+        started = time.monotonic()
+        self._record(f'queue_wait.{event.kind}', started - event.enqueued)
+        for strategy in self._strategies:
+            if event.kind not in strategy.events or event.code not in strategy.codes:
+                continue
+            last_run = strategy.last_run.get(event.code)
+            if event.kind == EVENT_TIMER and last_run is not None and started - last_run < self.fallback_interval:
+                # 期间已被其他事件触发过，兜底执行不再需要
+                continue
+            strategy.last_run[event.code] = time.monotonic()
+            try:
+                strategy.func(event.code, event)
+            except Exception as e:
+                logger.error("策略 %s 处理事件 %s 时发生错误: %s", strategy.name, event, str(e), exc_info=True)
+            finished = time.monotonic()
+            self._record(f'{strategy.name}.{event.kind}', finished - started)
+            if event.kind == EVENT_BAR_CLOSE and event.ts is not None:
+                # K线走完到策略做出决策的延迟（墙钟时间）
+                self._record(f'{strategy.name}.bar_close_to_decision', event.age())
+        with self._stats_lock:
+            self._counters['dispatched'] += 1
+
+    def latency_stats(self):
+        """返回各项延迟的 p50/p99/max（秒）"""
+        return self.latency.stats()
+
+    def report(self):
+        """打印事件计数与延迟统计"""
+        logger.info("[调度] 事件计数: %s", self._counters)
+        self.latency.report('[调度]')
+
+    def _take_batch(self):
+        """取出一批代码互不相同的事件（未设置 executor 时只取一个）"""
+        if self.executor is None:
+            return [self._pending.popitem(last=False)[1]]
+        keys = []
+        codes = set()
+        for key, event in self._pending.items():
+            if event.code in codes:
+                # 同一代码的事件留到下一批，保证单个代码串行处理
+                continue
+            keys.append(key)
+            codes.add(event.code)
+            if len(keys) >= self.executor.max_workers:
+                break
+        return [self._pending.pop(key) for key in keys]
+
+    def run_once(self, timeout=None):
+        """处理一批事件，超时返回 False"""
+        now = time.monotonic()
+        next_due = self._due_timers(now)
+        wait = max(next_due - now, 0)
+        if timeout is not None:
+            wait = min(wait, timeout)
+        with self._cond:
+            if not self._pending:
+                self._cond.wait(wait)
+            if not self._pending:
+                return False
+            events = self._take_batch()
+        if len(events) == 1:
+            self._dispatch(events[0])
+        else:
+            self.executor.map(self._dispatch, events)
+        if self.report_interval and time.monotonic() - self._last_report >= self.report_interval:
+            self._last_report = time.monotonic()
+            self.report()
+        return True
+
+    def run(self):
+        """在当前线程中循环处理事件，直到 stop() 被调用"""
+        self._running = True
+        while self._running:
+            self.run_once(timeout=1)
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
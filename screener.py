@@ -0,0 +1,194 @@
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from indicators import batch_macd
+from signals import batch_is_up_trend, batch_is_reversal
+from strategy_params import StrategyParams
+
+logger = logging.getLogger('Trade')
+
+SCREEN_LOOKBACK = 400  # 矩阵保留的1分钟K线数量（30根10分钟K线 + MACD 预热）
+SCREEN_COLUMNS = ['code', 'time', 'last_price', 'up_trend', 'reversal', 'trend_reversal', 'macd_cross',
+                  'above_ma', 'macd_buy']
+
+
+class BarMatrix:
+    """按时间对齐的多代码1分钟K线矩阵，形状为 (代码数, K线数)
+
+    时间轴为各代码K线时间的并集（秒级整数，K线结束时间），代码在某一分钟没有K线时为 NaN。
+    """
+
+    __slots__ = ('codes', 'time', 'open', 'close', 'high', 'low', 'volume')
+
+    def __init__(self, codes, time_values, open_, close, high, low, volume):
+        self.codes = list(codes)
+        self.time = np.asarray(time_values, dtype='i8')
+        self.open = open_
+        self.close = close
+        self.high = high
+        self.low = low
+        self.volume = volume
+
+    @classmethod
+    def from_records(cls, records_by_code, lookback=SCREEN_LOOKBACK):
+        """由 {code: KLINE_DTYPE 记录数组}（KlineStore.get_records 的返回值）构造，只保留最近 lookback 分钟"""
+        codes = [code for code, records in records_by_code.items() if records is not None and len(records)]
+        tails = [records_by_code[code][-lookback:] for code in codes]
+        times = np.unique(np.concatenate([tail['time_key'] for tail in tails])) if tails else np.zeros(0, 'i8')
+        times = times[-lookback:]
+        shape = (len(codes), len(times))
+        arrays = {name: np.full(shape, np.nan) for name in ('open', 'close', 'high', 'low', 'volume')}
+        for row, tail in enumerate(tails):
+            pos = np.searchsorted(times, tail['time_key'])
+            keep = pos < len(times)
+            keep[keep] = times[pos[keep]] == tail['time_key'][keep]
+            for name, values in arrays.items():
+                values[row, pos[keep]] = tail[name][keep]
+        return cls(codes, times, arrays['open'], arrays['close'], arrays['high'], arrays['low'], arrays['volume'])
+
+    def __len__(self):
+        return len(self.codes)
+
+
+def forward_fill(values):
+    """按行向后填充 NaN（每行开头的 NaN 保持不变）"""
+    if values.size == 0:
+        return values.copy()
+    index = np.where(np.isnan(values), 0, np.arange(values.shape[1]))
+    np.maximum.accumulate(index, axis=1, out=index)
+    return values[np.arange(values.shape[0])[:, None], index]
+
+
+def resample_matrix(matrix, minutes):
+    """将1分钟K线矩阵合成为 N 分钟K线，返回 (收盘价, 成交量)，形状为 (代码数, N 分钟K线数)
+
+    分桶规则与 bars.bucket_time_key 一致（向上取整），所有代码共用同一组分桶边界；
+    最后一列为尚未走完的K线。某代码在一个分桶内没有任何1分钟K线时该列为 NaN。
+    """
+    n_codes, n_bars = matrix.close.shape
+    if n_bars == 0:
+        return np.empty((n_codes, 0)), np.empty((n_codes, 0))
+    period = minutes * 60
+    bucket = -(-matrix.time // period) * period
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], n_bars] - 1
+    traded = ~np.isnan(matrix.close)
+    counts = np.add.reduceat(traded, starts, axis=1)
+    close = forward_fill(matrix.close)[:, ends]
+    volume = np.add.reduceat(np.where(traded, matrix.volume, 0.0), starts, axis=1)
+    empty = counts == 0
+    close[empty] = np.nan
+    volume[empty] = np.nan
+    return close, volume
+
+
+def screen(matrix, params=None, only_hits=True):
+    """对矩阵中所有代码一次性计算趋势反转与 MACD 信号，返回 SCREEN_COLUMNS 的 DataFrame
+
+    判定以最后一列（最新一分钟）为准，与实盘单代码逻辑一致：
+    - 趋势：最近 trend_bars 根已走完的 N 分钟K线（最后一个分桶尚未走完，不参与），
+      窗口内有缺失K线的代码不满足趋势条件；
+    - 反转：最后两根1分钟K线与最后一根已走完的 N 分钟K线，最新一分钟没有成交的代码不触发；
+    - MACD：最后一根K线出现金叉，above_ma 为最新价高于 ma_period 均线（analyze_stock 的 UP）；
+      按对齐后的时间轴计算，有缺失分钟的代码与单代码计算结果可能略有差异。
+    only_hits 时只返回 trend_reversal 或 macd_buy 为真的代码。
+    """
+    params = params or StrategyParams()
+    n_codes, n_bars = matrix.close.shape
+    columns = {name: np.zeros(n_codes, dtype=bool) for name in SCREEN_COLUMNS[3:]}
+    last_price = matrix.close[:, -1] if n_bars else np.full(n_codes, np.nan)
+    if n_bars >= 2:
+        close_nm, volume_nm = resample_matrix(matrix, params.trend_minutes)
+        # 去掉尚未走完的最后一个分桶
+        close_nm = close_nm[:, :-1][:, -params.trend_bars:]
+        volume_nm = volume_nm[:, :-1][:, -params.trend_bars:]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            columns['up_trend'] = batch_is_up_trend(close_nm)
+            if close_nm.shape[1] > 0:
+                columns['reversal'] = batch_is_reversal(
+                    matrix.open[:, -2:], matrix.close[:, -2:], matrix.volume[:, -2:], close_nm, volume_nm,
+                    volume_ratio=params.volume_ratio, prev_volume_ratio=params.prev_volume_ratio,
+                    up_ratio=params.up_ratio)
+        columns['trend_reversal'] = columns['up_trend'] & columns['reversal']
+
+        # 缺失的分钟沿用上一收盘价；均线窗口内有 NaN 时为 NaN（与 rolling(window).mean() 一致）
+        close = forward_fill(matrix.close)
+        macd, signal_line, _ = batch_macd(close, params.macd_fast, params.macd_slow, params.macd_signal)
+        ma = close[:, -params.ma_period:].mean(axis=1) if n_bars >= params.ma_period else np.full(n_codes, np.nan)
+        with np.errstate(invalid='ignore'):
+            columns['macd_cross'] = (macd[:, -1] > signal_line[:, -1]) & (macd[:, -2] <= signal_line[:, -2])
+            columns['above_ma'] = last_price > ma
+        columns['macd_buy'] = columns['macd_cross'] & columns['above_ma']
+
+    result = pd.DataFrame({'code': matrix.codes, 'time': matrix.time[-1] if n_bars else 0,
+                           'last_price': last_price, **columns}, columns=SCREEN_COLUMNS)
+    if only_hits:
+        result = result[result['trend_reversal'] | result['macd_buy']].reset_index(drop=True)
+    return result
+
+
+class Screener:
+    """全市场筛选：后台线程每隔 interval 秒加载代码池的1分钟K线，向量化判定后只把触发的代码交给 hit_func
+
+    load_func(codes) 返回 {code: KLINE_DTYPE 记录数组}；hit_func(hits) 接收 screen() 的结果。
+    K线请求受 OpenD 频率限制，代码池较大时加载耗时可能超过 interval，此时下一轮紧接着开始。
+    """
+
+    def __init__(self, interval=60, params=None, lookback=SCREEN_LOOKBACK):
+        self.interval = interval
+        self.params = params or StrategyParams()
+        self.lookback = lookback
+        self.codes = []
+        self.stats = {'runs': 0, 'codes': 0, 'hits': 0, 'load_seconds': 0.0, 'screen_seconds': 0.0}
+        self._load_func = None
+        self._hit_func = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def run_once(self):
+        """执行一轮筛选，返回触发的代码（DataFrame）"""
+        started = time.perf_counter()
+        records = self._load_func(self.codes)
+        loaded = time.perf_counter()
+        matrix = BarMatrix.from_records(records, self.lookback)
+        hits = screen(matrix, self.params)
+        finished = time.perf_counter()
+        self.stats['runs'] += 1
+        self.stats['codes'] = len(matrix)
+        self.stats['hits'] += len(hits)
+        self.stats['load_seconds'] = loaded - started
+        self.stats['screen_seconds'] = finished - loaded
+        logger.info("[筛选] %d 个代码，加载 %.2f 秒，计算 %.1f 毫秒，触发 %d 个",
+                    len(matrix), loaded - started, (finished - loaded) * 1000, len(hits))
+        if not hits.empty and self._hit_func is not None:
+            self._hit_func(hits)
+        return hits
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error("[筛选] 执行时发生错误: %s", str(e), exc_info=True)
+            self._stop.wait(max(self.interval - (time.monotonic() - started), 0))
+
+    def start(self, codes, load_func, hit_func=None):
+        self.codes = list(codes)
+        self._load_func = load_func
+        self._hit_func = hit_func
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='Screener', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
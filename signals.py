@@ -0,0 +1,75 @@
+import numpy as np
+
+REVERSAL_VOLUME_RATIO = 2  # 1分钟成交量需大于10分钟平均成交量的倍数
+REVERSAL_PREV_VOLUME_RATIO = 2  # 1分钟成交量需大于前一分钟成交量的倍数
+REVERSAL_UP_RATIO = 2  # 最近1分钟涨幅需大于前1分钟跌幅的倍数
+
+
+def up_trend_stats(close):
+    """统计收盘价序列的上涨/下跌K线数量与涨跌幅和
+
+    与 is_up_trend 的逐行循环等价：涨幅 > 0 记为上涨，其余（含 0 与 NaN）记为下跌。
+    """
+    close = np.asarray(close, dtype='f8')
+    if close.shape[-1] < 2:
+        return 0, 0, 0.0, 0.0
+    change = np.diff(close, axis=-1) / close[..., :-1]
+    up = change > 0
+    up_count = up.sum(axis=-1)
+    down_count = change.shape[-1] - up_count
+    up_sum = np.where(up, change, 0.0).sum(axis=-1)
+    down_sum = np.where(up, 0.0, change).sum(axis=-1)
+    return up_count, down_count, up_sum, down_sum
+
+
+def is_up_trend_array(close):
+    """判断是否处于上涨趋势（向量化版本）"""
+    up_count, down_count, up_sum, down_sum = up_trend_stats(close)
+    return bool(up_count > down_count and up_sum > abs(down_sum))
+
+
+def batch_is_up_trend(close_matrix):
+    """批量判断上涨趋势，close_matrix 形状为 (代码数, K线数)，返回布尔数组"""
+    close_matrix = np.atleast_2d(np.asarray(close_matrix, dtype='f8'))
+    if close_matrix.shape[1] < 2:
+        return np.zeros(close_matrix.shape[0], dtype=bool)
+    up_count, down_count, up_sum, down_sum = up_trend_stats(close_matrix)
+    return (up_count > down_count) & (up_sum > np.abs(down_sum))
+
+
+def batch_is_reversal(open_1m, close_1m, volume_1m, close_10m, volume_10m,
+                      volume_ratio=REVERSAL_VOLUME_RATIO,
+                      prev_volume_ratio=REVERSAL_PREV_VOLUME_RATIO,
+                      up_ratio=REVERSAL_UP_RATIO):
+    """批量判断反转信号
+
+    1分钟数组形状为 (代码数, 1分钟K线数)，只使用最后两根；
+    10分钟数组形状为 (代码数, 10分钟K线数)。返回布尔数组。
+    """
+    open_1m = np.atleast_2d(np.asarray(open_1m, dtype='f8'))
+    close_1m = np.atleast_2d(np.asarray(close_1m, dtype='f8'))
+    volume_1m = np.atleast_2d(np.asarray(volume_1m, dtype='f8'))
+    close_10m = np.atleast_2d(np.asarray(close_10m, dtype='f8'))
+    volume_10m = np.atleast_2d(np.asarray(volume_10m, dtype='f8'))
+    if open_1m.shape[1] < 2 or close_10m.shape[1] < 1:
+        return np.zeros(open_1m.shape[0], dtype=bool)
+
+    last_open, prev_open = open_1m[:, -1], open_1m[:, -2]
+    last_close, prev_close = close_1m[:, -1], close_1m[:, -2]
+    last_volume, prev_volume = volume_1m[:, -1], volume_1m[:, -2]
+
+    # 最近1分钟涨幅 > 前1分钟跌幅的 up_ratio 倍
+    last_up = (last_close - last_open) / last_open
+    prev_down = (prev_open - prev_close) / prev_open
+    avg_volume_10m = np.nanmean(volume_10m, axis=1)
+
+    return ((last_up > up_ratio * prev_down) & (last_up > 0) &
+            (last_close > last_open) &
+            (last_close > close_10m[:, -1]) &
+            (last_volume > avg_volume_10m * volume_ratio) &
+            (last_volume > prev_volume * prev_volume_ratio))
+
+
+def is_reversal_array(open_1m, close_1m, volume_1m, close_10m, volume_10m, **kwargs):
+    """判断是否出现反转信号（向量化版本），至少需要两根1分钟K线"""
+    return bool(batch_is_reversal(open_1m, close_1m, volume_1m, close_10m, volume_10m, **kwargs)[0])
@@ -0,0 +1,108 @@
+import logging
+import os
+import pickle
+import threading
+import time
+import zlib
+
+logger = logging.getLogger('Trade')
+
+STATE_SNAPSHOT_FILE = 'data/state/snapshot.pkl.z'  # 状态快照文件（pickle + zlib）
+STATE_SNAPSHOT_VERSION = 1  # 快照格式版本，不一致时忽略旧快照
+
+
+class StateSnapshot:
+    """进程状态快照（热重启）
+
+    components 为 {名称: 组件}，组件提供 export_state() 与 restore_state(state)：
+    save 把各组件导出的状态写入一个压缩文件（先写临时文件再替换，崩溃时不会留下半个文件），
+    启动时 restore 读取并恢复，进程不必重新计算指标、合成K线和拉取期权链即可继续判定信号。
+    """
+
+    def __init__(self, path=STATE_SNAPSHOT_FILE, components=None):
+        self.path = path
+        self.components = dict(components or {})
+        self.stats = {'saves': 0, 'errors': 0, 'bytes': 0, 'save_seconds': 0.0}
+        self.dirty = False  # 有需要尽快写入的变化（由 mark_dirty 设置，save 开始时清除）
+        self._lock = threading.Lock()
+
+    def mark_dirty(self):
+        """标记需要尽快写入（可在推送回调中调用，不做 I/O），由调度线程调用 save_if_dirty 写入"""
+        self.dirty = True
+
+    def save_if_dirty(self):
+        """有未写入的变化时写入快照，返回是否写入"""
+        if not self.dirty:
+            return False
+        return self.save()
+
+    def save(self):
+        """写入快照，返回是否成功"""
+        if not self.path:
+            return False
+        started = time.perf_counter()
+        self.dirty = False
+        try:
+            state = {'version': STATE_SNAPSHOT_VERSION, 'saved_at': time.time(),
+                     'components': {name: component.export_state() for name, component in self.components.items()}}
+            payload = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 1)
+            with self._lock:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+                os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error("写入状态快照 %s 失败: %s", self.path, str(e))
+            self.dirty = True
+            self.stats['errors'] += 1
+            return False
+        self.stats['saves'] += 1
+        self.stats['bytes'] = len(payload)
+        self.stats['save_seconds'] = time.perf_counter() - started
+        return True
+
+    def load(self):
+        """读取快照，文件不存在、无法读取或版本不一致时返回 None"""
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                state = pickle.loads(zlib.decompress(f.read()))
+        except Exception as e:
+            logger.error("读取状态快照 %s 失败: %s", self.path, str(e))
+            return None
+        if state.get('version') != STATE_SNAPSHOT_VERSION:
+            logger.warning("状态快照 %s 版本 %s 与当前版本 %d 不一致，忽略",
+                           self.path, state.get('version'), STATE_SNAPSHOT_VERSION)
+            return None
+        return state
+
+    def restore(self, state=None):
+        """将快照恢复到各组件，返回 {组件名: 恢复的条目数}，没有可用快照时返回 None"""
+        state = state if state is not None else self.load()
+        if state is None:
+            return None
+        restored = {}
+        for name, component in self.components.items():
+            data = state['components'].get(name)
+            if data is None:
+                continue
+            try:
+                restored[name] = component.restore_state(data)
+            except Exception as e:
+                logger.error("恢复状态快照 %s 失败: %s", name, str(e))
+        logger.info("由状态快照恢复 (保存于 %s): %s",
+                    time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(state['saved_at'])), restored)
+        return restored
+
+
+def describe(state):
+    """快照内容摘要 {组件名: 条目数}（命令行查看用）"""
+    summary = {}
+    for name, data in state['components'].items():
+        if isinstance(data, dict) and ('pending' in data or 'states' in data):
+            summary[name] = len(data.get('pending', data.get('states')))
+        else:
+            summary[name] = len(data)
+    return summary
@@ -0,0 +1,45 @@
+from signals import REVERSAL_VOLUME_RATIO, REVERSAL_PREV_VOLUME_RATIO, REVERSAL_UP_RATIO
+
+
+class StrategyParams:
+    """策略参数（回测、参数扫描与实盘筛选共用），默认值与 main.py 中的实盘常量一致
+
+    期权没有历史K线，成交按标的价格模拟：期权收益 = 标的收益 × leverage（近似的实际杠杆，
+    即 delta × 标的价格 / 权利金），止盈止损阈值按期权收益判断。leverage=1 时相当于直接交易标的。
+    """
+
+    __slots__ = ('profit_threshold', 'loss_threshold', 'volume_ratio', 'prev_volume_ratio', 'up_ratio',
+                 'trend_minutes', 'trend_bars', 'macd_fast', 'macd_slow', 'macd_signal', 'ma_period',
+                 'leverage', 'trade_value', 'slippage', 'commission')
+
+    def __init__(self, profit_threshold=0.20, loss_threshold=-0.05,
+                 volume_ratio=REVERSAL_VOLUME_RATIO, prev_volume_ratio=REVERSAL_PREV_VOLUME_RATIO,
+                 up_ratio=REVERSAL_UP_RATIO, trend_minutes=10, trend_bars=30,
+                 macd_fast=12, macd_slow=26, macd_signal=9, ma_period=20,
+                 leverage=1.0, trade_value=1000.0, slippage=0.0, commission=0.0):
+        self.profit_threshold = profit_threshold  # 止盈阈值
+        self.loss_threshold = loss_threshold  # 止损阈值
+        self.volume_ratio = volume_ratio
+        self.prev_volume_ratio = prev_volume_ratio
+        self.up_ratio = up_ratio
+        self.trend_minutes = trend_minutes  # 趋势K线周期（分钟）
+        self.trend_bars = trend_bars  # 趋势判定使用的已走完K线数量
+        self.macd_fast = macd_fast
+        self.macd_slow = macd_slow
+        self.macd_signal = macd_signal
+        self.ma_period = ma_period
+        self.leverage = leverage
+        self.trade_value = trade_value  # 每笔交易投入的金额
+        self.slippage = slippage  # 单边滑点（价格比例）
+        self.commission = commission  # 单边固定手续费
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def replace(self, **kwargs):
+        params = self.to_dict()
+        params.update(kwargs)
+        return StrategyParams(**params)
+
+    def __repr__(self):
+        return f'StrategyParams({self.to_dict()})'
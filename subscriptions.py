@@ -0,0 +1,107 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger('Trade')
+
+MIN_SUBSCRIBE_SECONDS = 60  # OpenD 要求订阅至少 1 分钟后才能反订阅
+
+
+class SubscriptionManager:
+    """订阅管理
+
+    各调用方按分组声明所需的 (代码, 订阅类型) 集合，sync 时与当前已订阅集合求差，
+    只订阅新增项、反订阅不再需要的项（未满 1 分钟的推迟到之后的 sync），
+    避免每轮重复订阅消耗订阅额度。
+    """
+
+    def __init__(self, min_hold=MIN_SUBSCRIBE_SECONDS):
+        self.min_hold = min_hold
+        self._groups = {}  # 分组名 -> {(code, subtype)}
+        self._subscribed = {}  # (code, subtype) -> 订阅时刻（monotonic）
+        self._lock = threading.Lock()
+        self.subscribe_calls = 0
+        self.unsubscribe_calls = 0
+
+    def desired(self):
+        wanted = set()
+        for items in self._groups.values():
+            wanted |= items
+        return wanted
+
+    def subscribed(self):
+        return set(self._subscribed)
+
+    def is_subscribed(self, code, subtype):
+        return (code, subtype) in self._subscribed
+
+    def set_group(self, quote_ctx, group, codes, subtypes):
+        """设置分组所需的订阅并同步，返回是否成功"""
+        with self._lock:
+            self._groups[group] = {(code, subtype) for code in codes for subtype in subtypes}
+            return self._sync(quote_ctx)
+
+    def add(self, quote_ctx, group, codes, subtypes):
+        """向分组追加订阅并同步"""
+        with self._lock:
+            items = self._groups.setdefault(group, set())
+            items |= {(code, subtype) for code in codes for subtype in subtypes}
+            return self._sync(quote_ctx)
+
+    def remove(self, quote_ctx, group, codes=None):
+        """从分组移除代码（codes 为空时移除整个分组）并同步"""
+        with self._lock:
+            if codes is None:
+                self._groups.pop(group, None)
+            elif group in self._groups:
+                self._groups[group] = {item for item in self._groups[group] if item[0] not in codes}
+            return self._sync(quote_ctx)
+
+    def sync(self, quote_ctx):
+        with self._lock:
+            return self._sync(quote_ctx)
+
+    @staticmethod
+    def _by_subtype(items):
+        """按订阅类型分组为 [(subtypes, codes)]，同一批代码的多个类型合并为一次请求"""
+        codes_by_subtype = {}
+        for code, subtype in items:
+            codes_by_subtype.setdefault(code, []).append(subtype)
+        batches = {}
+        for code, subtypes in codes_by_subtype.items():
+            batches.setdefault(tuple(sorted(subtypes)), []).append(code)
+        return [(list(subtypes), sorted(codes)) for subtypes, codes in batches.items()]
+
+    def _sync(self, quote_ctx):
+        from futu import RET_OK
+
+        ok = True
+        wanted = self.desired()
+        to_add = wanted - set(self._subscribed)
+        for subtypes, codes in self._by_subtype(to_add):
+            self.subscribe_calls += 1
+            ret, data = quote_ctx.subscribe(codes, subtypes)
+            if ret != RET_OK:
+                logger.error("订阅 %s %s 失败: %s", codes, subtypes, data)
+                ok = False
+                continue
+            now = time.monotonic()
+            for code in codes:
+                for subtype in subtypes:
+                    self._subscribed[(code, subtype)] = now
+            logger.info("新增订阅 %s %s", codes, subtypes)
+
+        now = time.monotonic()
+        to_remove = {item for item, since in self._subscribed.items()
+                     if item not in wanted and now - since >= self.min_hold}
+        for subtypes, codes in self._by_subtype(to_remove):
+            self.unsubscribe_calls += 1
+            ret, data = quote_ctx.unsubscribe(codes, subtypes)
+            if ret != RET_OK:
+                logger.warning("反订阅 %s %s 失败: %s", codes, subtypes, data)
+                continue
+            for code in codes:
+                for subtype in subtypes:
+                    self._subscribed.pop((code, subtype), None)
+            logger.info("取消订阅 %s %s", codes, subtypes)
+        return ok
@@ -0,0 +1,207 @@
+"""策略参数扫描：网格或随机搜索止盈止损、放量倍数与 MACD 周期，多进程并行回测
+
+K线只加载一次并写入内存映射文件，各工作进程以只读方式映射同一份数据，
+任务只传递参数字典；买入信号只依赖部分参数，同一组信号参数在进程内只计算一次。
+
+运行: python sweep.py data/bars.csv --param profit_threshold=0.1,0.2,0.3 --param loss_threshold=-0.03,-0.05
+      python sweep.py data/bars.csv --param volume_ratio=1.5:3 --param up_ratio=1:3 --samples 200
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backtest import (BarArrays, SIGNAL_FUNCS, STRATEGY_TREND_REVERSAL, TRADE_COLUMNS, load_bars, simulate_trades,
+                      summarize)
+from strategy_params import StrategyParams
+
+# 各策略买入信号依赖的参数，其余参数只影响成交与平仓
+SIGNAL_PARAMS = {
+    STRATEGY_TREND_REVERSAL: ('volume_ratio', 'prev_volume_ratio', 'up_ratio', 'trend_minutes', 'trend_bars'),
+    'macd': ('macd_fast', 'macd_slow', 'macd_signal', 'ma_period'),
+}
+INT_PARAMS = ('trend_minutes', 'trend_bars', 'macd_fast', 'macd_slow', 'macd_signal', 'ma_period')
+
+_shared = None  # 工作进程中映射的K线 {code: BarArrays}
+
+
+class SharedBars:
+    """把 {code: BarArrays} 写入目录下的 .npy 文件，供多个进程以 mmap 方式只读共享"""
+
+    def __init__(self, root):
+        self.root = root
+
+    @classmethod
+    def create(cls, bars_by_code, root=None):
+        root = root or tempfile.mkdtemp(prefix='sweep_')
+        codes = list(bars_by_code)
+        lengths = [len(bars_by_code[code]) for code in codes]
+        offsets = np.r_[0, np.cumsum(lengths)].astype('i8')
+        times = np.empty(offsets[-1], dtype='i8')
+        values = np.empty((5, offsets[-1]), dtype='f8')
+        for code, start, end in zip(codes, offsets[:-1], offsets[1:]):
+            bars = bars_by_code[code]
+            times[start:end] = bars.time
+            for row, name in enumerate(('open', 'close', 'high', 'low', 'volume')):
+                values[row, start:end] = getattr(bars, name)
+        np.save(os.path.join(root, 'time.npy'), times)
+        np.save(os.path.join(root, 'values.npy'), values)
+        with open(os.path.join(root, 'index.json'), 'w') as f:
+            json.dump({'codes': codes, 'offsets': offsets.tolist()}, f)
+        return cls(root)
+
+    def load(self):
+        """以内存映射方式打开，返回 {code: BarArrays}（数组为映射视图，不复制）"""
+        times = np.load(os.path.join(self.root, 'time.npy'), mmap_mode='r')
+        values = np.load(os.path.join(self.root, 'values.npy'), mmap_mode='r')
+        with open(os.path.join(self.root, 'index.json')) as f:
+            index = json.load(f)
+        offsets = index['offsets']
+        return {code: BarArrays(code, times[start:end], *(values[row, start:end] for row in range(5)))
+                for code, start, end in zip(index['codes'], offsets[:-1], offsets[1:])}
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def _init_worker(root):
+    global _shared
+    _shared = SharedBars(root).load()
+
+
+def _run_group(strategy, param_dicts):
+    """在工作进程中回测一组信号参数相同的参数组合，返回 [(参数字典, 汇总指标)]"""
+    params_list = [StrategyParams(**params) for params in param_dicts]
+    signal_func = SIGNAL_FUNCS[strategy]
+    trades = [[] for _ in params_list]
+    for bars in _shared.values():
+        if len(bars) < 2:
+            continue
+        signals = signal_func(bars, params_list[0])
+        if not signals.any():
+            continue
+        for i, params in enumerate(params_list):
+            trades[i].extend(simulate_trades(bars, signals, params))
+    return [(params, summarize(pd.DataFrame(rows, columns=TRADE_COLUMNS)))
+            for params, rows in zip(param_dicts, trades)]
+
+
+def parse_param(spec):
+    """解析 name=v1,v2,... （网格取值）或 name=low:high（随机搜索区间）"""
+    name, _, values = spec.partition('=')
+    if name not in StrategyParams.__slots__:
+        raise ValueError(f'未知参数: {name}')
+    cast = int if name in INT_PARAMS else float
+    if ':' in values:
+        low, high = values.split(':')
+        return name, (cast(low), cast(high))
+    return name, [cast(value) for value in values.split(',')]
+
+
+def grid_search(space):
+    """网格参数组合，space 为 {name: [取值]}"""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_search(space, samples, seed=0):
+    """随机参数组合，space 中的区间 (low, high) 均匀采样，列表随机选取"""
+    rng = random.Random(seed)
+    combos = []
+    for _ in range(samples):
+        combo = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                combo[name] = rng.randint(low, high) if name in INT_PARAMS else rng.uniform(low, high)
+            else:
+                combo[name] = rng.choice(values)
+        combos.append(combo)
+    return combos
+
+
+def group_by_signal(combos, strategy, base=None):
+    """按信号参数分组，同组只计算一次买入信号"""
+    base = (base or StrategyParams()).to_dict()
+    keys = SIGNAL_PARAMS[strategy]
+    groups = {}
+    for combo in combos:
+        params = dict(base, **combo)
+        groups.setdefault(tuple(params[key] for key in keys), []).append(params)
+    return list(groups.values())
+
+
+def run_sweep(bars_by_code, combos, strategy=STRATEGY_TREND_REVERSAL, workers=None, metric='pnl', base=None):
+    """并行回测所有参数组合，返回按 metric 降序排列的结果 DataFrame"""
+    workers = workers or os.cpu_count() or 1
+    groups = group_by_signal(combos, strategy, base)
+    # 组数少于进程数时拆分大组，保证所有核都有任务
+    while len(groups) < workers and max(len(group) for group in groups) > 1:
+        largest = max(groups, key=len)
+        groups.remove(largest)
+        half = len(largest) // 2
+        groups.extend([largest[:half], largest[half:]])
+    shared = SharedBars.create(bars_by_code)
+    rows = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shared.root,)) as executor:
+            futures = [executor.submit(_run_group, strategy, group) for group in groups]
+            for future in futures:
+                for params, summary in future.result():
+                    rows.append(dict(params, **summary))
+    finally:
+        shared.cleanup()
+    results = pd.DataFrame(rows)
+    if results.empty:
+        return results
+    results = results.sort_values(metric, ascending=False, kind='mergesort').reset_index(drop=True)
+    results.insert(0, 'rank', np.arange(1, len(results) + 1))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='策略参数扫描')
+    parser.add_argument('paths', nargs='+', help='1分钟K线文件或目录（CSV / Parquet / KlineStore .npy）')
+    parser.add_argument('--strategy', choices=sorted(SIGNAL_FUNCS), default=STRATEGY_TREND_REVERSAL)
+    parser.add_argument('--param', action='append', default=[],
+                        help='name=v1,v2（网格）或 name=low:high（随机区间），可重复')
+    parser.add_argument('--samples', type=int, default=0, help='随机搜索的组合数，0 表示网格搜索')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认为 CPU 核数')
+    parser.add_argument('--metric', default='pnl', help='排序指标（pnl / win_rate / profit_factor ...）')
+    parser.add_argument('--leverage', type=float, default=1.0, help='期权相对标的的实际杠杆')
+    parser.add_argument('--output', default='sweep_results.csv', help='结果输出 CSV')
+    args = parser.parse_args()
+
+    space = dict(parse_param(spec) for spec in args.param)
+    if args.samples:
+        combos = random_search(space, args.samples, seed=args.seed)
+    else:
+        ranges = [name for name, values in space.items() if isinstance(values, tuple)]
+        if ranges:
+            parser.error(f'网格搜索不支持区间参数 {ranges}，请使用 --samples')
+        combos = grid_search(space)
+
+    bars_by_code = load_bars(args.paths)
+    start = time.perf_counter()
+    results = run_sweep(bars_by_code, combos, strategy=args.strategy, workers=args.workers, metric=args.metric,
+                        base=StrategyParams(leverage=args.leverage))
+    elapsed = time.perf_counter() - start
+    print(f'{len(combos)} 组参数, {len(bars_by_code)} 个代码, 耗时 {elapsed:.2f}s')
+    if not results.empty:
+        print(results.head(20).to_string(index=False))
+        results.to_csv(args.output, index=False)
+        print(f'结果已保存到 {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import unittest
+
+import pandas as pd
+
+from bars import BarAggregator, resample_kline
+
+
+def minute_bars(day, start, count):
+    """day 日从 start（HH:MM，第一根K线的结束时间）起连续 count 根1分钟K线"""
+    times = pd.date_range(f'{day} {start}', periods=count, freq='min')
+    close = [100.0 + i for i in range(count)]
+    return pd.DataFrame({'time_key': times.strftime('%Y-%m-%d %H:%M:%S'), 'open': close, 'close': close,
+                         'high': [c + 1 for c in close], 'low': [c - 1 for c in close],
+                         'volume': [100] * count, 'turnover': [c * 100 for c in close]})
+
+
+class BarAggregatorTest(unittest.TestCase):
+    def setUp(self):
+        self.aggregator = BarAggregator(minutes=10)
+
+    def add(self, data):
+        return self.aggregator.update('HK.00700', data)
+
+    def test_bucket_closes_when_next_bucket_starts(self):
+        closed = self.add(minute_bars('2026-01-05', '10:01', 10))
+        self.assertEqual(closed, [])
+        closed = self.add(minute_bars('2026-01-05', '10:11', 1))
+        self.assertEqual([bar[0] for bar in closed], ['2026-01-05 10:10:00'])
+
+    def test_lunch_break_closes_bucket_at_noon(self):
+        morning = minute_bars('2026-01-05', '11:41', 20)
+        closed = self.add(morning)
+        # 11:51~12:00 不必等到 13:01 才走完
+        self.assertEqual([bar[0] for bar in closed], ['2026-01-05 11:50:00', '2026-01-05 12:00:00'])
+        expected = resample_kline(morning, 10)
+        frame = self.aggregator.frame('HK.00700')
+        pd.testing.assert_frame_equal(frame[expected.columns], expected, check_dtype=False)
+        self.assertEqual(len(self.aggregator.frame('HK.00700', include_partial=True)), 2)
+        # 下午开盘的第一根K线不会再次产生 12:00 的K线
+        closed = self.add(minute_bars('2026-01-05', '13:01', 1))
+        self.assertEqual(closed, [])
+        self.assertEqual(self.aggregator.frame('HK.00700')['time_key'].tolist(),
+                         ['2026-01-05 11:50:00', '2026-01-05 12:00:00'])
+
+    def test_repeated_session_end_bar_updates_closed_bar(self):
+        data = minute_bars('2026-01-05', '15:51', 10)
+        self.add(data)
+        # 最后一根1分钟K线未走完时再次推入（相同 time_key，收盘价更新）
+        updated = data.iloc[[-1]].copy()
+        updated['close'] = 200.0
+        updated['high'] = 201.0
+        self.assertEqual(self.add(updated), [])
+        frame = self.aggregator.frame('HK.00700')
+        self.assertEqual(len(frame), 1)
+        self.assertEqual(frame['time_key'].iloc[-1], '2026-01-05 16:00:00')
+        self.assertEqual(frame['close'].iloc[-1], 200.0)
+        self.assertEqual(frame['high'].iloc[-1], 201.0)
+
+    def test_close_bucket_at_market_close(self):
+        closed = self.add(minute_bars('2026-01-05', '15:51', 10))
+        self.assertEqual([bar[0] for bar in closed], ['2026-01-05 16:00:00'])
+        closed = self.add(minute_bars('2026-01-06', '09:31', 10))
+        self.assertEqual([bar[0] for bar in closed], [])
+        self.assertEqual(self.aggregator.frame('HK.00700')['time_key'].tolist(), ['2026-01-05 16:00:00'])
+
+    def test_export_restore_keeps_closed_flag(self):
+        self.add(minute_bars('2026-01-05', '11:51', 10))
+        restored = BarAggregator(minutes=10)
+        restored.restore_state(self.aggregator.export_state())
+        self.assertEqual(restored.update('HK.00700', minute_bars('2026-01-05', '13:01', 1)), [])
+        self.assertEqual(len(restored.frame('HK.00700')), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
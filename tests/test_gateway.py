@@ -0,0 +1,71 @@
+import threading
+import time
+import unittest
+
+from futu import RET_OK, SubType
+
+from benchmarks.sim_context import SimMarket, SimQuoteContext
+from gateway import RequestGateway, order_priority
+
+# 缩短窗口的限额，突发在 2 秒内走完
+LIMITS = {'request_history_kline': (30, 1), 'get_option_chain': (6, 1)}
+SYMBOLS = [f'HK.{i:05d}' for i in range(40)]
+
+
+class RequestGatewayTest(unittest.TestCase):
+    def setUp(self):
+        market = SimMarket()
+        self.contexts = [SimQuoteContext(market, rate_limits=LIMITS) for _ in range(2)]
+        self.gateway = RequestGateway(self.contexts, limits=LIMITS)
+        self.gateway.subscribe(SYMBOLS, [SubType.QUOTE])
+        self.completed = []
+        self.lock = threading.Lock()
+
+    def done(self, label, ret):
+        self.assertEqual(ret, RET_OK)
+        with self.lock:
+            self.completed.append(label)
+
+    def analysis(self, code):
+        ret, *_ = self.gateway.request_history_kline(code, start='2000-01-01', end='2099-12-31', ktype='K_1M')
+        self.done(code, ret)
+        ret, _ = self.gateway.get_stock_quote([code])
+        self.assertEqual(ret, RET_OK)
+
+    def order(self, code, latencies):
+        started = time.perf_counter()
+        with order_priority(self.gateway):
+            ret, *_ = self.gateway.request_history_kline(code, start='2000-01-01', end='2000-01-02', ktype='K_1M')
+            self.assertEqual(ret, RET_OK)
+            ret, _ = self.gateway.get_option_chain(code, option_type='CALL')
+        latencies.append(time.perf_counter() - started)
+        self.done('order', ret)
+
+    def test_burst_is_not_rejected_and_orders_jump_the_queue(self):
+        threads = [threading.Thread(target=self.analysis, args=(code,)) for code in SYMBOLS]
+        for thread in threads:
+            thread.start()
+        # 分析请求已在令牌桶中排队后再发出下单路径的请求
+        time.sleep(0.1)
+        latencies = []
+        orders = [threading.Thread(target=self.order, args=(code, latencies)) for code in SYMBOLS[:2]]
+        for thread in orders:
+            thread.start()
+        for thread in threads + orders:
+            thread.join(timeout=30)
+
+        rejected = {}
+        for ctx in self.contexts:
+            for name, count in ctx.rejected.items():
+                rejected[name] = rejected.get(name, 0) + count
+        self.assertEqual(rejected, {})
+        self.assertEqual(len(self.completed), len(SYMBOLS) + 2)
+        # 下单路径插到排队的分析请求之前：两次下单都在大部分分析请求之前完成
+        last_order = max(index for index, label in enumerate(self.completed) if label == 'order')
+        self.assertLess(last_order, len(SYMBOLS) // 2)
+        self.assertLess(max(latencies), 0.6)
+        self.assertGreater(self.gateway.stats['throttled'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
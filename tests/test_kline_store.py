@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.sim_context import SimMarket, SimQuoteContext
+from kline_store import KlineStore, time_key_to_int
+
+CODE = 'HK.00700'
+KTYPE = 'K_1M'
+DAYS = 10
+
+
+def make_bars(days, minutes=3):
+    """最近 days 天每天 minutes 根1分钟K线"""
+    today = datetime.now().replace(hour=10, minute=0, second=0, microsecond=0)
+    times = [today - timedelta(days=day) + timedelta(minutes=minute)
+             for day in range(days - 1, -1, -1) for minute in range(minutes)]
+    close = 300 + np.arange(len(times), dtype='f8')
+    return pd.DataFrame({'code': CODE, 'time_key': [t.strftime('%Y-%m-%d %H:%M:%S') for t in times],
+                         'open': close - 0.5, 'close': close, 'high': close + 1, 'low': close - 1,
+                         'volume': np.full(len(times), 1000), 'turnover': close * 1000})
+
+
+class KlineStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='kline_')
+        self.market = SimMarket(bars={CODE: make_bars(DAYS)})
+        self.ctx = SimQuoteContext(self.market, enforce_limits=False)
+        self.starts = []
+        request = self.ctx.request_history_kline
+
+        def recording(code, start=None, end=None, **kwargs):
+            self.starts.append(start)
+            return request(code, start=start, end=end, **kwargs)
+
+        self.ctx.request_history_kline = recording
+        self.start_date = datetime.now() - timedelta(days=DAYS + 5)
+        self.end_date = datetime.now()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def requests(self):
+        return self.ctx.calls.get('request_history_kline', 0)
+
+    def get(self, store):
+        return store.get(self.ctx, CODE, self.start_date, self.end_date, KTYPE)
+
+    def path(self, store):
+        return store._path(CODE, KTYPE)
+
+    def test_repeat_get_within_refresh_interval_issues_no_request(self):
+        store = KlineStore(self.root, refresh_interval=60)
+        first = self.get(store)
+        self.assertEqual(len(first), DAYS * 3)
+        requests = self.requests()
+        self.assertGreater(requests, 0)
+        second = self.get(store)
+        self.assertEqual(self.requests(), requests)
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_unchanged_refresh_does_not_rewrite_file(self):
+        store = KlineStore(self.root, refresh_interval=0)
+        self.get(store)
+        before = os.stat(self.path(store))
+        requests = self.requests()
+        self.get(store)
+        after = os.stat(self.path(store))
+        self.assertGreater(self.requests(), requests)
+        self.assertEqual((before.st_ino, before.st_mtime_ns, before.st_size),
+                         (after.st_ino, after.st_mtime_ns, after.st_size))
+
+    def test_refresh_fetches_tail_and_appends_in_place(self):
+        store = KlineStore(self.root, refresh_interval=0)
+        self.get(store)
+        before = os.stat(self.path(store))
+        bars = make_bars(DAYS, minutes=5)
+        self.market._bars[CODE] = bars
+        frame = self.get(store)
+        # 只请求最后一根已存K线所在日期之后的数据
+        self.assertEqual(self.starts[-1], bars['time_key'].iloc[-1][:10])
+        # 之前各天保留已存的3根，最后一天以新数据（5根）为准
+        expected = make_bars(DAYS)['time_key'].tolist()[:-3] + bars['time_key'].tolist()[-5:]
+        self.assertEqual(frame['time_key'].tolist(), expected)
+        self.assertEqual(self.market.bars(CODE)['close'].iloc[-1], frame['close'].iloc[-1])
+        after = os.stat(self.path(store))
+        # 原地追加：文件未被替换
+        self.assertEqual(before.st_ino, after.st_ino)
+        self.assertGreater(after.st_size, before.st_size)
+        # 磁盘内容与冷启动加载一致
+        cold = KlineStore(self.root, refresh_interval=60)
+        pd.testing.assert_frame_equal(self.get(cold), frame)
+
+    def test_retention_prunes_old_rows(self):
+        store = KlineStore(self.root, refresh_interval=0)
+        self.assertEqual(len(self.get(store)), DAYS * 3)
+        store.retention_days = 5
+        self.market._bars[CODE] = make_bars(DAYS, minutes=4)
+        self.get(store)
+        records = np.load(self.path(store))
+        cutoff = time_key_to_int([(datetime.now() - timedelta(days=5)).strftime('%Y-%m-%d')])[0]
+        self.assertGreaterEqual(records['time_key'].min(), cutoff)
+        self.assertLess(len(records), DAYS * 3)
+        self.assertEqual(store._meta[(CODE, KTYPE)]['start'], store._retention_start())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+
+import pandas as pd
+from futu import RET_ERROR, RET_OK, TrdSide
+
+from latency import LatencyRecorder
+from order_pipeline import OrderPipeline
+
+CODE = 'HK.TCH250627C400000'
+
+
+def order_push(order_id, status, dealt_qty, avg_price, remark=''):
+    return pd.DataFrame([{'order_id': order_id, 'remark': remark, 'order_status': status, 'dealt_qty': dealt_qty,
+                          'dealt_avg_price': avg_price}])
+
+
+class OrderPipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.pipeline = OrderPipeline(workers=1, latency=LatencyRecorder())
+        self.fills = []
+        self.done = []
+        self.placed = []
+
+    def tearDown(self):
+        self.pipeline.stop()
+
+    def submit(self, qty=500):
+        return self.pipeline.submit(CODE, qty, TrdSide.BUY, 1.0, 'NORMAL',
+                                    on_fill=lambda ticket, qty, price: self.fills.append((qty, price)),
+                                    on_done=self.done.append)
+
+    def start(self, place_func):
+        self.pipeline.start(place_func=place_func)
+
+    def test_push_before_place_order_returns(self):
+        def place(code, qty, trd_side, price, order_type, remark):
+            # 推送早于 place_order 返回，只能按备注匹配
+            self.pipeline.on_order(order_push('100', 'FILLED_ALL', qty, 1.05, remark))
+            return RET_OK, order_push('100', 'SUBMITTED', 0, 0.0, remark)
+
+        self.start(place)
+        ticket = self.submit()
+        self.assertTrue(ticket.wait(5))
+        self.assertTrue(ticket.filled)
+        self.assertEqual(ticket.order_id, '100')
+        self.assertEqual(ticket.status, 'FILLED_ALL')
+        self.assertEqual(self.fills, [(500, 1.05)])
+        self.assertEqual(self.done, [ticket])
+
+    def test_duplicate_and_out_of_order_pushes(self):
+        def place(code, qty, trd_side, price, order_type, remark):
+            self.placed.append(remark)
+            return RET_OK, order_push('100', 'SUBMITTED', 0, 0.0, remark)
+
+        self.start(place)
+        ticket = self.submit(1000)
+        self.assertFalse(ticket.wait(0.2))
+        remark = self.placed[0]
+        self.pipeline.on_order(order_push('100', 'FILLED_PART', 500, 1.0, remark))
+        self.pipeline.on_order(order_push('100', 'FILLED_PART', 500, 1.0, remark))
+        # 订单推送没有备注时按订单号匹配
+        self.pipeline.on_order(order_push('100', 'FILLED_PART', 800, 1.05))
+        self.pipeline.on_order(order_push('100', 'FILLED_PART', 500, 1.0))
+        self.assertFalse(ticket.done)
+        self.pipeline.on_order(order_push('100', 'FILLED_ALL', 1000, 1.1))
+        self.pipeline.on_order(order_push('100', 'FILLED_ALL', 1000, 1.1))
+        self.assertTrue(ticket.done)
+        self.assertEqual([qty for qty, _ in self.fills], [500, 300, 200])
+        self.assertAlmostEqual(sum(qty * price for qty, price in self.fills), 1000 * 1.1)
+        self.assertEqual(len(self.done), 1)
+        self.assertEqual(self.pipeline.in_flight(), [])
+
+    def test_cancelled_part_reports_filled_quantity(self):
+        def place(code, qty, trd_side, price, order_type, remark):
+            self.pipeline.on_order(order_push('100', 'FILLED_PART', 500, 1.0, remark))
+            return RET_OK, order_push('100', 'FILLED_PART', 500, 1.0, remark)
+
+        self.start(place)
+        ticket = self.submit(1000)
+        self.assertFalse(ticket.wait(0.2))
+        self.pipeline.on_order(order_push('100', 'CANCELLED_PART', 500, 1.0))
+        self.assertTrue(ticket.done)
+        self.assertFalse(ticket.filled)
+        self.assertEqual(ticket.dealt_qty, 500)
+        self.assertEqual(self.pipeline.stats['cancelled'], 1)
+
+    def test_submit_failure(self):
+        self.start(lambda *args: (RET_ERROR, '数量错误'))
+        ticket = self.submit()
+        self.assertTrue(ticket.wait(5))
+        self.assertEqual(ticket.status, 'SUBMIT_FAILED')
+        self.assertEqual(ticket.error, '数量错误')
+        self.assertEqual(self.fills, [])
+        self.assertEqual(self.done, [ticket])
+
+    def test_timeout_cancels_remainder(self):
+        cancels = []
+
+        def cancel(order_id):
+            cancels.append(order_id)
+            self.pipeline.on_order(order_push(order_id, 'CANCELLED_PART', 500, 1.0))
+            return RET_OK, None
+
+        self.pipeline.poll_interval = 0.05
+        self.pipeline.start(place_func=lambda code, qty, trd_side, price, order_type, remark:
+                            (RET_OK, order_push('100', 'FILLED_PART', 500, 1.0, remark)),
+                            cancel_func=cancel)
+        ticket = self.pipeline.submit(CODE, 1000, TrdSide.BUY, 1.0, 'NORMAL', timeout=0.1,
+                                      on_fill=lambda ticket, qty, price: self.fills.append((qty, price)))
+        self.assertTrue(ticket.wait(5))
+        self.assertEqual(cancels, ['100'])
+        self.assertEqual(ticket.status, 'CANCELLED_PART')
+        self.assertEqual(self.fills, [(500, 1.0)])
+
+    def test_no_timeout_keeps_order(self):
+        cancels = []
+        self.pipeline.poll_interval = 0.05
+        self.pipeline.start(place_func=lambda code, qty, trd_side, price, order_type, remark:
+                            (RET_OK, order_push('100', 'SUBMITTED', 0, 0.0, remark)),
+                            cancel_func=lambda order_id: cancels.append(order_id) or (RET_OK, None))
+        ticket = self.submit()
+        self.assertFalse(ticket.wait(0.3))
+        self.assertEqual(cancels, [])
+
+    def test_foreign_order_ignored(self):
+        self.pipeline.on_order(order_push('999', 'FILLED_ALL', 500, 1.0, 'manual'))
+        self.assertEqual(self.fills, [])
+        self.assertEqual(self.pipeline.stats['filled'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+
+import pandas as pd
+from futu import RET_OK, TrdSide
+
+from portfolio import PortfolioState
+
+CODE = 'HK.TCH250627C400000'
+
+
+def order_push(order_id, dealt_qty, avg_price, trd_side=TrdSide.BUY, code=CODE):
+    return pd.DataFrame([{'order_id': order_id, 'code': code, 'trd_side': trd_side, 'dealt_qty': dealt_qty,
+                          'dealt_avg_price': avg_price}])
+
+
+def deal_push(deal_id, order_id, qty, price, trd_side=TrdSide.BUY, code=CODE):
+    return pd.DataFrame([{'deal_id': deal_id, 'order_id': order_id, 'code': code, 'trd_side': trd_side,
+                          'qty': qty, 'price': price}])
+
+
+class FakeTradeContext:
+    """position_list_query 返回 rows；during_query 在查询返回前执行（模拟查询期间到达的推送）"""
+
+    def __init__(self, rows=(), cash=10000.0, during_query=None):
+        self.rows = list(rows)
+        self.cash = cash
+        self.during_query = during_query
+
+    def accinfo_query(self, trd_env=None):
+        return RET_OK, pd.DataFrame([{'cash': self.cash, 'power': self.cash}])
+
+    def position_list_query(self, trd_env=None):
+        if self.during_query is not None:
+            self.during_query()
+        return RET_OK, pd.DataFrame(self.rows, columns=['code', 'qty', 'cost_price'])
+
+
+class PortfolioPushTest(unittest.TestCase):
+    def setUp(self):
+        self.portfolio = PortfolioState()
+        self.assertTrue(self.portfolio.reconcile(FakeTradeContext(), 'SIMULATE'))
+
+    def test_duplicate_order_push_counted_once(self):
+        self.portfolio.on_order(order_push('1', 500, 1.0))
+        self.portfolio.on_order(order_push('1', 500, 1.0))
+        self.assertEqual(self.portfolio.qty(CODE), 500)
+        self.assertAlmostEqual(self.portfolio.cash, 9500.0)
+
+    def test_out_of_order_order_push_ignored(self):
+        self.portfolio.on_order(order_push('1', 1000, 1.1))
+        self.portfolio.on_order(order_push('1', 500, 1.0))
+        self.assertEqual(self.portfolio.qty(CODE), 1000)
+        self.assertAlmostEqual(self.portfolio.position(CODE)[1], 1.1)
+
+    def test_partial_order_pushes_add_increments(self):
+        self.portfolio.on_order(order_push('1', 500, 1.0))
+        self.portfolio.on_order(order_push('1', 1000, 1.1))
+        self.assertEqual(self.portfolio.qty(CODE), 1000)
+        self.assertAlmostEqual(self.portfolio.cash, 10000.0 - 1100.0)
+
+    def test_deal_push_before_order_push(self):
+        self.portfolio.on_deal(deal_push('d1', '1', 500, 1.0))
+        self.portfolio.on_order(order_push('1', 500, 1.0))
+        self.assertEqual(self.portfolio.qty(CODE), 500)
+        self.portfolio.on_order(order_push('1', 1000, 1.0))
+        self.portfolio.on_deal(deal_push('d2', '1', 500, 1.0))
+        self.assertEqual(self.portfolio.qty(CODE), 1000)
+        self.assertAlmostEqual(self.portfolio.cash, 9000.0)
+
+    def test_duplicate_deal_push_counted_once(self):
+        self.portfolio.on_deal(deal_push('d1', '1', 500, 1.0))
+        self.portfolio.on_deal(deal_push('d1', '1', 500, 1.0))
+        self.assertEqual(self.portfolio.qty(CODE), 500)
+
+    def test_sell_fill_removes_position(self):
+        self.portfolio.on_order(order_push('1', 500, 1.0))
+        self.portfolio.on_deal(deal_push('d2', '2', 500, 1.2, trd_side=TrdSide.SELL))
+        self.portfolio.on_order(order_push('2', 500, 1.2, trd_side=TrdSide.SELL))
+        self.assertEqual(self.portfolio.qty(CODE), 0)
+        self.assertIsNone(self.portfolio.position(CODE))
+        self.assertAlmostEqual(self.portfolio.cash, 10100.0)
+
+
+class PortfolioReconcileTest(unittest.TestCase):
+    def test_reconcile_overwrites_drift(self):
+        portfolio = PortfolioState()
+        portfolio.reconcile(FakeTradeContext(), 'SIMULATE')
+        portfolio.on_order(order_push('1', 500, 1.0))
+        portfolio.reconcile(FakeTradeContext(rows=[(CODE, 1000, 1.0)]), 'SIMULATE')
+        self.assertEqual(portfolio.qty(CODE), 1000)
+        self.assertEqual(portfolio.stats['drift'], 1)
+
+    def test_fill_pushed_during_reconcile_is_kept(self):
+        portfolio = PortfolioState()
+        portfolio.reconcile(FakeTradeContext(), 'SIMULATE')
+        push = order_push('1', 500, 1.0)
+        # 查询结果早于这笔成交，推送在查询返回前到达
+        ctx = FakeTradeContext(during_query=lambda: portfolio.on_order(push))
+        self.assertTrue(portfolio.reconcile(ctx, 'SIMULATE'))
+        self.assertEqual(portfolio.qty(CODE), 500)
+        portfolio.on_order(push)
+        self.assertEqual(portfolio.qty(CODE), 500)
+        # 下一次核对（期间没有推送）以查询为准
+        portfolio.reconcile(FakeTradeContext(rows=[(CODE, 500, 1.0)]), 'SIMULATE')
+        self.assertEqual(portfolio.qty(CODE), 500)
+        self.assertEqual(portfolio.stats['drift'], 0)
+
+    def test_sell_pushed_during_reconcile_is_kept(self):
+        portfolio = PortfolioState()
+        portfolio.reconcile(FakeTradeContext(rows=[(CODE, 500, 1.0)]), 'SIMULATE')
+        ctx = FakeTradeContext(rows=[(CODE, 500, 1.0)], during_query=lambda: portfolio.on_order(
+            order_push('2', 500, 1.2, trd_side=TrdSide.SELL)))
+        portfolio.reconcile(ctx, 'SIMULATE')
+        self.assertEqual(portfolio.qty(CODE), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+from unittest import mock
+
+import positions
+from latency import LatencyRecorder
+from positions import PositionManager
+
+CODE = 'HK.TCH250627C400000'
+
+
+class FakeTicket:
+    def __init__(self, qty):
+        self.qty = qty
+        self.dealt_qty = 0
+        self.dealt_avg_price = 0.0
+        self.status = 'SUBMITTED'
+        self.error = None
+        self.done = False
+
+    @property
+    def filled(self):
+        return self.dealt_qty >= self.qty
+
+    def finish(self, status, dealt_qty, avg_price):
+        self.status, self.dealt_qty, self.dealt_avg_price, self.done = status, dealt_qty, avg_price, True
+
+
+class PositionSellTest(unittest.TestCase):
+    """不启动后台线程，按后台线程的顺序处理队列，结果确定"""
+
+    def setUp(self):
+        self.sells = []  # [(qty, ticket, on_done)]
+        self.cancels = []
+        self.closed = []
+        self.manager = PositionManager(0.1, -0.1, sell_timeout=0, latency=LatencyRecorder())
+        self.manager._sell_func = self.sell
+        self.manager._close_func = self.closed.append
+        self.manager._cancel_func = self.cancels.append
+        patcher = mock.patch.object(positions, 'SELL_RETRY_INTERVAL', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sell(self, code, qty, buy_price, on_done):
+        ticket = FakeTicket(qty)
+        self.sells.append((qty, ticket, on_done))
+        return ticket
+
+    def drain(self):
+        while not self.manager._sell_queue.empty():
+            item = self.manager._sell_queue.get_nowait()
+            if isinstance(item, tuple):
+                self.manager._finish_sell(*item)
+            else:
+                self.manager._sell(item)
+
+    def test_partial_fill_retries_remainder(self):
+        self.manager.open(CODE, 1.0, 1000)
+        self.assertTrue(self.manager.on_price(CODE, 1.2))
+        self.drain()
+        self.assertEqual(len(self.sells), 1)
+        # 订单在途时不重复卖出
+        self.assertFalse(self.manager.on_price(CODE, 1.3))
+        self.drain()
+        self.assertEqual(len(self.sells), 1)
+        # 超时撤单，撤单后才到达部分成交
+        self.manager._cancel_expired()
+        _, ticket, on_done = self.sells[0]
+        self.assertEqual(self.cancels, [ticket])
+        ticket.finish('CANCELLED_PART', 400, 1.2)
+        on_done(ticket)
+        self.drain()
+        self.assertEqual(self.manager.get(CODE).qty, 600)
+        self.assertEqual(self.closed, [])
+        # 重试只卖剩余数量
+        self.assertTrue(self.manager.on_price(CODE, 1.2))
+        self.drain()
+        qty, ticket, on_done = self.sells[1]
+        self.assertEqual(qty, 600)
+        ticket.finish('FILLED_ALL', 600, 1.2)
+        on_done(ticket)
+        self.drain()
+        self.assertIsNone(self.manager.get(CODE))
+        self.assertEqual(self.closed, [CODE])
+        self.assertEqual(len(self.sells), 2)
+
+    def test_fill_before_sell_returns(self):
+        def sell(code, qty, buy_price, on_done):
+            ticket = FakeTicket(qty)
+            ticket.finish('FILLED_ALL', qty, 0.9)
+            on_done(ticket)
+            return ticket
+
+        self.manager._sell_func = sell
+        self.manager.open(CODE, 1.0, 500)
+        self.manager.on_price(CODE, 0.85)
+        self.drain()
+        self.assertIsNone(self.manager.get(CODE))
+        self.assertEqual(self.closed, [CODE])
+
+    def test_no_position_in_account_closes(self):
+        self.manager._sell_func = lambda code, qty, buy_price, on_done: True
+        self.manager.open(CODE, 1.0, 500)
+        self.manager.on_price(CODE, 0.85)
+        self.drain()
+        self.assertIsNone(self.manager.get(CODE))
+
+    def test_submit_failure_retries(self):
+        self.manager._sell_func = lambda code, qty, buy_price, on_done: False
+        self.manager.open(CODE, 1.0, 500)
+        self.manager.on_price(CODE, 0.85)
+        self.drain()
+        position = self.manager.get(CODE)
+        self.assertIsNotNone(position)
+        self.assertFalse(position.closing)
+        self.assertEqual(self.closed, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from scheduler import EVENT_BAR_CLOSE, EVENT_STATE_CHANGED, EVENT_TIMER, StrategyScheduler
+
+MINUTE = 60000
+TS = 1792200000000 // MINUTE * MINUTE
+
+
+class StrategySchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = StrategyScheduler(fallback_interval=3600, report_interval=0)
+        self.calls = []
+        self.scheduler.register('trend', lambda code, event: self.calls.append((code, event.kind)),
+                                events=(EVENT_BAR_CLOSE,), codes=['HK.00700'])
+        self.scheduler.register('snapshot', lambda code, event: self.calls.append((code, event.kind)),
+                                events=(EVENT_STATE_CHANGED,))
+
+    def drain(self):
+        while self.scheduler._pending:
+            self.scheduler.run_once(timeout=0)
+
+    def test_watched_code_gets_bar_close(self):
+        self.scheduler.on_quote('HK.00700', TS + 1000)
+        self.scheduler.on_quote('HK.00700', TS + MINUTE + 1000)
+        self.drain()
+        self.assertEqual(self.calls, [('HK.00700', EVENT_BAR_CLOSE)])
+
+    def test_unwatched_code_is_not_queued(self):
+        # 期权候选、持仓合约等只为行情订阅的代码
+        self.scheduler.on_quote('HK.TCH250627C400000', TS + 1000)
+        self.scheduler.on_quote('HK.TCH250627C400000', TS + MINUTE + 1000)
+        self.scheduler.publish(EVENT_BAR_CLOSE, 'HK.09988', TS)
+        self.assertEqual(len(self.scheduler._pending), 0)
+        self.assertEqual(self.scheduler._counters['published'], 0)
+        self.assertNotIn('HK.TCH250627C400000', self.scheduler._bar_minute)
+
+    def test_code_less_task_is_queued(self):
+        self.scheduler.publish(EVENT_STATE_CHANGED, None)
+        self.drain()
+        self.assertEqual(self.calls, [(None, EVENT_STATE_CHANGED)])
+
+    def test_unregistered_kind_is_ignored(self):
+        self.scheduler.publish(EVENT_TIMER, 'HK.00700', TS)
+        self.assertEqual(len(self.scheduler._pending), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,322 @@
+"""推送录制与回放：定长二进制记录，按日期与推送类型分文件，可内存映射读取
+
+文件布局: {root}/{YYYYMMDD}/{quote|ticker|order_book}.bin，无文件头，
+每条记录为下方结构化类型的原始字节，只追加写入；异常退出导致的不完整尾记录在读取时忽略。
+
+运行: python tick_log.py info data/ticks 20260105
+      python tick_log.py replay data/ticks 20260105 --speed 10
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from market_data import EXCHANGE_TZ, frame_columns, parse_time_ms, TICKER_DIRECTIONS
+
+KIND_QUOTE = 'quote'
+KIND_TICKER = 'ticker'
+KIND_ORDER_BOOK = 'order_book'
+KINDS = (KIND_QUOTE, KIND_TICKER, KIND_ORDER_BOOK)
+
+CODE_WIDTH = 24  # 代码字段字节数
+ORDER_BOOK_DEPTH = 10  # 录制的摆盘档数
+FLUSH_INTERVAL = 1.0  # 写入缓冲的最长刷新间隔（秒）
+WRITE_BUFFER_SIZE = 1 << 20
+
+# recv_ns 为本地收到推送的纳秒时间戳，ts 为推送中的行情时间（毫秒）
+TICK_DTYPES = {
+    KIND_QUOTE: np.dtype([
+        ('recv_ns', 'i8'), ('code', f'S{CODE_WIDTH}'), ('ts', 'i8'),
+        ('last_price', 'f8'), ('open_price', 'f8'), ('high_price', 'f8'), ('low_price', 'f8'),
+        ('volume', 'i8'), ('turnover', 'f8'),
+    ]),
+    KIND_TICKER: np.dtype([
+        ('recv_ns', 'i8'), ('code', f'S{CODE_WIDTH}'), ('ts', 'i8'),
+        ('price', 'f8'), ('volume', 'i8'), ('turnover', 'f8'), ('direction', 'i1'), ('sequence', 'i8'),
+    ]),
+    KIND_ORDER_BOOK: np.dtype([
+        ('recv_ns', 'i8'), ('code', f'S{CODE_WIDTH}'), ('ts_bid', 'i8'), ('ts_ask', 'i8'),
+        ('bid_price', 'f8', ORDER_BOOK_DEPTH), ('bid_volume', 'i8', ORDER_BOOK_DEPTH),
+        ('bid_count', 'i4', ORDER_BOOK_DEPTH),
+        ('ask_price', 'f8', ORDER_BOOK_DEPTH), ('ask_volume', 'i8', ORDER_BOOK_DEPTH),
+        ('ask_count', 'i4', ORDER_BOOK_DEPTH),
+    ]),
+}
+
+DIRECTION_NAMES = {1: 'BUY', -1: 'SELL', 0: 'NEUTRAL'}
+
+
+def _day_of(recv_ns):
+    """录制文件所属的交易日（按交易所时区，与主机时区无关）"""
+    return datetime.fromtimestamp(recv_ns / 1e9, EXCHANGE_TZ).strftime('%Y%m%d')
+
+
+def tick_path(root, day, kind):
+    return os.path.join(root, day, f'{kind}.bin')
+
+
+def encode_quote(data, recv_ns):
+    """行情推送 DataFrame -> 结构化数组"""
+    codes, dates, times, *columns = frame_columns(
+        data, ('code', 'data_date', 'data_time', 'last_price', 'open_price',
+               'high_price', 'low_price', 'volume', 'turnover'))
+    records = np.zeros(len(codes), dtype=TICK_DTYPES[KIND_QUOTE])
+    records['recv_ns'] = recv_ns
+    records['code'] = [str(code).encode() for code in codes]
+    records['ts'] = [parse_time_ms(f'{dates[i]} {times[i]}') or 0 for i in range(len(codes))]
+    for name, column in zip(('last_price', 'open_price', 'high_price', 'low_price', 'volume', 'turnover'), columns):
+        records[name] = column
+    return records
+
+
+def encode_ticker(data, recv_ns):
+    """逐笔成交推送 DataFrame -> 结构化数组"""
+    codes, times, prices, volumes, turnovers, directions, sequences = frame_columns(
+        data, ('code', 'time', 'price', 'volume', 'turnover', 'ticker_direction', 'sequence'))
+    records = np.zeros(len(codes), dtype=TICK_DTYPES[KIND_TICKER])
+    records['recv_ns'] = recv_ns
+    records['code'] = [str(code).encode() for code in codes]
+    records['ts'] = [parse_time_ms(value) or 0 for value in times]
+    records['price'] = prices
+    records['volume'] = volumes
+    records['turnover'] = turnovers
+    records['direction'] = [TICKER_DIRECTIONS.get(value, 0) for value in directions]
+    records['sequence'] = sequences
+    return records
+
+
+def encode_order_book(data, recv_ns):
+    """摆盘推送 dict -> 结构化数组（一条记录，最多 ORDER_BOOK_DEPTH 档）"""
+    records = np.zeros(1, dtype=TICK_DTYPES[KIND_ORDER_BOOK])
+    record = records[0]
+    record['recv_ns'] = recv_ns
+    record['code'] = str(data['code']).encode()
+    record['ts_bid'] = parse_time_ms(data.get('svr_recv_time_bid')) or 0
+    record['ts_ask'] = parse_time_ms(data.get('svr_recv_time_ask')) or 0
+    for side, key in (('bid', 'Bid'), ('ask', 'Ask')):
+        levels = (data.get(key) or [])[:ORDER_BOOK_DEPTH]
+        record[f'{side}_price'][:] = np.nan
+        for i, level in enumerate(levels):
+            record[f'{side}_price'][i] = level[0]
+            record[f'{side}_volume'][i] = level[1]
+            record[f'{side}_count'][i] = level[2] if len(level) > 2 else 0
+    return records
+
+
+ENCODERS = {
+    KIND_QUOTE: encode_quote,
+    KIND_TICKER: encode_ticker,
+    KIND_ORDER_BOOK: encode_order_book,
+}
+
+
+class TickRecorder:
+    """推送录制器
+
+    推送回调中把解析后的推送编码为定长记录写入缓冲文件，只在超过 flush_interval
+    或关闭时刷新到磁盘；收到推送的日期变化时自动切换到新一天的文件。
+    """
+
+    def __init__(self, root, flush_interval=FLUSH_INTERVAL):
+        self.root = root
+        self.flush_interval = flush_interval
+        self._files = {}  # kind -> (day, 文件对象)
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.records = {kind: 0 for kind in KINDS}
+
+    def _file(self, kind, day):
+        current = self._files.get(kind)
+        if current is not None and current[0] == day:
+            return current[1]
+        if current is not None:
+            current[1].close()
+        path = tick_path(self.root, day, kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        f = open(path, 'ab', buffering=WRITE_BUFFER_SIZE)
+        self._files[kind] = (day, f)
+        return f
+
+    def record(self, kind, data, recv_ns=None):
+        """录制一次推送（DataFrame 或摆盘 dict），返回写入的记录数"""
+        recv_ns = recv_ns or time.time_ns()
+        records = ENCODERS[kind](data, recv_ns)
+        with self._lock:
+            self._file(kind, _day_of(recv_ns)).write(records.tobytes())
+            self.records[kind] += len(records)
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+        return len(records)
+
+    def record_quote(self, data, recv_ns=None):
+        return self.record(KIND_QUOTE, data, recv_ns)
+
+    def record_ticker(self, data, recv_ns=None):
+        return self.record(KIND_TICKER, data, recv_ns)
+
+    def record_order_book(self, data, recv_ns=None):
+        return self.record(KIND_ORDER_BOOK, data, recv_ns)
+
+    def _flush(self):
+        for _, f in self._files.values():
+            f.flush()
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            for _, f in self._files.values():
+                f.close()
+            self._files.clear()
+
+
+def read_ticks(root, day, kind):
+    """以内存映射方式读取某天某类推送，没有文件时返回空数组"""
+    dtype = TICK_DTYPES[kind]
+    path = tick_path(root, day, kind)
+    if not os.path.exists(path):
+        return np.zeros(0, dtype=dtype)
+    count = os.path.getsize(path) // dtype.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+
+def _format_ms(ts):
+    return datetime.fromtimestamp(ts / 1000.0, EXCHANGE_TZ).strftime('%Y-%m-%d %H:%M:%S.%f')[:23]
+
+
+def decode_quote(records):
+    """结构化数组 -> 与 StockQuoteHandlerBase 推送一致的 DataFrame"""
+    stamps = [_format_ms(ts) for ts in records['ts']]
+    return pd.DataFrame({
+        'code': [code.decode() for code in records['code']],
+        'data_date': [stamp[:10] for stamp in stamps],
+        'data_time': [stamp[11:] for stamp in stamps],
+        'last_price': records['last_price'], 'open_price': records['open_price'],
+        'high_price': records['high_price'], 'low_price': records['low_price'],
+        'volume': records['volume'], 'turnover': records['turnover'],
+    })
+
+
+def decode_ticker(records):
+    """结构化数组 -> 与 TickerHandlerBase 推送一致的 DataFrame"""
+    return pd.DataFrame({
+        'code': [code.decode() for code in records['code']],
+        'time': [_format_ms(ts) for ts in records['ts']],
+        'price': records['price'], 'volume': records['volume'], 'turnover': records['turnover'],
+        'ticker_direction': [DIRECTION_NAMES.get(int(value), 'NEUTRAL') for value in records['direction']],
+        'sequence': records['sequence'],
+    })
+
+
+def decode_order_book(record):
+    """单条记录 -> 与 OrderBookHandlerBase 推送一致的 dict"""
+    data = {'code': record['code'].decode(), 'name': '',
+            'svr_recv_time_bid': _format_ms(record['ts_bid']) if record['ts_bid'] else '',
+            'svr_recv_time_ask': _format_ms(record['ts_ask']) if record['ts_ask'] else ''}
+    for side, key in (('bid', 'Bid'), ('ask', 'Ask')):
+        prices = record[f'{side}_price']
+        data[key] = [(float(prices[i]), int(record[f'{side}_volume'][i]), int(record[f'{side}_count'][i]), {})
+                     for i in range(ORDER_BOOK_DEPTH) if prices[i] == prices[i]]
+    return data
+
+
+class TickReplayer:
+    """按收到推送的时间顺序，把某天录制的推送回放给 handler.on_push
+
+    同一类型、同一 recv_ns 的连续记录还原为一次推送（与录制时的一帧对应）。
+    speed 为回放倍速，0 表示不等待、尽快回放。
+    """
+
+    def __init__(self, root, day, kinds=KINDS):
+        self.root = root
+        self.day = day
+        self.records = {kind: read_ticks(root, day, kind) for kind in kinds}
+
+    def __len__(self):
+        return sum(len(records) for records in self.records.values())
+
+    def _events(self):
+        """返回按 recv_ns 排序的 (recv_ns, kind, start, end) 推送列表"""
+        events = []
+        for kind, records in self.records.items():
+            if len(records) == 0:
+                continue
+            recv = np.asarray(records['recv_ns'])
+            if kind == KIND_ORDER_BOOK:
+                starts = np.arange(len(recv))
+            else:
+                starts = np.flatnonzero(np.r_[True, recv[1:] != recv[:-1]])
+            ends = np.r_[starts[1:], len(recv)]
+            events.extend(zip(recv[starts].tolist(), [kind] * len(starts), starts.tolist(), ends.tolist()))
+        events.sort(key=lambda event: event[0])
+        return events
+
+    def replay(self, handlers, speed=1.0):
+        """handlers 为 {kind: handler}，返回回放的推送次数"""
+        events = self._events()
+        if not events:
+            return 0
+        first_recv = events[0][0]
+        started = time.monotonic()
+        count = 0
+        for recv_ns, kind, start, end in events:
+            handler = handlers.get(kind)
+            if handler is None:
+                continue
+            if speed:
+                delay = (recv_ns - first_recv) / 1e9 / speed - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            records = self.records[kind][start:end]
+            if kind == KIND_QUOTE:
+                data = decode_quote(records)
+            elif kind == KIND_TICKER:
+                data = decode_ticker(records)
+            else:
+                data = decode_order_book(records[0])
+            handler.on_push(data)
+            count += 1
+        return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='推送录制文件查看与回放')
+    parser.add_argument('command', choices=['info', 'replay'])
+    parser.add_argument('root', help='录制目录')
+    parser.add_argument('day', help='日期 YYYYMMDD')
+    parser.add_argument('--speed', type=float, default=1.0, help='回放倍速，0 表示尽快回放')
+    args = parser.parse_args()
+
+    replayer = TickReplayer(args.root, args.day)
+    for kind, records in replayer.records.items():
+        if len(records) == 0:
+            print(f'{kind:>10}: 0 条')
+            continue
+        span = (records['recv_ns'][-1] - records['recv_ns'][0]) / 1e9
+        codes = len(np.unique(records['code']))
+        print(f'{kind:>10}: {len(records)} 条, {codes} 个代码, 时长 {span:.1f}s, '
+              f'{os.path.getsize(tick_path(args.root, args.day, kind)) / 1e6:.1f} MB')
+    if args.command == 'replay':
+        import logging
+        import main as trade_main
+        trade_main.logger = logging.getLogger('Trade')
+        handlers = {KIND_QUOTE: trade_main.QuoteHandler(trade_main.logger),
+                    KIND_TICKER: trade_main.TickerHandler(trade_main.logger),
+                    KIND_ORDER_BOOK: trade_main.OrderBookHandler(trade_main.logger)}
+        start = time.perf_counter()
+        count = replayer.replay(handlers, speed=args.speed)
+        elapsed = time.perf_counter() - start
+        print(f'回放 {count} 次推送, 耗时 {elapsed:.2f}s, {count / max(elapsed, 1e-9):,.0f} 次/秒')
+
+
+if __name__ == '__main__':
+    main()